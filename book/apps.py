@@ -1,4 +1,14 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.models.signals import post_migrate
+
+
+def restore_search_index(sender, using, **kwargs):
+    from book.search import ensure_sqlite_search_index
+
+    connection = connections[using]
+    if connection.vendor == "sqlite":
+        ensure_sqlite_search_index(connection)
 
 
 class BookConfig(AppConfig):
@@ -7,3 +17,5 @@ class BookConfig(AppConfig):
 
     def ready(self):
         import book.signals # noqa
+
+        post_migrate.connect(restore_search_index, sender=self)
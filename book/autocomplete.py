@@ -0,0 +1,233 @@
+import json
+import re
+import unicodedata
+import uuid
+from functools import partial
+
+from django.db import transaction
+from django_redis import get_redis_connection
+
+from book.models import Book
+
+
+AUTOCOMPLETE_KEY = "book:autocomplete"
+AUTOCOMPLETE_MEMBERS_KEY = "book:autocomplete:members"
+AUTOCOMPLETE_READY_KEY = "book:autocomplete:ready"
+# Held while the index is rebuilt; books written meanwhile are recorded
+# in the dirty set and indexed again once the rebuilt index is live.
+AUTOCOMPLETE_LOCK_KEY = "book:autocomplete:rebuilding"
+AUTOCOMPLETE_DIRTY_KEY = "book:autocomplete:dirty"
+# Set when a lookup found no index, so only one rebuild is scheduled.
+AUTOCOMPLETE_SCHEDULED_KEY = "book:autocomplete:scheduled"
+AUTOCOMPLETE_LOCK_TIMEOUT = 60 * 10
+AUTOCOMPLETE_REBUILD_CHUNK_SIZE = 2000
+
+# Separates the searchable phrase of a member from the title it suggests.
+# It sorts before every printable character, so "harry\0..." comes
+# before "harry potter\0...".
+SEPARATOR = "\0"
+WORD = re.compile(r"\w+")
+
+
+def normalize_words(text):
+    """Lowercase the words of ``text`` and strip their accents."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(
+        char for char in decomposed if not unicodedata.combining(char)
+    )
+    return WORD.findall(stripped.lower())
+
+
+def book_members(title, author):
+    """
+    The sorted set members of a book: one per word of its title and
+    author, holding the rest of the phrase from that word on, so a
+    prefix of any word finds the book.
+    """
+    members = set()
+    for text in (title, author):
+        words = normalize_words(text)
+        for start in range(len(words)):
+            phrase = " ".join(words[start:])
+            members.add(f"{phrase}{SEPARATOR}{title}")
+    return sorted(members)
+
+
+def _connection():
+    return get_redis_connection("default")
+
+
+def _write_book(connection, book_id, members, replay=False):
+    """
+    Replace the entries of one book in the live index, or remove them
+    when ``members`` is None. Unless replaying them, marks the book dirty
+    during a rebuild.
+    """
+    old_members = connection.hget(AUTOCOMPLETE_MEMBERS_KEY, book_id)
+    pipeline = connection.pipeline()
+    if old_members:
+        pipeline.zrem(AUTOCOMPLETE_KEY, *json.loads(old_members))
+    if members is None:
+        pipeline.hdel(AUTOCOMPLETE_MEMBERS_KEY, book_id)
+    else:
+        pipeline.zadd(AUTOCOMPLETE_KEY, dict.fromkeys(members, 0))
+        pipeline.hset(AUTOCOMPLETE_MEMBERS_KEY, book_id, json.dumps(members))
+    if not replay and connection.exists(AUTOCOMPLETE_LOCK_KEY):
+        pipeline.sadd(AUTOCOMPLETE_DIRTY_KEY, book_id)
+    pipeline.execute()
+
+
+def index_book(book_id, title, author):
+    """Replace the autocomplete entries of one book."""
+    _write_book(_connection(), book_id, book_members(title, author))
+
+
+def unindex_book(book_id):
+    """Remove the autocomplete entries of a deleted book."""
+    _write_book(_connection(), book_id, None)
+
+
+def _build_index(connection, index_key, members_key):
+    """Write the index of every book under the given keys."""
+    count = 0
+    pipeline = connection.pipeline(transaction=False)
+    books = Book.objects.values_list("id", "title", "author")
+    for book_id, title, author in books.iterator(
+        chunk_size=AUTOCOMPLETE_REBUILD_CHUNK_SIZE
+    ):
+        members = book_members(title, author)
+        pipeline.zadd(index_key, dict.fromkeys(members, 0))
+        pipeline.hset(members_key, book_id, json.dumps(members))
+        count += 1
+        if count % AUTOCOMPLETE_REBUILD_CHUNK_SIZE == 0:
+            pipeline.execute()
+    pipeline.execute()
+    return count
+
+
+def _replay_dirty_books(connection):
+    """
+    Index again, from the database, the books written while the index
+    was rebuilt: their live writes went to the index that was replaced.
+    """
+    while book_ids := connection.spop(
+        AUTOCOMPLETE_DIRTY_KEY, AUTOCOMPLETE_REBUILD_CHUNK_SIZE
+    ):
+        books = {
+            book_id: book_members(title, author)
+            for book_id, title, author in Book.objects.filter(
+                pk__in=[int(book_id) for book_id in book_ids]
+            ).values_list("id", "title", "author")
+        }
+        for book_id in book_ids:
+            book_id = int(book_id)
+            _write_book(connection, book_id, books.get(book_id), replay=True)
+
+
+def rebuild_autocomplete_index():
+    """
+    Rebuild the whole index from the database, unless another rebuild
+    is running.
+
+    The new index is written under temporary keys and swapped in with
+    RENAME, so suggestions keep being served while it is built. Books
+    written during the rebuild are indexed again once it is live.
+
+    Returns:
+        int | None: The number of indexed books, or None if another
+        rebuild holds the lock.
+    """
+    connection = _connection()
+    token = uuid.uuid4().hex
+    if not connection.set(
+        AUTOCOMPLETE_LOCK_KEY, token, nx=True, ex=AUTOCOMPLETE_LOCK_TIMEOUT
+    ):
+        return None
+    try:
+        index_key = f"{AUTOCOMPLETE_KEY}:rebuild"
+        members_key = f"{AUTOCOMPLETE_MEMBERS_KEY}:rebuild"
+        connection.delete(index_key, members_key, AUTOCOMPLETE_DIRTY_KEY)
+        count = _build_index(connection, index_key, members_key)
+
+        pipeline = connection.pipeline()
+        if count:
+            pipeline.rename(index_key, AUTOCOMPLETE_KEY)
+            pipeline.rename(members_key, AUTOCOMPLETE_MEMBERS_KEY)
+        else:
+            pipeline.delete(AUTOCOMPLETE_KEY, AUTOCOMPLETE_MEMBERS_KEY)
+        pipeline.set(AUTOCOMPLETE_READY_KEY, 1)
+        pipeline.delete(AUTOCOMPLETE_SCHEDULED_KEY)
+        pipeline.execute()
+
+        _replay_dirty_books(connection)
+    finally:
+        if connection.get(AUTOCOMPLETE_LOCK_KEY) == token.encode():
+            connection.delete(AUTOCOMPLETE_LOCK_KEY)
+    return count
+
+
+def schedule_autocomplete_rebuild(connection):
+    """Queue one rebuild task, however many lookups miss the index."""
+    from book.tasks import rebuild_autocomplete
+
+    if connection.set(
+        AUTOCOMPLETE_SCHEDULED_KEY, 1, nx=True, ex=AUTOCOMPLETE_LOCK_TIMEOUT
+    ):
+        rebuild_autocomplete.delay()
+
+
+def rebuild_autocomplete_on_commit():
+    """
+    Rebuild the index in the background once the current transaction
+    commits, for bulk writes of books that bypass the model signals.
+
+    The task waits for a rebuild already running instead of being
+    skipped, as that one may have read the books before the write.
+    """
+    from book.tasks import rebuild_autocomplete
+
+    transaction.on_commit(partial(rebuild_autocomplete.delay, wait=True))
+
+
+def _lookup(connection, prefix, count):
+    pipeline = connection.pipeline(transaction=False)
+    pipeline.exists(AUTOCOMPLETE_READY_KEY)
+    pipeline.zrangebylex(
+        AUTOCOMPLETE_KEY,
+        b"[" + prefix,
+        b"[" + prefix + b"\xff",
+        start=0,
+        num=count,
+    )
+    return pipeline.execute()
+
+
+def autocomplete(query, limit=10):
+    """
+    Return up to ``limit`` book titles whose title or author has a word
+    starting with ``query``, in alphabetical order of the matched phrase.
+
+    Costs one Redis round trip and no query. While the index does not
+    exist, a rebuild is scheduled in the background and nothing is
+    suggested.
+    """
+    words = normalize_words(query)
+    if not words or limit < 1:
+        return []
+    prefix = " ".join(words).encode()
+    connection = _connection()
+    # A title can match on several of its words, so extra members are
+    # fetched to still fill the limit after removing duplicates.
+    ready, members = _lookup(connection, prefix, limit * 3)
+    if not ready:
+        schedule_autocomplete_rebuild(connection)
+        return []
+
+    titles = []
+    for member in members:
+        title = member.decode().split(SEPARATOR, 1)[1]
+        if title not in titles:
+            titles.append(title)
+            if len(titles) == limit:
+                break
+    return titles
@@ -0,0 +1,16 @@
+from book.models import Book
+
+
+BOOK_EXPORT_FIELDS = {
+    "id": "id",
+    "title": "title",
+    "author": "author",
+    "cover": "cover",
+    "inventory": "inventory",
+    "daily_fee": "daily_fee",
+    "updated_at": "updated_at",
+}
+
+
+def book_export_queryset():
+    return Book.objects.all()
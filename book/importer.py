@@ -0,0 +1,110 @@
+import csv
+import json
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import F
+
+from book.autocomplete import rebuild_autocomplete_on_commit
+from book.models import Book
+from book.serializers import BookImportSerializer
+from core.cache import bump_cache_versions
+
+
+IMPORT_BATCH_SIZE = 1000
+IMPORT_FORMATS = ("csv", "jsonl")
+IMPORT_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/jsonl": "jsonl",
+    "application/x-ndjson": "jsonl",
+}
+# The inventory of a title holds its copies on the shelf, which the
+# catalogue file does not know, so only new titles take it from the file.
+UPDATE_FIELDS = ["author", "cover", "daily_fee", "updated_at"]
+
+
+def read_csv(lines):
+    """Yield ``(line_number, row)`` for every record of a CSV stream."""
+    reader = csv.DictReader(lines)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_jsonl(lines):
+    """
+    Yield ``(line_number, row)`` for every non-blank line of a JSON Lines
+    stream. ``row`` is None for lines that are not a JSON object.
+    """
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else None
+
+
+READERS = {"csv": read_csv, "jsonl": read_jsonl}
+
+
+def _validate(line_number, row, errors):
+    if row is None:
+        errors.append({"line": line_number, "errors": ["Not a JSON object."]})
+        return None
+    serializer = BookImportSerializer(data=row)
+    if not serializer.is_valid():
+        errors.append({"line": line_number, "errors": serializer.errors})
+        return None
+    return Book(**serializer.validated_data)
+
+
+def _upsert(books):
+    # A title can only be upserted once per statement, the last row wins.
+    unique_books = list({book.title: book for book in books}.values())
+    with transaction.atomic():
+        # The upsert cannot move the version of the titles it updates, so
+        # edits based on a read from before the import fail their If-Match.
+        Book.objects.filter(
+            title__in=[book.title for book in unique_books]
+        ).update(version=F("version") + 1)
+        Book.objects.bulk_create(
+            unique_books,
+            update_conflicts=True,
+            unique_fields=["title"],
+            update_fields=UPDATE_FIELDS,
+        )
+    return len(unique_books)
+
+
+def import_books(lines, input_format="csv", batch_size=IMPORT_BATCH_SIZE):
+    """
+    Upsert books from an iterable of CSV or JSON Lines text lines.
+
+    Rows are validated with the ``BookSerializer`` rules and written in
+    ``bulk_create(update_conflicts=True)`` batches keyed on the title, so
+    the input is streamed rather than loaded whole. The inventory of the
+    titles already in the catalogue is left as it is. Invalid rows are
+    skipped and reported. Bulk writes bypass the model signals, so the
+    caches are invalidated once at the end, and the autocomplete index is
+    rebuilt in the background after the commit.
+
+    Returns:
+        dict: The number of ``imported`` rows and the per-row ``errors``.
+    """
+    rows = READERS[input_format](lines)
+    imported = 0
+    errors = []
+    while batch := list(islice(rows, batch_size)):
+        books = [
+            book
+            for line_number, row in batch
+            if (book := _validate(line_number, row, errors)) is not None
+        ]
+        if books:
+            imported += _upsert(books)
+
+    if imported:
+        bump_cache_versions("catalogue", "book")
+        rebuild_autocomplete_on_commit()
+    return {"imported": imported, "errors": errors}
@@ -0,0 +1,153 @@
+import random
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from book.models import Book, InventoryShard
+from core.cache import bump_cache_versions
+
+
+def _shard_count(book_id):
+    return (
+        Book.objects.filter(pk=book_id)
+        .values_list("inventory_shard_count", flat=True)
+        .first()
+    )
+
+
+def _take_from_shards(book_id, shard_count):
+    start = random.randrange(shard_count)
+    for offset in range(shard_count):
+        updated = InventoryShard.objects.filter(
+            book_id=book_id,
+            index=(start + offset) % shard_count,
+            inventory__gt=0,
+        ).update(inventory=F("inventory") - 1)
+        if updated:
+            return True
+    return False
+
+
+def checkout_copy(book):
+    """
+    Take one copy of the book out of the inventory.
+
+    The decrement is a single conditional
+    ``UPDATE ... SET inventory = inventory - 1 WHERE inventory > 0`` and the
+    affected row count tells whether a copy was available, so concurrent
+    checkouts can neither oversell nor lose updates. The book ``version`` is
+    moved forward with it, so a concurrent edit of the book made from a
+    stale read fails instead of overwriting the inventory. Sharded books are
+    decremented on one of their shard rows instead.
+
+    Returns:
+        bool: True if a copy was taken, False if none was available.
+    """
+    shard_count = book.inventory_shard_count
+    for _ in range(2):
+        if shard_count:
+            if _take_from_shards(book.pk, shard_count):
+                return True
+        else:
+            updated = Book.objects.filter(
+                pk=book.pk, inventory__gt=0, inventory_shard_count=0
+            ).update(
+                inventory=F("inventory") - 1,
+                version=F("version") + 1,
+                updated_at=timezone.now(),
+            )
+            if updated:
+                book.inventory -= 1
+                return True
+
+        current_shard_count = _shard_count(book.pk)
+        if current_shard_count == shard_count:
+            return False
+        shard_count = book.inventory_shard_count = current_shard_count or 0
+    return False
+
+
+def return_copy(book):
+    """
+    Put one copy of the book back into the inventory.
+    """
+    shard_count = book.inventory_shard_count
+    for _ in range(2):
+        if shard_count:
+            updated = InventoryShard.objects.filter(
+                book_id=book.pk, index=random.randrange(shard_count)
+            ).update(inventory=F("inventory") + 1)
+        else:
+            updated = Book.objects.filter(
+                pk=book.pk, inventory_shard_count=0
+            ).update(
+                inventory=F("inventory") + 1,
+                version=F("version") + 1,
+                updated_at=timezone.now(),
+            )
+            if updated:
+                book.inventory += 1
+        if updated:
+            return
+
+        shard_count = book.inventory_shard_count = _shard_count(book.pk) or 0
+
+
+@transaction.atomic
+def shard_inventory(book, shard_count):
+    """
+    Spread the copies of a hot title over ``shard_count`` shard rows, or
+    merge them back into ``Book.inventory`` when ``shard_count`` is 0.
+    """
+    book = Book.objects.select_for_update().get(pk=book.pk)
+    total = book.inventory
+    if book.inventory_shard_count:
+        total = book.shards.aggregate(total=Sum("inventory"))["total"] or 0
+        book.shards.all().delete()
+
+    if shard_count:
+        InventoryShard.objects.bulk_create(
+            InventoryShard(
+                book=book,
+                index=index,
+                inventory=total // shard_count
+                + (1 if index < total % shard_count else 0),
+            )
+            for index in range(shard_count)
+        )
+
+    Book.objects.filter(pk=book.pk).update(
+        inventory=total,
+        inventory_shard_count=shard_count,
+        version=F("version") + 1,
+        updated_at=timezone.now(),
+    )
+    return total
+
+
+def sync_sharded_inventory():
+    """
+    Refresh ``Book.inventory`` of every sharded book from its shards with a
+    single UPDATE statement, and invalidate the cached book list and the
+    details of the books whose inventory moved.
+    """
+    shard_totals = (
+        InventoryShard.objects.filter(book=OuterRef("pk"))
+        .values("book")
+        .annotate(total=Sum("inventory"))
+        .values("total")
+    )
+    book_ids = list(
+        Book.objects.filter(inventory_shard_count__gt=0)
+        .alias(total=Subquery(shard_totals))
+        .exclude(inventory=F("total"))
+        .values_list("pk", flat=True)
+    )
+    if not book_ids:
+        return 0
+    updated = Book.objects.filter(
+        pk__in=book_ids, inventory_shard_count__gt=0
+    ).update(inventory=Subquery(shard_totals), updated_at=timezone.now())
+    bump_cache_versions("book", *(f"book:{pk}" for pk in book_ids))
+    return updated
@@ -0,0 +1,75 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from book.models import Book
+from book.search import search_books
+from core.seed import build_vocabulary
+
+
+class Command(BaseCommand):
+    help = (
+        "Time ranked book searches, first filling the catalogue with "
+        "synthetic titles up to --titles rows. The synthetic titles are "
+        "rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--titles", type=int, default=1_000_000)
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--limit", type=int, default=20)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument("--max-ms", type=float, default=10.0)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def fill_catalogue(self, target, batch_size, rng, words):
+        existing = Book.objects.count()
+        for start in range(existing, target, batch_size):
+            stop = min(start + batch_size, target)
+            Book.objects.bulk_create(
+                [
+                    Book(
+                        title=f"{' '.join(rng.sample(words, 3))} {number}",
+                        author=" ".join(rng.sample(words, 2)).title(),
+                        inventory=1,
+                        daily_fee=1,
+                    )
+                    for number in range(start, stop)
+                ],
+                batch_size=batch_size,
+            )
+            self.stdout.write(f"{stop} books")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        words = build_vocabulary(rng)
+        with transaction.atomic():
+            self.fill_catalogue(
+                options["titles"], options["batch_size"], rng, words
+            )
+
+            timings = []
+            for _ in range(options["queries"]):
+                query = " ".join(rng.sample(words, rng.randint(1, 2)))
+                queryset = search_books(Book.objects.all(), query).order_by(
+                    "-search_rank", "id"
+                )
+                started = time.perf_counter()
+                list(queryset.values_list("id", flat=True)[: options["limit"]])
+                timings.append((time.perf_counter() - started) * 1000)
+            transaction.set_rollback(True)
+
+        timings.sort()
+        p50 = statistics.median(timings)
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(
+            f"{len(timings)} searches: p50 {p50:.2f} ms, p99 {p99:.2f} ms"
+        )
+        if p99 > options["max_ms"]:
+            raise CommandError(
+                f"p99 search latency {p99:.2f} ms exceeds "
+                f"{options['max_ms']} ms."
+            )
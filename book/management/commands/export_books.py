@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from book.exports import BOOK_EXPORT_FIELDS, book_export_queryset
+from core.export import ExportCommandMixin
+
+
+class Command(ExportCommandMixin, BaseCommand):
+    help = "Stream the book catalogue as CSV or NDJSON."
+
+    export_queryset = book_export_queryset()
+    export_fields = BOOK_EXPORT_FIELDS
@@ -0,0 +1,54 @@
+import sys
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from book.importer import IMPORT_BATCH_SIZE, IMPORT_FORMATS, import_books
+
+
+class Command(BaseCommand):
+    help = (
+        "Upsert books from a CSV or JSON Lines file (or - for stdin), "
+        "keyed on the title."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument(
+            "--format",
+            choices=IMPORT_FORMATS,
+            help="Defaults to the file extension, or csv for stdin.",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=IMPORT_BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive.")
+        path = options["path"]
+        input_format = options["format"] or (
+            "jsonl" if Path(path).suffix in (".jsonl", ".ndjson") else "csv"
+        )
+
+        if path == "-":
+            result = import_books(
+                sys.stdin, input_format, options["batch_size"]
+            )
+        else:
+            try:
+                with open(path, newline="", encoding="utf-8") as lines:
+                    result = import_books(
+                        lines, input_format, options["batch_size"]
+                    )
+            except OSError as error:
+                raise CommandError(error)
+
+        for error in result["errors"]:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {result['imported']} books, "
+                f"{len(result['errors'])} rows rejected"
+            )
+        )
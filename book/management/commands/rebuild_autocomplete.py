@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from book.autocomplete import rebuild_autocomplete_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the Redis title autocomplete index from the database."
+
+    def handle(self, *args, **options):
+        count = rebuild_autocomplete_index()
+        if count is None:
+            raise CommandError("Another rebuild is running.")
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} books"))
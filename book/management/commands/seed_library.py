@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.seed import SEED_BATCH_SIZE, LibrarySeeder, parse_count
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with a reproducible synthetic library: readers, "
+        "books, active, returned and overdue borrowings, and payments."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--borrowings",
+            default="100k",
+            help="Number of borrowings, e.g. 50000, 100k or 2m.",
+        )
+        parser.add_argument(
+            "--users", help="Number of readers (a tenth of the borrowings)."
+        )
+        parser.add_argument(
+            "--books", help="Number of books (a twentieth of the borrowings)."
+        )
+        parser.add_argument("--history-days", type=int, default=730)
+        parser.add_argument("--batch-size", type=int, default=SEED_BATCH_SIZE)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            counts = {
+                name: parse_count(options[name]) if options[name] else None
+                for name in ("borrowings", "users", "books")
+            }
+        except ValueError as error:
+            raise CommandError(f"Invalid count: {error}")
+
+        started = time.perf_counter()
+        seeder = LibrarySeeder(
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+            history_days=options["history_days"],
+            stdout=self.stdout,
+        )
+        created = seeder.seed(**counts)
+        elapsed = time.perf_counter() - started
+        summary = ", ".join(
+            f"{count} {name}" for name, count in created.items()
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Created {summary} in {elapsed:.1f} s.")
+        )
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from book.inventory import shard_inventory
+from book.models import Book
+
+
+class Command(BaseCommand):
+    help = (
+        "Spread the inventory of a hot title over several counter rows, "
+        "or merge it back with --shards 0."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("book_id", type=int)
+        parser.add_argument("--shards", type=int, default=8)
+
+    def handle(self, *args, **options):
+        if options["shards"] < 0:
+            raise CommandError("--shards must not be negative.")
+        try:
+            book = Book.objects.get(pk=options["book_id"])
+        except Book.DoesNotExist:
+            raise CommandError(f"Book {options['book_id']} does not exist.")
+
+        total = shard_inventory(book, options["shards"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{book}: {total} copies over {options['shards']} shards"
+            )
+        )
@@ -0,0 +1,74 @@
+from django.db import migrations
+
+
+# A frozen copy of the statements of book.search at the time of this
+# migration, so that later changes there do not rewrite history.
+POSTGRES_SEARCH_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX book_search_vector_idx ON book_book "
+    "USING GIN ((to_tsvector('simple', "
+    "(book_book.title || ' ' || book_book.author))))",
+    "CREATE INDEX book_search_trigram_idx ON book_book "
+    "USING GIN ((book_book.title || ' ' || book_book.author) "
+    "gin_trgm_ops)",
+]
+POSTGRES_SEARCH_REVERSE_SQL = [
+    "DROP INDEX IF EXISTS book_search_trigram_idx",
+    "DROP INDEX IF EXISTS book_search_vector_idx",
+]
+
+SQLITE_SEARCH_SQL = [
+    "CREATE VIRTUAL TABLE book_book_fts USING fts5("
+    "title, author, content='book_book', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER book_book_fts_insert AFTER INSERT ON book_book BEGIN "
+    "INSERT INTO book_book_fts(rowid, title, author) "
+    "VALUES (new.id, new.title, new.author); END",
+    "CREATE TRIGGER book_book_fts_delete AFTER DELETE ON book_book BEGIN "
+    "INSERT INTO book_book_fts(book_book_fts, rowid, title, author) "
+    "VALUES ('delete', old.id, old.title, old.author); END",
+    "CREATE TRIGGER book_book_fts_update AFTER UPDATE OF title, author "
+    "ON book_book BEGIN "
+    "INSERT INTO book_book_fts(book_book_fts, rowid, title, author) "
+    "VALUES ('delete', old.id, old.title, old.author); "
+    "INSERT INTO book_book_fts(rowid, title, author) "
+    "VALUES (new.id, new.title, new.author); END",
+    "INSERT INTO book_book_fts(book_book_fts) VALUES ('rebuild')",
+]
+SQLITE_SEARCH_REVERSE_SQL = [
+    "DROP TRIGGER IF EXISTS book_book_fts_update",
+    "DROP TRIGGER IF EXISTS book_book_fts_delete",
+    "DROP TRIGGER IF EXISTS book_book_fts_insert",
+    "DROP TABLE IF EXISTS book_book_fts",
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        _run(schema_editor, POSTGRES_SEARCH_SQL)
+    elif vendor == "sqlite":
+        _run(schema_editor, SQLITE_SEARCH_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        _run(schema_editor, POSTGRES_SEARCH_REVERSE_SQL)
+    elif vendor == "sqlite":
+        _run(schema_editor, SQLITE_SEARCH_REVERSE_SQL)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("book", "0002_inventory_shards"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.4 on 2026-10-17 13:14
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("book", "0003_book_search_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(
+                django.db.models.functions.text.Lower(
+                    django.db.models.functions.text.Trim("title")
+                ),
+                name="book_title_key_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.4 on 2026-10-17 18:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("book", "0004_book_title_key_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="book",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(
+                fields=["updated_at", "id"], name="book_updated_at_idx"
+            ),
+        ),
+    ]
@@ -1,4 +1,44 @@
 from django.db import models
+from django.db.models import Count, Q, Value
+from django.db.models.functions import Lower, Trim
+
+
+# Backed by the book_title_key_idx functional index; lookups have to use
+# this exact expression for the index to apply.
+TITLE_KEY = Lower(Trim("title"))
+
+
+def title_key(title):
+    """
+    ``TITLE_KEY`` of a given title, computed by the database as well:
+    SQL ``TRIM`` and ``LOWER`` differ from ``str.strip()`` and
+    ``str.lower()`` (only spaces are trimmed, and SQLite only lowercases
+    ASCII), so a key normalized in Python would miss such titles.
+    """
+    return Lower(Trim(Value(title)))
+
+
+class BookQuerySet(models.QuerySet):
+    def with_unreturned_borrowings_count(self):
+        """
+        Annotate every book with the number of its active borrowings,
+        computed in the same SQL query as the books themselves.
+        """
+        return self.annotate(
+            unreturned_borrowings_count=Count(
+                "borrowings",
+                filter=Q(borrowings__actual_return_date__isnull=True),
+            )
+        )
+
+    def by_title_key(self, title):
+        """
+        Filter the books by title, ignoring case and surrounding
+        whitespace, with a single probe of the title key index.
+        """
+        return self.alias(title_key=TITLE_KEY).filter(
+            title_key=title_key(title)
+        )
 
 
 class Book(models.Model):
@@ -20,6 +60,47 @@ class Book(models.Model):
     )
     inventory = models.PositiveIntegerField()
     daily_fee = models.DecimalField(max_digits=5, decimal_places=2)
+    inventory_shard_count = models.PositiveSmallIntegerField(default=0)
+    version = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = BookQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(TITLE_KEY, name="book_title_key_idx"),
+            # Incremental exports read the books changed since a time.
+            models.Index(
+                fields=["updated_at", "id"], name="book_updated_at_idx"
+            ),
+        ]
 
     def __str__(self):
         return self.title
+
+
+class InventoryShard(models.Model):
+    """
+    A slice of the available copies of a hot title.
+
+    When a book has ``inventory_shard_count`` shards, checkouts and returns
+    update one shard row instead of the book row, so concurrent checkouts of
+    the same title do not queue on a single row lock. ``Book.inventory`` is
+    then a periodically synced total of its shards.
+    """
+
+    book = models.ForeignKey(
+        Book, on_delete=models.CASCADE, related_name="shards"
+    )
+    index = models.PositiveSmallIntegerField()
+    inventory = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["book", "index"], name="unique_book_shard_index"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.book} #{self.index}"
@@ -0,0 +1,171 @@
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import BaseFilterBackend
+
+
+SEARCH_TERM = re.compile(r"\w+")
+
+# The indexed document of a book. The search queries must repeat these
+# expressions verbatim, otherwise Postgres cannot use the GIN indexes.
+PG_DOCUMENT = "(book_book.title || ' ' || book_book.author)"
+PG_VECTOR = f"to_tsvector('simple', {PG_DOCUMENT})"
+
+POSTGRES_SEARCH_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX book_search_vector_idx ON book_book "
+    f"USING GIN (({PG_VECTOR}))",
+    f"CREATE INDEX book_search_trigram_idx ON book_book "
+    f"USING GIN ({PG_DOCUMENT} gin_trgm_ops)",
+]
+POSTGRES_SEARCH_REVERSE_SQL = [
+    "DROP INDEX IF EXISTS book_search_trigram_idx",
+    "DROP INDEX IF EXISTS book_search_vector_idx",
+]
+
+SQLITE_SEARCH_SQL = [
+    "CREATE VIRTUAL TABLE book_book_fts USING fts5("
+    "title, author, content='book_book', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER book_book_fts_insert AFTER INSERT ON book_book BEGIN "
+    "INSERT INTO book_book_fts(rowid, title, author) "
+    "VALUES (new.id, new.title, new.author); END",
+    "CREATE TRIGGER book_book_fts_delete AFTER DELETE ON book_book BEGIN "
+    "INSERT INTO book_book_fts(book_book_fts, rowid, title, author) "
+    "VALUES ('delete', old.id, old.title, old.author); END",
+    "CREATE TRIGGER book_book_fts_update AFTER UPDATE OF title, author "
+    "ON book_book BEGIN "
+    "INSERT INTO book_book_fts(book_book_fts, rowid, title, author) "
+    "VALUES ('delete', old.id, old.title, old.author); "
+    "INSERT INTO book_book_fts(rowid, title, author) "
+    "VALUES (new.id, new.title, new.author); END",
+    "INSERT INTO book_book_fts(book_book_fts) VALUES ('rebuild')",
+]
+SQLITE_SEARCH_REVERSE_SQL = [
+    "DROP TRIGGER IF EXISTS book_book_fts_update",
+    "DROP TRIGGER IF EXISTS book_book_fts_delete",
+    "DROP TRIGGER IF EXISTS book_book_fts_insert",
+    "DROP TABLE IF EXISTS book_book_fts",
+]
+
+
+def ensure_sqlite_search_index(connection):
+    """
+    Re-create the FTS5 table and its triggers if they are missing.
+
+    SQLite rebuilds a table for most schema changes, which silently drops
+    its triggers, so this runs after every migration rather than only in
+    the migration that created the index.
+
+    Returns:
+        bool: True if the index had to be re-created.
+    """
+    trigger_names = {
+        "book_book_fts_insert",
+        "book_book_fts_delete",
+        "book_book_fts_update",
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+            "AND tbl_name = 'book_book'"
+        )
+        if trigger_names <= {name for (name,) in cursor.fetchall()}:
+            return False
+        for statement in SQLITE_SEARCH_REVERSE_SQL + SQLITE_SEARCH_SQL:
+            cursor.execute(statement)
+    return True
+
+
+def search_terms(query):
+    """Split a search query into the word tokens both indexes work on."""
+    return SEARCH_TERM.findall(query.lower())
+
+
+def _postgres_search(queryset, terms, query):
+    # Every term matches as a prefix, so "harr pot" finds "Harry Potter";
+    # the word similarity operator adds the titles that are only
+    # misspelled. It compares the query with the closest words of the
+    # document rather than the whole document, which a short query would
+    # hardly ever be similar enough to.
+    tsquery = " & ".join(f"{term}:*" for term in terms)
+    match = RawSQL(
+        f"({PG_VECTOR} @@ to_tsquery('simple', %s) OR %s <%% {PG_DOCUMENT})",
+        (tsquery, query),
+        output_field=BooleanField(),
+    )
+    rank = RawSQL(
+        f"(ts_rank({PG_VECTOR}, to_tsquery('simple', %s)) "
+        f"+ word_similarity(%s, {PG_DOCUMENT}))",
+        (tsquery, query),
+        output_field=FloatField(),
+    )
+    return queryset.filter(match).annotate(search_rank=rank)
+
+
+def _sqlite_search(queryset, terms, query):
+    fts_query = " ".join(f'"{term}"*' for term in terms)
+    # The matching rowids are read in one pass over the FTS table, then
+    # each matched book looks its rank up by rowid. The rank (bm25) is
+    # lower for better matches and is negated to rank the results the
+    # same way as on Postgres.
+    match = RawSQL(
+        "SELECT rowid FROM book_book_fts WHERE book_book_fts MATCH %s",
+        (fts_query,),
+    )
+    rank = RawSQL(
+        "(SELECT -rank FROM book_book_fts WHERE book_book_fts MATCH %s "
+        "AND rowid = book_book.id)",
+        (fts_query,),
+        output_field=FloatField(),
+    )
+    return queryset.filter(pk__in=match).annotate(search_rank=rank)
+
+
+def search_books(queryset, query):
+    """
+    Filter a book queryset down to the books matching ``query`` and
+    annotate them with a ``search_rank`` (higher is better).
+
+    Postgres matches against a ``tsvector`` and a trigram GIN index over
+    the title and author, so misspelled queries still find their book.
+    SQLite, used by the local setup, matches against an FTS5 table kept in
+    sync by triggers and only supports prefix matching.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset.none()
+    if connection.vendor == "postgresql":
+        return _postgres_search(queryset, terms, query)
+    return _sqlite_search(queryset, terms, query)
+
+
+class BookSearchFilter(BaseFilterBackend):
+    """
+    Ranked full-text search over book titles and authors with
+    ``?search=``.
+
+    Results are ordered by relevance, then by id. Keyset pagination keeps
+    walking the results by its own sort key instead.
+    """
+
+    search_param = "search"
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, "").strip()
+        if not query:
+            return queryset
+        return search_books(queryset, query).order_by("-search_rank", "id")
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.search_param,
+                "required": False,
+                "in": "query",
+                "description": "Words from the title or author of a book.",
+                "schema": {"type": "string"},
+            },
+        ]
@@ -20,8 +20,10 @@ class BookSerializer(serializers.ModelSerializer):
             "inventory",
             "daily_fee",
             "unreturned_borrowings_count",
+            "version",
         )
         read_only_field = ("id",)
+        read_only_fields = ("version",)
 
     def validate(self, data):
         if data["daily_fee"] <= 0:
@@ -31,5 +33,56 @@ class BookSerializer(serializers.ModelSerializer):
 
         return data
 
+    def annotate_queryset(self, queryset):
+        """
+        Count the active borrowings of the books in the query that loads
+        them, instead of once per serialized book.
+        """
+        return queryset.with_unreturned_borrowings_count()
+
     def get_unreturned_borrowings_count(self, obj):
+        count = getattr(obj, "unreturned_borrowings_count", None)
+        if count is not None:
+            return count
         return obj.borrowings.filter(actual_return_date__isnull=True).count()
+
+
+class BookTitleField(serializers.SlugRelatedField):
+    """
+    Resolves a book from its title, ignoring case and surrounding
+    whitespace, through the indexed title key.
+    """
+
+    default_error_messages = {
+        "does_not_exist": "Book with title={value} does not exist.",
+        "invalid": "Invalid value.",
+    }
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("queryset", Book.objects.all())
+        super().__init__(slug_field="title", **kwargs)
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str):
+            self.fail("invalid")
+        books = list(self.get_queryset().by_title_key(data))
+        if not books:
+            self.fail("does_not_exist", value=data)
+        # Titles are only unique case-sensitively, so prefer the exact
+        # title when several books share a key.
+        for book in books:
+            if book.title == data:
+                return book
+        return books[0]
+
+
+class BookImportSerializer(BookSerializer):
+    """
+    Validates one row of a bulk import. Rows are upserted on the title,
+    so the unique title validator, which costs a query per row, is
+    dropped.
+    """
+
+    class Meta(BookSerializer.Meta):
+        fields = ("title", "author", "cover", "inventory", "daily_fee")
+        extra_kwargs = {"title": {"validators": []}}
@@ -1,11 +1,26 @@
-from django.core.cache import cache
+from functools import partial
+
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
+from book.autocomplete import index_book, unindex_book
 from book.models import Book
+from core.cache import bump_cache_versions
 
 
 @receiver([post_save, post_delete], sender=Book)
 def invalidate_cache(sender, instance, **kwargs):
-    cache.delete_pattern("*book_view*")
-    cache.delete_pattern("*borrowing_view*")
+    bump_cache_versions("catalogue", "book")
+
+
+@receiver(post_save, sender=Book)
+def update_autocomplete_index(sender, instance, **kwargs):
+    transaction.on_commit(
+        partial(index_book, instance.pk, instance.title, instance.author)
+    )
+
+
+@receiver(post_delete, sender=Book)
+def remove_from_autocomplete_index(sender, instance, **kwargs):
+    transaction.on_commit(partial(unindex_book, instance.pk))
@@ -0,0 +1,27 @@
+from celery import shared_task
+
+from book.autocomplete import rebuild_autocomplete_index
+from book.inventory import sync_sharded_inventory
+
+
+@shared_task
+def sync_inventory_shards():
+    """
+    Celery task to refresh the displayed inventory of sharded books.
+    """
+    sync_sharded_inventory()
+
+
+@shared_task(bind=True, max_retries=20, default_retry_delay=30)
+def rebuild_autocomplete(self, wait=False):
+    """
+    Celery task to rebuild the autocomplete index, scheduled by a lookup
+    that found it missing or by a bulk write of books.
+
+    With ``wait``, a rebuild holding the lock is not taken as done: the
+    task is retried until it can run its own.
+    """
+    count = rebuild_autocomplete_index()
+    if count is None and wait:
+        raise self.retry()
+    return count
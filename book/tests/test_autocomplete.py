@@ -0,0 +1,166 @@
+from unittest.mock import patch
+
+from celery.exceptions import Retry
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from book import autocomplete as autocomplete_module
+from book.autocomplete import (
+    AUTOCOMPLETE_LOCK_KEY,
+    AUTOCOMPLETE_READY_KEY,
+    autocomplete,
+    book_members,
+    normalize_words,
+    rebuild_autocomplete_index,
+)
+from book.models import Book
+from book.tasks import rebuild_autocomplete
+
+
+class BookAutocompleteTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            for title, author in [
+                ("Harry Potter", "J. K. Rowling"),
+                ("The Hobbit", "J. R. R. Tolkien"),
+                ("Les Misérables", "Victor Hugo"),
+            ]:
+                Book.objects.create(
+                    title=title, author=author, inventory=1, daily_fee=1
+                )
+        rebuild_autocomplete_index()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_normalize_words(self):
+        """Test that words are lowercased and stripped of accents."""
+        self.assertEqual(
+            normalize_words("Les  Misérables!"), ["les", "miserables"]
+        )
+
+    def test_book_members(self):
+        """Test that every word of the title and author starts a member."""
+        self.assertEqual(
+            book_members("The Hobbit", "Tolkien"),
+            [
+                "hobbit\0The Hobbit",
+                "the hobbit\0The Hobbit",
+                "tolkien\0The Hobbit",
+            ],
+        )
+
+    def test_prefix_of_any_word(self):
+        """Test that titles are suggested by a prefix of any word."""
+        self.assertEqual(autocomplete("har"), ["Harry Potter"])
+        self.assertEqual(autocomplete("pott"), ["Harry Potter"])
+        self.assertEqual(autocomplete("tolk"), ["The Hobbit"])
+        self.assertEqual(autocomplete("miser"), ["Les Misérables"])
+        self.assertEqual(autocomplete("harry potter"), ["Harry Potter"])
+        self.assertEqual(autocomplete("zzz"), [])
+
+    def test_limit(self):
+        """Test that no more than the limit is returned."""
+        self.assertEqual(len(autocomplete("j", limit=1)), 1)
+        self.assertEqual(len(autocomplete("j")), 2)
+
+    def test_index_follows_writes(self):
+        """Test that book writes update the index incrementally."""
+        book = Book.objects.get(title="The Hobbit")
+        with self.captureOnCommitCallbacks(execute=True):
+            book.title = "The Silmarillion"
+            book.save()
+        self.assertEqual(autocomplete("hob"), [])
+        self.assertEqual(autocomplete("silm"), ["The Silmarillion"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            book.delete()
+        self.assertEqual(autocomplete("silm"), [])
+
+    @patch("book.tasks.rebuild_autocomplete.delay")
+    def test_missing_index_rebuilt_in_background(self, delay):
+        """
+        Test that lookups missing the index schedule one rebuild and
+        suggest nothing until it is done.
+        """
+        cache.clear()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(autocomplete("har"), [])
+            self.assertEqual(autocomplete("harr"), [])
+        delay.assert_called_once_with()
+
+        rebuild_autocomplete_index()
+        self.assertEqual(autocomplete("har"), ["Harry Potter"])
+        self.assertTrue(
+            cache.client.get_client().exists(AUTOCOMPLETE_READY_KEY)
+        )
+
+    def test_concurrent_rebuild_skipped(self):
+        """Test that a rebuild does not run while another holds the lock."""
+        connection = cache.client.get_client()
+        connection.set(AUTOCOMPLETE_LOCK_KEY, "other")
+
+        self.assertIsNone(rebuild_autocomplete_index())
+        self.assertEqual(connection.get(AUTOCOMPLETE_LOCK_KEY), b"other")
+
+    def test_waiting_rebuild_retried_while_locked(self):
+        """
+        Test that a rebuild asked for by a bulk write is retried, rather
+        than skipped, while another rebuild holds the lock.
+        """
+        connection = cache.client.get_client()
+        connection.set(AUTOCOMPLETE_LOCK_KEY, "other")
+
+        self.assertIsNone(rebuild_autocomplete())
+        with patch.object(rebuild_autocomplete, "retry", return_value=Retry()):
+            with self.assertRaises(Retry):
+                rebuild_autocomplete(wait=True)
+
+        connection.delete(AUTOCOMPLETE_LOCK_KEY)
+        self.assertEqual(rebuild_autocomplete(wait=True), 3)
+
+    def test_writes_during_rebuild_kept(self):
+        """
+        Test that books written while the index is rebuilt are indexed
+        once the rebuilt index replaces the live one.
+        """
+        build_index = autocomplete_module._build_index
+        book = Book.objects.get(title="The Hobbit")
+
+        def build_then_write(*args):
+            count = build_index(*args)
+            with self.captureOnCommitCallbacks(execute=True):
+                book.title = "The Silmarillion"
+                book.save()
+                Book.objects.create(
+                    title="Dune",
+                    author="Frank Herbert",
+                    inventory=1,
+                    daily_fee=1,
+                )
+            return count
+
+        with patch.object(
+            autocomplete_module, "_build_index", side_effect=build_then_write
+        ):
+            self.assertEqual(rebuild_autocomplete_index(), 3)
+
+        self.assertEqual(autocomplete("silm"), ["The Silmarillion"])
+        self.assertEqual(autocomplete("hob"), [])
+        self.assertEqual(autocomplete("dune"), ["Dune"])
+        self.assertFalse(
+            cache.client.get_client().exists(AUTOCOMPLETE_LOCK_KEY)
+        )
+
+    def test_endpoint_does_not_query_the_database(self):
+        """Test that a suggestion request runs no SQL queries."""
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                "/api/books/autocomplete/", {"q": "har", "limit": 5}
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, ["Harry Potter"])
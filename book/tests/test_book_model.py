@@ -1,3 +1,6 @@
+from unittest import skipUnless
+
+from django.db import connection
 from django.test import TestCase
 
 from book.models import Book
@@ -38,3 +41,32 @@ class BookModelTest(TestCase):
                 inventory=3,
                 daily_fee=20.00,
             )
+
+    def test_by_title_key(self):
+        """Test that titles are matched ignoring case and outer spaces"""
+        book = Book.objects.create(
+            title="Key Book", author="Author", inventory=1, daily_fee=1
+        )
+
+        self.assertEqual(
+            list(Book.objects.by_title_key("  key BOOK ")), [book]
+        )
+        self.assertFalse(Book.objects.by_title_key("Key Books").exists())
+
+    def test_by_title_key_matches_exact_titles(self):
+        """Test that titles SQL and Python normalize differently match"""
+        for title in ("Ärger im Paradies", "Tabbed\t", "ÉCOLE"):
+            book = Book.objects.create(
+                title=title, author="Author", inventory=1, daily_fee=1
+            )
+            with self.subTest(title=title):
+                self.assertEqual(
+                    list(Book.objects.by_title_key(title)), [book]
+                )
+
+    @skipUnless(connection.vendor == "sqlite", "SQLite query plan")
+    def test_by_title_key_uses_index(self):
+        """Test that the title key lookup is an index probe"""
+        plan = Book.objects.by_title_key("Key Book").explain()
+
+        self.assertIn("USING INDEX book_title_key_idx", plan)
@@ -0,0 +1,102 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from book.models import Book
+from book.search import search_books, search_terms
+
+
+class BookSearchTest(APITestCase):
+    def setUp(self):
+        for title, author in [
+            ("Harry Potter", "J. K. Rowling"),
+            ("The Casual Vacancy", "J. K. Rowling"),
+            ("The Hobbit", "J. R. R. Tolkien"),
+            ("Potter's Field", "Ellis Peters"),
+        ]:
+            Book.objects.create(
+                title=title, author=author, inventory=1, daily_fee=1
+            )
+
+    def tearDown(self):
+        cache.clear()
+
+    def search(self, query):
+        response = self.client.get("/api/books/", {"search": query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [book["title"] for book in response.data]
+
+    def test_search_terms(self):
+        """Test that queries are split into lowercase word tokens."""
+        self.assertEqual(
+            search_terms(" Harry  POTTER's! "), ["harry", "potter", "s"]
+        )
+
+    def test_search_by_title_and_author(self):
+        """Test that both the title and the author are searched."""
+        self.assertEqual(self.search("hobbit"), ["The Hobbit"])
+        self.assertCountEqual(
+            self.search("rowling"), ["Harry Potter", "The Casual Vacancy"]
+        )
+
+    def test_search_matches_prefixes(self):
+        """Test that every search term matches as a word prefix."""
+        self.assertEqual(self.search("harr pot"), ["Harry Potter"])
+
+    @skipUnless(connection.vendor == "postgresql", "PostgreSQL trigrams")
+    def test_search_matches_misspelled_word(self):
+        """Test that a misspelled word finds the title it is close to."""
+        self.assertEqual(self.search("hary"), ["Harry Potter"])
+
+    def test_search_results_ranked(self):
+        """Test that better matches are listed first."""
+        self.assertEqual(
+            self.search("potter"), ["Harry Potter", "Potter's Field"]
+        )
+
+    def test_search_follows_updates(self):
+        """Test that the index follows renamed and deleted books."""
+        book = Book.objects.get(title="The Hobbit")
+        book.title = "The Silmarillion"
+        book.save()
+
+        self.assertEqual(self.search("hobbit"), [])
+        self.assertEqual(self.search("silmarillion"), ["The Silmarillion"])
+
+        book.delete()
+        self.assertEqual(self.search("silmarillion"), [])
+
+    def test_empty_search_returns_nothing(self):
+        """Test that a query without words matches no books."""
+        self.assertFalse(search_books(Book.objects.all(), "?!").exists())
+
+    def test_search_with_keyset_pagination(self):
+        """Test that search results can be walked with a cursor."""
+        response = self.client.get(
+            "/api/books/", {"search": "rowling", "page_size": 1}
+        )
+
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertIsNotNone(response.data["next"])
+
+    def test_benchmark_command_rolls_back_its_titles(self):
+        """Test that the search benchmark leaves the catalogue as it was."""
+        stdout = StringIO()
+        call_command(
+            "benchmark_search",
+            "--titles",
+            "100",
+            "--queries",
+            "5",
+            "--max-ms",
+            "1000",
+            stdout=stdout,
+        )
+
+        self.assertIn("5 searches", stdout.getvalue())
+        self.assertEqual(Book.objects.count(), 4)
@@ -1,8 +1,13 @@
+import time
+from unittest.mock import patch
+
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
+from django.utils.http import http_date
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from book.inventory import checkout_copy
 from book.models import Book
 
 User = get_user_model()
@@ -30,6 +35,14 @@ class BookViewSetTest(APITestCase):
     def tearDown(self):
         cache.clear()
 
+    def clock(self, now):
+        """Set the time the response caches record and compare changes at."""
+        clock = patch("core.cache.time").start()
+        self.addCleanup(patch.stopall)
+        clock.time.return_value = now
+        clock.time_ns.return_value = int(now * 1e9)
+        return clock
+
     def test_list_books_unauthenticated(self):
         """Test: Unauthenticated users can view the list of books"""
         response = self.client.get("/api/books/")
@@ -78,7 +91,9 @@ class BookViewSetTest(APITestCase):
             "cover": self.book.cover,
             "daily_fee": self.book.daily_fee,
         }
-        response = self.client.put(f"/api/books/{self.book.id}/", data, format="json")
+        response = self.client.put(
+            f"/api/books/{self.book.id}/", data, format="json"
+        )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.book.refresh_from_db()
         self.assertEqual(self.book.inventory, 10)
@@ -93,7 +108,9 @@ class BookViewSetTest(APITestCase):
             "cover": self.book.cover,
             "daily_fee": self.book.daily_fee,
         }
-        response = self.client.put(f"/api/books/{self.book.id}/", data, format="json")
+        response = self.client.put(
+            f"/api/books/{self.book.id}/", data, format="json"
+        )
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
     def test_delete_book_as_superuser(self):
@@ -108,3 +125,261 @@ class BookViewSetTest(APITestCase):
         self.client.force_authenticate(user=self.user)
         response = self.client.delete(f"/api/books/{self.book.id}/")
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_list_books_query_count_does_not_grow_with_books(self):
+        """Test: The book list runs a constant number of queries"""
+        for index in range(5):
+            book = Book.objects.create(
+                title=f"Book {index}",
+                author="Author",
+                inventory=3,
+                daily_fee=1.00,
+            )
+            borrower = User.objects.create_user(
+                email=f"borrower{index}@example.com", password="borrower123"
+            )
+            book.borrowings.create(
+                expected_return_date="2030-01-01", user=borrower
+            )
+
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/books/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        counts = {
+            book["title"]: book["unreturned_borrowings_count"]
+            for book in response.data
+        }
+        self.assertEqual(counts["Test Book"], 0)
+        self.assertEqual(counts["Book 0"], 1)
+
+    def test_book_write_invalidates_cached_list(self):
+        """Test: A cached book list is not served after a book changes"""
+        self.client.get("/api/books/")
+        Book.objects.create(
+            title="Fresh Book",
+            author="Author",
+            inventory=1,
+            daily_fee=1.00,
+        )
+
+        response = self.client.get("/api/books/")
+
+        self.assertIn("Fresh Book", [book["title"] for book in response.data])
+
+    def test_borrowing_invalidates_only_its_book_detail(self):
+        """Test: A borrowing refreshes the detail of the borrowed book"""
+        other_book = Book.objects.create(
+            title="Other Book",
+            author="Author",
+            inventory=1,
+            daily_fee=1.00,
+        )
+        self.client.get(f"/api/books/{self.book.id}/")
+        self.client.get(f"/api/books/{other_book.id}/")
+        self.book.borrowings.create(
+            expected_return_date="2030-01-01", user=self.user
+        )
+
+        with self.assertNumQueries(0):
+            self.client.get(f"/api/books/{other_book.id}/")
+        response = self.client.get(f"/api/books/{self.book.id}/")
+
+        self.assertEqual(response.data["unreturned_borrowings_count"], 1)
+
+    def test_conditional_get_not_modified(self):
+        """Test: An unchanged book list is answered with 304"""
+        response = self.client.get("/api/books/")
+        etag = response["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/books/", HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_conditional_get_detail_not_modified(self):
+        """Test: An unchanged book detail is answered with 304"""
+        etag = self.client.get(f"/api/books/{self.book.id}/")["ETag"]
+        self.assertTrue(etag.startswith(f'"{self.book.id}-1.'))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                f"/api/books/{self.book.id}/", HTTP_IF_NONE_MATCH=etag
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_conditional_get_if_modified_since(self):
+        """Test: A book detail is not sent again if it did not change"""
+        clock = self.clock(time.time())
+        self.client.get(f"/api/books/{self.book.id}/")
+        clock.time.return_value += 1
+        response = self.client.get(f"/api/books/{self.book.id}/")
+
+        response = self.client.get(
+            f"/api/books/{self.book.id}/",
+            HTTP_IF_MODIFIED_SINCE=response["Last-Modified"],
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_last_modified_sent_once_its_second_is_over(self):
+        """
+        Test: Of two writes in the same second, the second one is not
+        missed by a client sending If-Modified-Since
+        """
+        clock = self.clock(1_000_000.2)
+        self.book.save()
+        response = self.client.get(f"/api/books/{self.book.id}/")
+        self.assertNotIn("Last-Modified", response)
+
+        clock.time.return_value = 1_000_000.7
+        self.book.title = "Renamed Book"
+        self.book.save()
+        response = self.client.get(
+            f"/api/books/{self.book.id}/",
+            HTTP_IF_MODIFIED_SINCE=http_date(1_000_000),
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["title"], "Renamed Book")
+
+        clock.time.return_value = 1_000_001.1
+        response = self.client.get(f"/api/books/{self.book.id}/")
+        self.assertEqual(response["Last-Modified"], http_date(1_000_000))
+
+    def test_conditional_get_after_write(self):
+        """Test: A book write changes the ETag of the book list"""
+        etag = self.client.get("/api/books/")["ETag"]
+        self.book.title = "Renamed Book"
+        self.book.save()
+
+        response = self.client.get("/api/books/", HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.data[0]["title"], "Renamed Book")
+
+    def test_update_with_current_version(self):
+        """Test: An update with a matching If-Match is applied"""
+        self.client.force_authenticate(user=self.superuser)
+
+        response = self.client.patch(
+            f"/api/books/{self.book.id}/",
+            {"inventory": 7, "daily_fee": 10.00},
+            format="json",
+            HTTP_IF_MATCH=f'"{self.book.id}-1"',
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["version"], 2)
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.inventory, self.book.version), (7, 2))
+
+    def test_update_with_stale_version(self):
+        """Test: An update based on an outdated read is rejected"""
+        self.client.force_authenticate(user=self.superuser)
+        checkout_copy(self.book)
+
+        response = self.client.patch(
+            f"/api/books/{self.book.id}/",
+            {"inventory": 7, "daily_fee": 10.00},
+            format="json",
+            HTTP_IF_MATCH=f'"{self.book.id}-1"',
+        )
+
+        self.assertEqual(
+            response.status_code, status.HTTP_412_PRECONDITION_FAILED
+        )
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 4)
+
+    def test_update_with_etag_of_detail(self):
+        """Test: The ETag of a book detail can be sent back in If-Match"""
+        self.client.force_authenticate(user=self.superuser)
+        etag = self.client.get(f"/api/books/{self.book.id}/")["ETag"]
+
+        response = self.client.patch(
+            f"/api/books/{self.book.id}/",
+            {"inventory": 7, "daily_fee": 10.00},
+            format="json",
+            HTTP_IF_MATCH=etag,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["version"], 2)
+
+        response = self.client.patch(
+            f"/api/books/{self.book.id}/",
+            {"inventory": 9, "daily_fee": 10.00},
+            format="json",
+            HTTP_IF_MATCH=etag,
+        )
+        self.assertEqual(
+            response.status_code, status.HTTP_412_PRECONDITION_FAILED
+        )
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 7)
+
+    def test_update_with_etag_after_cache_flush(self):
+        """Test: An ETag still holds its version once the cache is gone"""
+        self.client.force_authenticate(user=self.superuser)
+        etag = self.client.get(f"/api/books/{self.book.id}/")["ETag"]
+        cache.clear()
+
+        response = self.client.patch(
+            f"/api/books/{self.book.id}/",
+            {"inventory": 7, "daily_fee": 10.00},
+            format="json",
+            HTTP_IF_MATCH=etag,
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_update_with_etag_of_other_book(self):
+        """Test: The ETag of another book is rejected"""
+        self.client.force_authenticate(user=self.superuser)
+        other_book = Book.objects.create(
+            title="Other Book", author="Author", inventory=1, daily_fee=1
+        )
+        etag = self.client.get(f"/api/books/{other_book.id}/")["ETag"]
+
+        response = self.client.patch(
+            f"/api/books/{self.book.id}/",
+            {"inventory": 7, "daily_fee": 10.00},
+            format="json",
+            HTTP_IF_MATCH=etag,
+        )
+
+        self.assertEqual(
+            response.status_code, status.HTTP_412_PRECONDITION_FAILED
+        )
+
+    def test_update_with_unknown_etag(self):
+        """Test: An ETag the server did not issue is rejected"""
+        self.client.force_authenticate(user=self.superuser)
+
+        response = self.client.patch(
+            f"/api/books/{self.book.id}/",
+            {"inventory": 7, "daily_fee": 10.00},
+            format="json",
+            HTTP_IF_MATCH='"f6e2532e"',
+        )
+
+        self.assertEqual(
+            response.status_code, status.HTTP_412_PRECONDITION_FAILED
+        )
+
+    def test_delete_with_stale_version(self):
+        """Test: A delete based on an outdated read is rejected"""
+        self.client.force_authenticate(user=self.superuser)
+
+        response = self.client.delete(
+            f"/api/books/{self.book.id}/",
+            HTTP_IF_MATCH=f'"{self.book.id}-5"',
+        )
+
+        self.assertEqual(
+            response.status_code, status.HTTP_412_PRECONDITION_FAILED
+        )
+        self.assertTrue(Book.objects.filter(pk=self.book.pk).exists())
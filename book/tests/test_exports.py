@@ -0,0 +1,177 @@
+import csv
+import json
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.utils.timezone import now
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from book.inventory import checkout_copy
+from book.models import Book
+from core.export import parse_since
+
+User = get_user_model()
+
+
+@patch("core.export.EXPORT_SAFETY_LAG", timedelta(0))
+class BookExportTest(APITestCase):
+    def setUp(self):
+        self.books = [
+            Book.objects.create(
+                title=f"Book {number}",
+                author="Author",
+                inventory=number,
+                daily_fee="1.50",
+            )
+            for number in range(3)
+        ]
+        self.admin = User.objects.create_superuser(
+            email="admin@example.com", password="admin123"
+        )
+        self.client.force_authenticate(user=self.admin)
+
+    def tearDown(self):
+        cache.clear()
+
+    def export(self, **params):
+        response = self.client.get("/api/books/export/", params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        body = b"".join(response.streaming_content).decode()
+        return response, body
+
+    def test_export_csv(self):
+        """Test that the catalogue is streamed as CSV ordered by id."""
+        response, body = self.export()
+
+        rows = list(csv.DictReader(StringIO(body)))
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertEqual(
+            [row["title"] for row in rows], ["Book 0", "Book 1", "Book 2"]
+        )
+        self.assertEqual(rows[0]["daily_fee"], "1.50")
+
+    def test_export_ndjson(self):
+        """Test that the catalogue is streamed as NDJSON."""
+        response, body = self.export(output="ndjson")
+
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual(rows[1]["title"], "Book 1")
+        self.assertEqual(rows[1]["inventory"], 1)
+
+    def test_incremental_export(self):
+        """Test that only books added after the watermark are exported."""
+        response, _ = self.export()
+        watermark = response["X-Export-Watermark"]
+
+        Book.objects.create(
+            title="Book 3", author="Author", inventory=1, daily_fee=1
+        )
+        response, body = self.export(since=watermark)
+
+        rows = list(csv.DictReader(StringIO(body)))
+        self.assertEqual([row["title"] for row in rows], ["Book 3"])
+        self.assertGreater(
+            parse_since(response["X-Export-Watermark"]),
+            parse_since(watermark),
+        )
+
+    def test_incremental_export_includes_changed_books(self):
+        """Test that books changed after the watermark are exported again."""
+        response, _ = self.export()
+        watermark = response["X-Export-Watermark"]
+
+        checkout_copy(self.books[2])
+        self.books[0].author = "Other Author"
+        self.books[0].save()
+        _, body = self.export(since=watermark)
+
+        rows = list(csv.DictReader(StringIO(body)))
+        self.assertEqual(
+            [(row["title"], row["author"], row["inventory"]) for row in rows],
+            [("Book 2", "Author", "1"), ("Book 0", "Other Author", "0")],
+        )
+
+    def test_incremental_export_waits_for_the_safety_lag(self):
+        """
+        Test that books changed within the safety lag are left for the
+        next export, whose watermark is before them.
+        """
+        response, _ = self.export()
+        watermark = response["X-Export-Watermark"]
+        Book.objects.create(
+            title="Book 3", author="Author", inventory=1, daily_fee=1
+        )
+
+        with patch("core.export.EXPORT_SAFETY_LAG", timedelta(minutes=1)):
+            response, body = self.export(since=watermark)
+
+        self.assertEqual(list(csv.DictReader(StringIO(body))), [])
+        self.assertLess(
+            parse_since(response["X-Export-Watermark"]),
+            Book.objects.get(title="Book 3").updated_at,
+        )
+
+    def test_export_invalid_since(self):
+        """Test that a watermark which is not a date and time is rejected."""
+        response = self.client.get("/api/books/export/", {"since": "12"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_invalid_output(self):
+        """Test that an unknown output format is rejected."""
+        response = self.client.get("/api/books/export/", {"output": "xml"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_admin_only(self):
+        """Test that regular users cannot export the catalogue."""
+        user = User.objects.create_user(
+            email="user@example.com", password="user123"
+        )
+        self.client.force_authenticate(user=user)
+
+        response = self.client.get("/api/books/export/")
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_conditional_export_admin_only(self):
+        """
+        Test that a conditional request does not get around the
+        permission checks of the export.
+        """
+        response = self.client.get("/api/books/export/")
+        self.assertNotIn("ETag", response)
+        self.client.force_authenticate(user=None)
+
+        response = self.client.get(
+            "/api/books/export/", HTTP_IF_NONE_MATCH="*"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_export_command(self):
+        """Test that the command writes the export and the watermark."""
+        stdout, stderr = StringIO(), StringIO()
+        Book.objects.filter(pk=self.books[0].pk).update(
+            updated_at=now() - timedelta(days=1)
+        )
+
+        call_command(
+            "export_books",
+            "--output",
+            "ndjson",
+            "--since",
+            (now() - timedelta(hours=1)).isoformat(),
+            stdout=stdout,
+            stderr=stderr,
+        )
+
+        self.assertEqual(len(stdout.getvalue().splitlines()), 2)
+        self.assertIn("Next --since: ", stderr.getvalue())
@@ -0,0 +1,206 @@
+import json
+from datetime import date, timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from book.importer import import_books
+from book.inventory import checkout_copy, return_copy
+from book.models import Book
+from borrowing.models import Borrowing
+
+User = get_user_model()
+
+CSV = """title,author,cover,inventory,daily_fee
+Dune,Frank Herbert,HARD,3,1.50
+Emma,Jane Austen,SOFT,2,0
+Ulysses,James Joyce,SOFT,1,2.00
+"""
+
+
+class ImportBooksTest(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email="admin@example.com", password="admin123"
+        )
+        self.user = User.objects.create_user(
+            email="user@example.com", password="user123"
+        )
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_import_csv_reports_invalid_rows(self):
+        """Test that valid rows are imported and invalid ones reported."""
+        result = import_books(StringIO(CSV))
+
+        self.assertEqual(result["imported"], 2)
+        [error] = result["errors"]
+        self.assertEqual(error["line"], 3)
+        self.assertIn("daily_fee", error["errors"])
+        self.assertEqual(
+            set(Book.objects.values_list("title", flat=True)),
+            {"Dune", "Ulysses"},
+        )
+
+    def test_import_updates_existing_titles(self):
+        """Test that rows are upserted on the title."""
+        book = Book.objects.create(
+            title="Dune", author="Unknown", inventory=1, daily_fee=1
+        )
+
+        import_books(StringIO(CSV))
+
+        book.refresh_from_db()
+        self.assertEqual(book.author, "Frank Herbert")
+        self.assertEqual(Book.objects.filter(title="Dune").count(), 1)
+        self.assertEqual(Book.objects.get(title="Ulysses").inventory, 1)
+
+    def test_import_keeps_inventory_of_borrowed_titles(self):
+        """
+        Test that a re-import does not put the copies of a title that are
+        out on loan back on the shelf.
+        """
+        book = Book.objects.create(
+            title="Dune", author="Frank Herbert", inventory=3, daily_fee=1
+        )
+        borrowing = Borrowing.objects.create(
+            book=book,
+            user=self.user,
+            expected_return_date=date.today() + timedelta(days=7),
+        )
+        checkout_copy(book)
+
+        import_books(StringIO(CSV))
+        borrowing.actual_return_date = date.today()
+        borrowing.save()
+        return_copy(book)
+
+        book.refresh_from_db()
+        self.assertEqual(book.inventory, 3)
+
+    def test_import_moves_version_of_existing_titles(self):
+        """Test that an edit read before the import fails its If-Match."""
+        book = Book.objects.create(
+            title="Dune", author="Unknown", inventory=1, daily_fee=1
+        )
+
+        import_books(StringIO(CSV))
+
+        book.refresh_from_db()
+        self.assertEqual(book.version, 2)
+        self.assertEqual(Book.objects.get(title="Ulysses").version, 1)
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.patch(
+            f"/api/books/{book.id}/",
+            {"inventory": 7, "daily_fee": 10.00},
+            format="json",
+            HTTP_IF_MATCH=f'"{book.id}-1"',
+        )
+        self.assertEqual(
+            response.status_code, status.HTTP_412_PRECONDITION_FAILED
+        )
+        book.refresh_from_db()
+        self.assertEqual(book.inventory, 1)
+
+    def test_import_jsonl(self):
+        """Test that JSON Lines input is imported line by line."""
+        lines = [
+            json.dumps(
+                {
+                    "title": "Dune",
+                    "author": "Frank Herbert",
+                    "inventory": 3,
+                    "daily_fee": "1.50",
+                }
+            ),
+            "",
+            "not json",
+        ]
+
+        result = import_books(lines, "jsonl")
+
+        self.assertEqual(result["imported"], 1)
+        self.assertEqual(result["errors"][0]["line"], 3)
+
+    def test_import_writes_in_batches(self):
+        """Test that every batch costs one upsert, not a query per row."""
+        lines = ["title,author,inventory,daily_fee"] + [
+            f"Book {number},Author,1,1" for number in range(10)
+        ]
+
+        # One version bump and one upsert per batch, inside a savepoint
+        # pair.
+        with self.assertNumQueries(8):
+            import_books(lines, batch_size=5)
+
+        self.assertEqual(Book.objects.count(), 10)
+
+    def test_cache_invalidated_once(self):
+        """Test that the caches are invalidated once per import."""
+        with patch("book.importer.bump_cache_versions") as bump:
+            import_books(StringIO(CSV), batch_size=1)
+
+        bump.assert_called_once_with("catalogue", "book")
+
+    @patch("book.tasks.rebuild_autocomplete.delay")
+    def test_autocomplete_rebuilt_after_commit(self, delay):
+        """
+        Test that the autocomplete index is rebuilt in the background once
+        the import has committed, waiting for a rebuild already running.
+        """
+        with self.captureOnCommitCallbacks() as callbacks:
+            import_books(StringIO(CSV), batch_size=1)
+        delay.assert_not_called()
+
+        for callback in callbacks:
+            callback()
+        delay.assert_called_once_with(wait=True)
+
+    def test_import_endpoint(self):
+        """Test that admins can stream a CSV body to the endpoint."""
+        self.client.force_authenticate(user=self.admin)
+
+        response = self.client.post(
+            "/api/books/import/", CSV, content_type="text/csv"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["imported"], 2)
+        self.assertEqual(len(response.data["errors"]), 1)
+
+    def test_import_endpoint_rejects_unknown_content_type(self):
+        """Test that only CSV and JSON Lines bodies are accepted."""
+        self.client.force_authenticate(user=self.admin)
+
+        response = self.client.post(
+            "/api/books/import/", "{}", content_type="application/json"
+        )
+
+        self.assertEqual(
+            response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+        )
+
+    def test_import_endpoint_admin_only(self):
+        """Test that regular users cannot import books."""
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.post(
+            "/api/books/import/", CSV, content_type="text/csv"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_import_command(self):
+        """Test that the command imports a file and lists the rejects."""
+        stdout, stderr = StringIO(), StringIO()
+        with patch("sys.stdin", StringIO(CSV)):
+            call_command("import_books", "-", stdout=stdout, stderr=stderr)
+
+        self.assertIn("Imported 2 books, 1 rows rejected", stdout.getvalue())
+        self.assertIn("line 3", stderr.getvalue())
@@ -0,0 +1,89 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from book.inventory import (
+    checkout_copy,
+    return_copy,
+    shard_inventory,
+    sync_sharded_inventory,
+)
+from book.models import Book
+from core.cache import get_cache_versions
+
+
+class InventoryTest(TestCase):
+    def setUp(self):
+        self.book = Book.objects.create(
+            title="Hot Book", author="Author", inventory=2, daily_fee=1
+        )
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_checkout_decrements_inventory(self):
+        """Test that a checkout takes exactly one copy"""
+        self.assertTrue(checkout_copy(self.book))
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 1)
+
+    def test_checkout_fails_without_copies(self):
+        """Test that the inventory never goes below zero"""
+        self.assertTrue(checkout_copy(self.book))
+        self.assertTrue(checkout_copy(self.book))
+        self.assertFalse(checkout_copy(self.book))
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 0)
+
+    def test_checkout_with_stale_instance(self):
+        """Test that the decrement does not rely on the loaded inventory"""
+        stale_book = Book.objects.get(pk=self.book.pk)
+        self.assertTrue(checkout_copy(self.book))
+        self.assertTrue(checkout_copy(stale_book))
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 0)
+
+    def test_return_increments_inventory(self):
+        """Test that a return puts one copy back"""
+        return_copy(self.book)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 3)
+
+    def test_sharded_checkout_drains_every_shard(self):
+        """Test that checkouts of a sharded book use all of its copies"""
+        self.book.inventory = 5
+        self.book.save()
+        shard_inventory(self.book, 3)
+        self.book.refresh_from_db()
+
+        taken = [checkout_copy(self.book) for _ in range(6)]
+
+        self.assertEqual(taken, [True] * 5 + [False])
+        sync_sharded_inventory()
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 0)
+
+    def test_checkout_after_book_was_sharded(self):
+        """Test that a checkout follows a book that was sharded meanwhile"""
+        stale_book = Book.objects.get(pk=self.book.pk)
+        shard_inventory(self.book, 2)
+
+        self.assertTrue(checkout_copy(stale_book))
+        return_copy(stale_book)
+        shard_inventory(self.book, 0)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 2)
+        self.assertFalse(self.book.shards.exists())
+
+    def test_sync_invalidates_changed_books(self):
+        """Test that the sync invalidates the cache of the synced books"""
+        shard_inventory(self.book, 2)
+        self.assertEqual(sync_sharded_inventory(), 0)
+        scopes = ("book", f"book:{self.book.pk}")
+        versions = get_cache_versions(*scopes)
+
+        self.assertTrue(checkout_copy(self.book))
+
+        self.assertEqual(sync_sharded_inventory(), 1)
+        self.assertNotEqual(get_cache_versions(*scopes), versions)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 1)
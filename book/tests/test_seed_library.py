@@ -0,0 +1,154 @@
+import datetime
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count, F, Q
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from book.models import Book
+from borrowing.models import Borrowing
+from core.seed import SEED_PASSWORD, LibrarySeeder, parse_count
+from payment.models import Payment
+
+
+TODAY = datetime.date(2026, 6, 1)
+
+
+def snapshot():
+    return list(
+        Borrowing.objects.order_by("id").values_list(
+            "user__email",
+            "book__title",
+            "borrow_date",
+            "expected_return_date",
+            "actual_return_date",
+        )
+    )
+
+
+class SeedLibraryTest(TestCase):
+    def tearDown(self):
+        cache.clear()
+
+    def seed(self, seed=0, **kwargs):
+        seeder = LibrarySeeder(seed=seed, batch_size=200, today=TODAY)
+        return seeder.seed(**kwargs)
+
+    def test_counts(self):
+        counts = self.seed(borrowings=1000)
+
+        self.assertEqual(counts["users"], 100)
+        self.assertEqual(counts["books"], 50)
+        self.assertEqual(Borrowing.objects.count(), 1000)
+        self.assertEqual(Payment.objects.count(), counts["payments"])
+        self.assertEqual(
+            Borrowing.objects.filter(actual_return_date__isnull=True).count(),
+            counts["active"],
+        )
+        self.assertGreater(counts["active"], 0)
+        self.assertGreater(counts["overdue"], 0)
+        self.assertGreater(counts["fines"], 0)
+
+    def test_same_seed_same_library(self):
+        self.seed(seed=7, borrowings=300)
+        first = snapshot()
+        Borrowing.objects.all().delete()
+        Book.objects.all().delete()
+        get_user_model().objects.all().delete()
+
+        self.seed(seed=7, borrowings=300)
+        self.assertEqual(snapshot(), first)
+
+    def test_borrowings_are_consistent(self):
+        self.seed(borrowings=1000)
+
+        self.assertGreater(
+            Borrowing.objects.values("borrow_date").distinct().count(), 100
+        )
+        self.assertFalse(
+            Borrowing.objects.filter(
+                actual_return_date__lt=F("borrow_date")
+            ).exists()
+        )
+        self.assertFalse(
+            Borrowing.objects.filter(borrow_date__gt=TODAY).exists()
+        )
+        self.assertFalse(
+            Payment.objects.exclude(user=F("borrowing__user"))
+            .exclude(borrow_date=F("borrowing__borrow_date"))
+            .exists()
+        )
+        fines = Payment.objects.filter(type=Payment.Type.FINE)
+        self.assertEqual(
+            fines.count(),
+            Borrowing.objects.filter(
+                actual_return_date__gt=F("expected_return_date")
+            ).count(),
+        )
+
+    def test_active_borrowings_take_copies_out(self):
+        seeder = LibrarySeeder(batch_size=200, today=TODAY)
+        counts = seeder.seed(borrowings=1000, users=500, books=5)
+
+        books = Book.objects.annotate(
+            active=Count(
+                "borrowings",
+                filter=Q(borrowings__actual_return_date__isnull=True),
+            )
+        )
+        self.assertEqual(
+            {book.pk: book.inventory + book.active for book in books},
+            seeder.copies,
+        )
+        self.assertGreater(counts["active"], 0)
+        self.assertLessEqual(counts["active"], sum(seeder.copies.values()))
+
+    def test_new_borrowings_are_dated_today(self):
+        self.seed(borrowings=100)
+
+        borrowing = Borrowing.objects.create(
+            user=get_user_model()
+            .objects.exclude(borrowings__actual_return_date__isnull=True)
+            .first(),
+            book=Book.objects.first(),
+            expected_return_date=datetime.date.today(),
+        )
+        borrowing.refresh_from_db()
+        self.assertEqual(borrowing.borrow_date, datetime.date.today())
+
+    def test_readers_share_one_password_hash(self):
+        self.seed(borrowings=100)
+
+        users = get_user_model().objects.all()
+        self.assertEqual(users.values("password").distinct().count(), 1)
+        self.assertTrue(users.first().check_password(SEED_PASSWORD))
+
+    def test_rows_are_written_in_batches(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.seed(borrowings=1000)
+
+        self.assertLess(len(queries), 100)
+
+    def test_parse_count(self):
+        self.assertEqual(parse_count("1k"), 1_000)
+        self.assertEqual(parse_count("2.5m"), 2_500_000)
+        self.assertEqual(parse_count("1_000"), 1_000)
+
+    def test_command(self):
+        stdout = StringIO()
+        call_command(
+            "seed_library",
+            "--borrowings",
+            "200",
+            "--users",
+            "50",
+            stdout=stdout,
+        )
+
+        self.assertEqual(get_user_model().objects.count(), 50)
+        self.assertEqual(Borrowing.objects.count(), 200)
+        self.assertIn("200 borrowings", stdout.getvalue())
@@ -1,10 +1,17 @@
+from django.urls import path
 from rest_framework import routers
 
-from book.views import BookViewSet
+from book.views import BookAutocompleteView, BookViewSet
 
 app_name = "book"
 
 router = routers.DefaultRouter()
 router.register("", BookViewSet, basename="books")
 
-urlpatterns = router.urls
+urlpatterns = [
+    path(
+        "autocomplete/",
+        BookAutocompleteView.as_view(),
+        name="books-autocomplete",
+    ),
+] + router.urls
@@ -1,32 +1,164 @@
+import codecs
+
+from django.db import transaction
 from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
-from rest_framework import viewsets
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError, UnsupportedMediaType
+from rest_framework.permissions import AllowAny, IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from book.autocomplete import autocomplete
+from book.exports import BOOK_EXPORT_FIELDS, book_export_queryset
+from book.importer import IMPORT_CONTENT_TYPES, import_books
 from book.models import Book
 from book.permissions import IsAdminOrReadOnly
+from book.search import BookSearchFilter
 from book.serializers import BookSerializer
+from core.cache import versioned_cache_page
+from core.concurrency import claim_version, get_if_match_version
+from core.export import export_response
+from core.pagination import LimitOffsetOrKeysetPagination
+from core.prefetch import PrefetchPlanMixin
 
 
-class BookViewSet(viewsets.ModelViewSet):
+def book_cache_scopes(request, *args, **kwargs):
+    """
+    The book list changes with every book and borrowing write, while a
+    book detail only changes with the catalogue or with that book's
+    borrowings.
+    """
+    if "pk" in kwargs:
+        return ("catalogue", f"book:{kwargs['pk']}")
+    return ("book",)
+
+
+class BookViewSet(PrefetchPlanMixin, viewsets.ModelViewSet):
     """
     ViewSet for handling CRUD operations on the Book model.
     Provides standard actions like list, create,
-    retrieve, update, and delete.
+    retrieve, update, and delete, and ranked search
+    with ``?search=``.
+
+    Updates and deletes are conditional on the ``version`` of the book:
+    the one sent in ``If-Match``, or else the one the request read. A
+    book changed in the meantime is answered with 412.
+
+    The queryset is planned for the serializer of the action, which
+    annotates the books with their active borrowings count.
     """
 
-    queryset = Book.objects.prefetch_related("borrowings")
+    queryset = Book.objects.order_by("id")
     serializer_class = BookSerializer
     permission_classes = [
         IsAdminOrReadOnly,
     ]
+    pagination_class = LimitOffsetOrKeysetPagination
+    keyset_ordering = "id"
+    filter_backends = [BookSearchFilter]
 
-    @method_decorator(cache_page(60 * 5, key_prefix="book_view"))
-    def dispatch(self, request, *args, **kwargs):
+    @method_decorator(
+        versioned_cache_page(
+            60 * 5, key_prefix="book_view", scopes=book_cache_scopes
+        )
+    )
+    def list(self, request, *args, **kwargs):
         """
-        Method to dispatch the request, with caching applied
-        for the crew view.
+        List the books, with caching applied for the book view.
 
         The response is cached for 5 minutes using the
-        key prefix 'book_view'.
+        key prefix 'book_view' and the versions of its cache scopes.
+        Caching is applied to the action rather than to ``dispatch``, so
+        that it runs after authentication and the permission checks.
         """
-        return super().dispatch(request, *args, **kwargs)
+        return super().list(request, *args, **kwargs)
+
+    @method_decorator(
+        versioned_cache_page(
+            60 * 5, key_prefix="book_view", scopes=book_cache_scopes
+        )
+    )
+    def retrieve(self, request, *args, **kwargs):
+        """Retrieve a book, cached like the book list."""
+        return super().retrieve(request, *args, **kwargs)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            claim_version(
+                serializer.instance,
+                get_if_match_version(self.request, serializer.instance.pk),
+            )
+            serializer.save()
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            claim_version(
+                instance, get_if_match_version(self.request, instance.pk)
+            )
+            instance.delete()
+
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="import",
+        permission_classes=[IsAdminUser],
+        parser_classes=[],
+    )
+    def bulk_import(self, request):
+        """
+        Upsert books from a CSV (``text/csv``) or JSON Lines
+        (``application/x-ndjson``) request body, keyed on the title.
+
+        The body is streamed line by line instead of being parsed up
+        front, and every rejected row is reported with its line number.
+        """
+        content_type = request.content_type.split(";")[0].strip()
+        input_format = IMPORT_CONTENT_TYPES.get(content_type)
+        if input_format is None:
+            raise UnsupportedMediaType(content_type)
+
+        lines = codecs.iterdecode(request.stream or (), "utf-8")
+        try:
+            result = import_books(lines, input_format)
+        except UnicodeDecodeError:
+            raise ParseError("The request body must be UTF-8 encoded.")
+        return Response(result, status=status.HTTP_200_OK)
+
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="export",
+        permission_classes=[IsAdminUser],
+    )
+    def export(self, request):
+        """
+        Stream the catalogue as CSV or NDJSON (``?output=``), optionally
+        only the books added or changed after ``?since=``.
+        """
+        return export_response(
+            request, book_export_queryset(), BOOK_EXPORT_FIELDS, "books"
+        )
+
+
+class BookAutocompleteView(APIView):
+    """
+    Title suggestions for a partially typed title or author, served from
+    the Redis autocomplete index.
+
+    Requests are not authenticated, so a keystroke never reaches the
+    database.
+    """
+
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    default_limit = 10
+    max_limit = 50
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get("limit", self.default_limit))
+        except ValueError:
+            limit = self.default_limit
+        limit = max(1, min(limit, self.max_limit))
+        return Response(autocomplete(request.query_params.get("q", ""), limit))
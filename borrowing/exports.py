@@ -0,0 +1,18 @@
+from borrowing.models import Borrowing
+
+
+BORROWING_EXPORT_FIELDS = {
+    "id": "id",
+    "borrow_date": "borrow_date",
+    "expected_return_date": "expected_return_date",
+    "actual_return_date": "actual_return_date",
+    "book_id": "book_id",
+    "book": "book__title",
+    "user_id": "user_id",
+    "user": "user__email",
+    "updated_at": "updated_at",
+}
+
+
+def borrowing_export_queryset():
+    return Borrowing.objects.all()
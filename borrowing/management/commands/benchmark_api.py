@@ -0,0 +1,143 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.benchmark import (
+    CASES,
+    check_result,
+    is_test_database,
+    prepare_fixtures,
+    run_benchmarks,
+    seed_borrowings,
+)
+from core.seed import SEED_BATCH_SIZE, parse_count
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the query count, wall time and peak memory of every API "
+        "endpoint and background task, first filling the database up to "
+        "--volume borrowings. Fails when a threshold or the stored "
+        "baseline is exceeded. Only runs against a test database unless "
+        "--i-know-this-writes-to names the configured one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--volume",
+            default="1k",
+            help="Number of borrowings: 1k, 100k, 1m or a plain number.",
+        )
+        parser.add_argument(
+            "--i-know-this-writes-to",
+            dest="confirmed_database",
+            metavar="DATABASE",
+            help=(
+                "Name of the configured database, to seed it and create "
+                "the benchmark users in it anyway."
+            ),
+        )
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--batch-size", type=int, default=SEED_BATCH_SIZE)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--case",
+            action="append",
+            dest="cases",
+            help="Only run the cases whose name starts with this prefix.",
+        )
+        parser.add_argument("--max-ms", type=float, default=1000.0)
+        parser.add_argument("--max-memory-mb", type=float, default=64.0)
+        parser.add_argument(
+            "--baseline",
+            help="JSON file of stored results to compare against.",
+        )
+        parser.add_argument(
+            "--save-baseline",
+            action="store_true",
+            help="Store the results of this volume in --baseline.",
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.25,
+            help="Allowed time and memory growth over the baseline.",
+        )
+
+    def handle(self, *args, **options):
+        database = str(connection.settings_dict["NAME"])
+        if not is_test_database(connection) and (
+            options["confirmed_database"] != database
+        ):
+            raise CommandError(
+                f"{database} is not a test database and would keep the "
+                f"seeded library and the benchmark users. Pass "
+                f"--i-know-this-writes-to {database} to run anyway."
+            )
+        try:
+            volume = parse_count(options["volume"])
+        except ValueError:
+            raise CommandError(f"Invalid --volume {options['volume']!r}.")
+        if options["save_baseline"] and not options["baseline"]:
+            raise CommandError("--save-baseline needs --baseline.")
+
+        baseline_path = options["baseline"] and Path(options["baseline"])
+        baselines = {}
+        if baseline_path and baseline_path.exists():
+            baselines = json.loads(baseline_path.read_text())
+        baseline = baselines.get(str(volume), {})
+
+        seed_borrowings(
+            volume,
+            options["seed"],
+            options["batch_size"],
+            self.stdout,
+        )
+        fixtures = prepare_fixtures()
+
+        cases = CASES
+        if options["cases"]:
+            cases = [
+                case
+                for case in CASES
+                if case.name.startswith(tuple(options["cases"]))
+            ]
+
+        results = {}
+        failed = []
+        for case, result in run_benchmarks(fixtures, cases, options["repeat"]):
+            results[case.name] = result
+            failures = check_result(
+                case,
+                fixtures,
+                result,
+                baseline.get(case.name),
+                options["max_ms"],
+                options["max_memory_mb"] * 1024,
+                options["tolerance"],
+            )
+            line = (
+                f"{case.name:<26} {result['queries']:>4} queries "
+                f"{result['ms']:>9.2f} ms {result['memory_kb']:>9.1f} KiB"
+            )
+            if failures:
+                failed.append(case.name)
+                self.stdout.write(
+                    self.style.ERROR(f"{line}  FAIL: {'; '.join(failures)}")
+                )
+            else:
+                self.stdout.write(line)
+
+        if options["save_baseline"]:
+            baselines[str(volume)] = {**baseline, **results}
+            baseline_path.write_text(
+                json.dumps(baselines, indent=2, sort_keys=True) + "\n"
+            )
+            self.stdout.write(f"Baseline saved to {baseline_path}.")
+
+        if failed:
+            raise CommandError(
+                f"{len(failed)} benchmark(s) failed: {', '.join(failed)}."
+            )
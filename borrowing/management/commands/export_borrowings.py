@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from borrowing.exports import (
+    BORROWING_EXPORT_FIELDS,
+    borrowing_export_queryset,
+)
+from core.export import ExportCommandMixin
+
+
+class Command(ExportCommandMixin, BaseCommand):
+    help = "Stream the borrowing history as CSV or NDJSON."
+
+    export_queryset = borrowing_export_queryset()
+    export_fields = BORROWING_EXPORT_FIELDS
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-17 12:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("book", "0002_inventory_shards"),
+        ("borrowing", "0002_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name="borrowing",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("actual_return_date__isnull", True)),
+                fields=("user",),
+                name="unique_active_borrowing_per_user",
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.4 on 2026-10-17 12:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("borrowing", "0003_unique_active_borrowing_per_user"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="borrowing",
+            name="overdue_notified_at",
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
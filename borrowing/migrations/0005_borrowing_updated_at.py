@@ -0,0 +1,28 @@
+# Generated by Django 5.1.4 on 2026-10-17 18:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("borrowing", "0004_borrowing_overdue_notified_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="borrowing",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name="borrowing",
+            index=models.Index(
+                fields=["updated_at", "id"],
+                name="borrowing_updated_at_idx",
+            ),
+        ),
+    ]
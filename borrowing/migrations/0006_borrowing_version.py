@@ -0,0 +1,17 @@
+# Generated by Django 5.1.4 on 2026-10-17 13:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("borrowing", "0005_borrowing_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="borrowing",
+            name="version",
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.1.4 on 2026-10-17 13:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("borrowing", "0006_borrowing_version"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="borrowing",
+            index=models.Index(
+                fields=["actual_return_date", "id"],
+                name="borrowing_return_order_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="borrowing",
+            index=models.Index(
+                fields=["user", "actual_return_date", "id"],
+                name="borrowing_user_return_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="borrowing",
+            index=models.Index(
+                models.Case(
+                    models.When(
+                        actual_return_date__isnull=True,
+                        then=models.F("expected_return_date"),
+                    ),
+                    output_field=models.DateField(),
+                ),
+                name="borrowing_active_due_idx",
+            ),
+        ),
+        # Removed around the change of the user column: on PostgreSQL,
+        # dropping its index would also drop this partial index, which
+        # Django introspects as another index of the column.
+        migrations.RemoveConstraint(
+            model_name="borrowing",
+            name="unique_active_borrowing_per_user",
+        ),
+        migrations.AlterField(
+            model_name="borrowing",
+            name="user",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=models.deletion.CASCADE,
+                related_name="borrowings",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="borrowing",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("actual_return_date__isnull", True)),
+                fields=("user",),
+                name="unique_active_borrowing_per_user",
+            ),
+        ),
+    ]
@@ -4,15 +4,50 @@ from django.conf import settings
 from book.models import Book
 
 
+# Backed by the borrowing_active_due_idx expression index; the overdue
+# scans have to filter on this exact expression for the index to apply.
+# Unlike a partial index over the unreturned borrowings, the expression
+# has statistics of its own, so PostgreSQL sees how few of them are due.
+# SQLite keeps no statistics of its ranges and scans the table instead.
+ACTIVE_DUE_DATE = models.Case(
+    models.When(
+        actual_return_date__isnull=True,
+        then=models.F("expected_return_date"),
+    ),
+    output_field=models.DateField(),
+)
+
+
+class BorrowingQuerySet(models.QuerySet):
+    def unreturned_due(self, **lookups):
+        """
+        Filter the unreturned borrowings by their expected return date,
+        e.g. ``unreturned_due(lte=today)``, with a scan of the active due
+        date index.
+        """
+        return self.alias(active_due_date=ACTIVE_DUE_DATE).filter(
+            **{
+                f"active_due_date__{lookup}": value
+                for lookup, value in lookups.items()
+            }
+        )
+
+
 class Borrowing(models.Model):
     """
     Borrowing model with attributes:
-    borrow_date, expected_return_date, actual_return_date, book, user
+    borrow_date, expected_return_date, actual_return_date, book, user,
+    overdue_notified_at (the last day an overdue reminder was sent),
+    version (incremented by every conditional write),
+    updated_at (the last change of an exported column)
     """
 
     borrow_date = models.DateField(auto_now_add=True)
     expected_return_date = models.DateField()
     actual_return_date = models.DateField(null=True, blank=True)
+    overdue_notified_at = models.DateField(null=True, blank=True)
+    version = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
     book = models.ForeignKey(
         Book, on_delete=models.CASCADE, related_name="borrowings"
     )
@@ -20,7 +55,42 @@ class Borrowing(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
         related_name="borrowings",
+        # Covered by borrowing_user_return_idx, which starts with the user.
+        db_index=False,
     )
 
+    objects = BorrowingQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user"],
+                condition=models.Q(actual_return_date__isnull=True),
+                name="unique_active_borrowing_per_user",
+            ),
+        ]
+        # The constraint above doubles as the index of the "active
+        # borrowing of a user" lookup.
+        indexes = [
+            # Borrowing lists: staff order by (actual_return_date, id),
+            # users see their own borrowings in the same order.
+            models.Index(
+                fields=["actual_return_date", "id"],
+                name="borrowing_return_order_idx",
+            ),
+            models.Index(
+                fields=["user", "actual_return_date", "id"],
+                name="borrowing_user_return_idx",
+            ),
+            # The overdue scans only read unreturned borrowings due by a
+            # date.
+            models.Index(ACTIVE_DUE_DATE, name="borrowing_active_due_idx"),
+            # Incremental exports read the borrowings changed since a time.
+            models.Index(
+                fields=["updated_at", "id"],
+                name="borrowing_updated_at_idx",
+            ),
+        ]
+
     def __str__(self):
         return str(self.borrow_date)
@@ -1,37 +1,46 @@
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
 
-from book.models import Book
-from book.serializers import BookSerializer
+from book.serializers import BookSerializer, BookTitleField
 from borrowing.models import Borrowing
 from payment.models import Payment
 
 
+ACTIVE_BORROWING_ERROR = (
+    "It looks like you already have a book borrowed."
+    " Please return it before borrowing another."
+    " Thank you for your understanding!"
+)
+
+
 class BorrowingSerializer(serializers.ModelSerializer):
     """
     Borrowing Serializer with validation for only one active borrowing.
     """
 
-    book = serializers.SlugRelatedField(
-        queryset=Book.objects.all(), slug_field="title"
-    )
+    book = BookTitleField()
 
     class Meta:
         model = Borrowing
         fields = ["id", "expected_return_date", "book"]
 
-    def validate(self, attrs):
-        user = self.context["request"].user
-        active_borrowings = Borrowing.objects.filter(
-            user=user, actual_return_date__isnull=True
-        )
-
-        if active_borrowings.exists():
-            raise serializers.ValidationError(
-                "It looks like you already have a book borrowed."
-                " Please return it before borrowing another."
-                " Thank you for your understanding!"
-            )
-        return attrs
+    def create(self, validated_data):
+        """
+        The "one active borrowing per user" rule is enforced by the
+        unique_active_borrowing_per_user constraint, which also holds
+        for concurrent requests, so no lookup is needed beforehand. An
+        integrity error is only reported as that rule when the user does
+        have an active borrowing, any other one is raised as is.
+        """
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError:
+            if Borrowing.objects.filter(
+                user=validated_data["user"], actual_return_date__isnull=True
+            ).exists():
+                raise serializers.ValidationError(ACTIVE_BORROWING_ERROR)
+            raise
 
 
 class BorrowingReturnBookSerializer(serializers.ModelSerializer):
@@ -77,7 +86,9 @@ class BorrowingListSerializer(serializers.ModelSerializer):
             "actual_return_date",
             "book",
             "payments",
+            "version",
         ]
+        read_only_fields = ["version"]
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
@@ -101,7 +112,9 @@ class BorrowingDetailSerializer(serializers.ModelSerializer):
             "expected_return_date",
             "actual_return_date",
             "book",
+            "version",
         ]
+        read_only_fields = ["version"]
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
@@ -1,9 +1,9 @@
-from django.core.cache import cache
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
 from borrowing.models import Borrowing
-from tg_bot.utils import send_telegram_notification
+from core.cache import bump_cache_versions
+from tg_bot.outbox import enqueue_notification
 
 
 @receiver(post_save, sender=Borrowing)
@@ -12,8 +12,9 @@ def handle_borrowing_creation(instance, created, **kwargs):
     Signal handler to send a notification when a new Borrowing instance is created.
 
     This function listens for the post_save signal of the Borrowing model. If a new
-    borrowing record is created, it sends a Telegram notification with the book title
-    and expected return date.
+    borrowing record is created, it queues a Telegram notification with the
+    book title and expected return date in the transactional outbox, so the
+    message is only sent if the borrowing is committed.
 
     Args:
         instance (Borrowing): The instance of Borrowing that was saved.
@@ -26,9 +27,13 @@ def handle_borrowing_creation(instance, created, **kwargs):
             f"New borrowing for book: {instance.book.title}, "
             f" Expected return date: {instance.expected_return_date}"
         )
-        send_telegram_notification.delay(message)
+        enqueue_notification(message, f"borrowing-created:{instance.pk}")
 
 @receiver([post_save, post_delete], sender=Borrowing)
 def invalidate_cache(sender, instance, **kwargs):
-    cache.delete_pattern("*book_view*")
-    cache.delete_pattern("*borrowing_view*")
+    bump_cache_versions(
+        "book",
+        f"book:{instance.book_id}",
+        "borrowing",
+        f"borrowing:user:{instance.user_id}",
+    )
@@ -1,42 +1,119 @@
 import datetime
+import hashlib
 
 from celery import shared_task
+from django.db import transaction
+from django.db.models import Q
 
-from tg_bot.utils import send_telegram_notification
+from tg_bot.outbox import enqueue_notification
 from borrowing.models import Borrowing
 
 
+OVERDUE_SCAN_CHUNK_SIZE = 500
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+
+def split_message(header, lines, limit=TELEGRAM_MESSAGE_LIMIT):
+    """
+    Join lines under a header into as few messages as possible, each
+    within Telegram's message length limit.
+    """
+    messages = []
+    current = header
+    for line in lines:
+        if len(current) + len(line) + 1 > limit and current != header:
+            messages.append(current)
+            current = header
+        current = f"{current}\n{line}"
+    if current != header:
+        messages.append(current)
+    return messages
+
+
+def overdue_borrowings_to_remind(today):
+    """
+    Unreturned borrowings due by ``today`` that have not been reminded
+    about today, in primary-key order. Served by the
+    borrowing_active_due_idx expression index on PostgreSQL.
+    """
+    return (
+        Borrowing.objects.unreturned_due(lte=today)
+        .filter(
+            Q(overdue_notified_at__isnull=True)
+            | Q(overdue_notified_at__lt=today)
+        )
+        .select_related("user", "book")
+        .only(
+            "id",
+            "borrow_date",
+            "expected_return_date",
+            "user__email",
+            "book__title",
+        )
+        .order_by("pk")
+    )
+
+
 @shared_task
 def send_message():
     """
     Celery task to send reminders for overdue borrowings.
 
-    This task checks for borrowings that are overdue (expected return date has passed)
-    and have not yet been returned. For each overdue borrowing, it sends a Telegram
-    notification to remind the user.
-
-    The notification includes details such as the user's name, book title, borrow date,
-    and the number of days the borrowing is overdue.
+    This task looks for borrowings that are overdue (expected return date has
+    passed), have not yet been returned and have not been reminded about
+    today. It walks them in primary-key chunks, loading the user and the
+    book in the same query, and queues all reminders of the run as one
+    batched Telegram notification in the outbox. The reminded borrowings
+    are stamped with `overdue_notified_at` in the same transaction, so
+    running the task again on the same day sends nothing.
 
     Args:
         None
 
     Returns:
-        None
+        int: The number of borrowings reminded about.
     """
 
     today = datetime.date.today()
-    overdue_borrowings = Borrowing.objects.filter(
-        expected_return_date__lte=today,
-        actual_return_date__isnull=True
-    )
-    for borrowing in overdue_borrowings:
-        message = (
-            f"📚 Borrowing Overdue Reminder ‼️\n"
-            f"User: {borrowing.user.username}\n"
-            f"Book: {borrowing.book.title}\n"
-            f"Borrow Date: {borrowing.borrow_date}\n"
-            f"Expected Return Date: {borrowing.expected_return_date}\n"
-            f"Overdue by: {today - borrowing.expected_return_date} days\n"
+    overdue_borrowings = overdue_borrowings_to_remind(today)
+
+    lines = []
+    notified_ids = []
+    last_id = 0
+    while True:
+        chunk = list(
+            overdue_borrowings.filter(pk__gt=last_id)[:OVERDUE_SCAN_CHUNK_SIZE]
         )
-        send_telegram_notification.delay(message)
+        if not chunk:
+            break
+        for borrowing in chunk:
+            lines.append(
+                f"User: {borrowing.user.email} | "
+                f"Book: {borrowing.book.title} | "
+                f"Borrow Date: {borrowing.borrow_date} | "
+                f"Expected Return Date: {borrowing.expected_return_date} | "
+                f"Overdue by: "
+                f"{(today - borrowing.expected_return_date).days} days"
+            )
+            notified_ids.append(borrowing.pk)
+        last_id = chunk[-1].pk
+
+    if not notified_ids:
+        return 0
+
+    header = f"📚 Borrowing Overdue Reminder ‼️ ({len(notified_ids)})"
+    batch_key = hashlib.md5(
+        ",".join(map(str, notified_ids)).encode(), usedforsecurity=False
+    ).hexdigest()
+    with transaction.atomic():
+        for index, message in enumerate(split_message(header, lines)):
+            enqueue_notification(
+                message, f"overdue:{today}:{batch_key}:{index}"
+            )
+
+        for start in range(0, len(notified_ids), OVERDUE_SCAN_CHUNK_SIZE):
+            Borrowing.objects.filter(
+                pk__in=notified_ids[start : start + OVERDUE_SCAN_CHUNK_SIZE]
+            ).update(overdue_notified_at=today)
+
+    return len(notified_ids)
@@ -0,0 +1,90 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+
+from borrowing.models import Borrowing
+from core.benchmark import ADMIN_EMAIL, CASES, READER_EMAIL
+from payment.models import Payment
+
+
+class BenchmarkApiCommandTest(TestCase):
+    def setUp(self):
+        self.baseline = Path(tempfile.mkdtemp()) / "baseline.json"
+
+    def tearDown(self):
+        cache.clear()
+        self.baseline.unlink(missing_ok=True)
+
+    def benchmark(self, *args):
+        stdout = StringIO()
+        call_command(
+            "benchmark_api",
+            "--volume",
+            "50",
+            "--repeat",
+            "1",
+            "--max-ms",
+            "60000",
+            "--baseline",
+            str(self.baseline),
+            *args,
+            stdout=stdout,
+            stderr=StringIO(),
+        )
+        return stdout.getvalue()
+
+    def test_every_case_within_its_thresholds(self):
+        """Every endpoint and task runs within its query threshold."""
+        output = self.benchmark("--save-baseline")
+
+        self.assertGreaterEqual(Borrowing.objects.count(), 50)
+        self.assertGreaterEqual(
+            Payment.objects.count(), Borrowing.objects.count()
+        )
+        self.assertNotIn("FAIL", output)
+        results = json.loads(self.baseline.read_text())["50"]
+        self.assertEqual(set(results), {case.name for case in CASES})
+
+    def test_query_count_over_baseline_fails(self):
+        """A case running more queries than its baseline fails."""
+        self.benchmark("--case", "books:list", "--save-baseline")
+        baselines = json.loads(self.baseline.read_text())
+        baselines["50"]["books:list"]["queries"] -= 1
+        self.baseline.write_text(json.dumps(baselines))
+
+        with self.assertRaisesMessage(CommandError, "books:list"):
+            self.benchmark("--case", "books:list")
+
+    def test_benchmark_users_cannot_log_in(self):
+        """The benchmark users are created with unusable passwords."""
+        self.benchmark("--case", "users:token")
+
+        for email in (ADMIN_EMAIL, READER_EMAIL):
+            user = get_user_model().objects.get(email=email)
+            self.assertFalse(user.has_usable_password())
+
+    @patch(
+        "borrowing.management.commands.benchmark_api.is_test_database",
+        return_value=False,
+    )
+    def test_refuses_other_databases(self, is_test_database):
+        """Only a test database is written without confirmation."""
+        with self.assertRaisesMessage(CommandError, "not a test database"):
+            self.benchmark("--case", "books:list")
+        self.assertFalse(Borrowing.objects.exists())
+
+        self.benchmark(
+            "--case",
+            "books:list",
+            "--i-know-this-writes-to",
+            str(connection.settings_dict["NAME"]),
+        )
+        self.assertTrue(Borrowing.objects.exists())
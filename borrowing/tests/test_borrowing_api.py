@@ -4,11 +4,16 @@ from rest_framework.test import APITestCase
 from rest_framework import status
 from django.urls import reverse
 from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils.timezone import now
 from django.contrib.auth import get_user_model
 
 from book.models import Book
 from borrowing.models import Borrowing
+from borrowing.serializers import ACTIVE_BORROWING_ERROR
+from core.cache import CACHE_STATS_TIMEOUT, get_cache_stats
+from payment.models import Payment
 
 User = get_user_model()
 
@@ -100,9 +105,288 @@ class BorrowingViewSetTest(APITestCase):
             response.data[0], "This borrowing has already been returned."
         )
 
+    def test_return_book_with_stale_version(self):
+        """Test that a return based on an outdated read is rejected."""
+        borrowing = Borrowing.objects.create(
+            expected_return_date=now().date() + timedelta(days=7),
+            book=self.book,
+            user=self.user,
+        )
+        Borrowing.objects.filter(pk=borrowing.pk).update(version=2)
+
+        response = self.client.post(
+            f"/api/borrowings/{borrowing.id}/return/",
+            HTTP_IF_MATCH=f'"{borrowing.id}-1"',
+        )
+
+        self.assertEqual(
+            response.status_code, status.HTTP_412_PRECONDITION_FAILED
+        )
+        borrowing.refresh_from_db()
+        self.book.refresh_from_db()
+        self.assertIsNone(borrowing.actual_return_date)
+        self.assertEqual(self.book.inventory, 5)
+        self.assertFalse(Payment.objects.exists())
+
+    def test_return_book_with_etag_of_detail(self):
+        """Test that the ETag of a borrowing detail works as If-Match."""
+        borrowing = Borrowing.objects.create(
+            expected_return_date=now().date() + timedelta(days=7),
+            book=self.book,
+            user=self.user,
+        )
+        etag = self.client.get(f"/api/borrowings/{borrowing.id}/")["ETag"]
+
+        response = self.client.post(
+            f"/api/borrowings/{borrowing.id}/return/", HTTP_IF_MATCH=etag
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        borrowing.refresh_from_db()
+        self.assertEqual(borrowing.version, 2)
+
+    def test_return_book_bumps_version(self):
+        """Test that a return moves the borrowing version forward."""
+        borrowing = Borrowing.objects.create(
+            expected_return_date=now().date() + timedelta(days=7),
+            book=self.book,
+            user=self.user,
+        )
+
+        self.client.post(
+            f"/api/borrowings/{borrowing.id}/return/",
+            HTTP_IF_MATCH=f'"{borrowing.id}-1"',
+        )
+
+        borrowing.refresh_from_db()
+        self.assertEqual(borrowing.version, 2)
+
+    def test_return_book_marks_borrowing_changed(self):
+        """
+        Test that a return moves ``updated_at`` forward, so incremental
+        exports pick it up.
+        """
+        borrowing = Borrowing.objects.create(
+            expected_return_date=now().date() + timedelta(days=7),
+            book=self.book,
+            user=self.user,
+        )
+        created_at = borrowing.updated_at
+
+        self.client.post(f"/api/borrowings/{borrowing.id}/return/")
+
+        borrowing.refresh_from_db()
+        self.assertEqual(borrowing.actual_return_date, now().date())
+        self.assertGreater(borrowing.updated_at, created_at)
+
     def test_permission_denied_for_non_authenticated_user(self):
         """Test that non-authenticated users are denied access."""
         self.client.logout()
         url = reverse("borrowing:borrowings-list")
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_list_borrowings_keyset_pagination(self):
+        """Test paging through borrowings with opaque cursors."""
+        self.client.force_authenticate(user=self.staff_user)
+        borrowings = [
+            Borrowing.objects.create(
+                expected_return_date=now().date() + timedelta(days=7),
+                book=self.book,
+                user=User.objects.create_user(
+                    email=f"reader{index}@user.com", password="password123"
+                ),
+            )
+            for index in range(3)
+        ]
+        url = reverse("borrowing:borrowings-list")
+
+        first_page = self.client.get(url, {"page_size": 2})
+        self.assertEqual(first_page.status_code, status.HTTP_200_OK)
+        self.assertNotIn("count", first_page.data)
+        self.assertEqual(
+            [item["id"] for item in first_page.data["results"]],
+            [borrowings[0].id, borrowings[1].id],
+        )
+
+        second_page = self.client.get(first_page.data["next"])
+        self.assertEqual(
+            [item["id"] for item in second_page.data["results"]],
+            [borrowings[2].id],
+        )
+        self.assertIsNone(second_page.data["next"])
+
+    def test_keyset_pages_in_list_order(self):
+        """
+        Test that pages read with a cursor come in the order of the list
+        without one, returned and active borrowings alike.
+        """
+        self.client.force_authenticate(user=self.staff_user)
+        today = now().date()
+        for index, returned in enumerate([3, None, 1, 3, None, 2]):
+            Borrowing.objects.create(
+                expected_return_date=today + timedelta(days=7),
+                book=self.book,
+                user=User.objects.create_user(
+                    email=f"reader{index}@user.com", password="password123"
+                ),
+                actual_return_date=(
+                    None if returned is None else today - timedelta(returned)
+                ),
+            )
+        url = reverse("borrowing:borrowings-list")
+        listed = [item["id"] for item in self.client.get(url).data]
+
+        pages, response = [], self.client.get(url, {"page_size": 2})
+        while True:
+            pages.append([item["id"] for item in response.data["results"]])
+            if response.data["next"] is None:
+                break
+            response = self.client.get(response.data["next"])
+        self.assertEqual(sum(pages, []), listed)
+
+        response = self.client.get(response.data["previous"])
+        self.assertEqual(
+            [item["id"] for item in response.data["results"]], pages[-2]
+        )
+
+    def test_list_borrowings_query_count_does_not_grow(self):
+        """Test that nested books and payments are loaded up front."""
+        self.client.force_authenticate(user=self.staff_user)
+        url = reverse("borrowing:borrowings-list")
+
+        def count_queries():
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, {"page_size": 100})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len(queries)
+
+        Borrowing.objects.create(
+            expected_return_date=now().date() + timedelta(days=7),
+            book=self.book,
+            user=self.user,
+        )
+        queries = count_queries()
+        for index in range(5):
+            borrowing = Borrowing.objects.create(
+                expected_return_date=now().date() + timedelta(days=7),
+                book=Book.objects.create(
+                    title=f"Book {index}",
+                    author="Author",
+                    inventory=1,
+                    daily_fee=1,
+                ),
+                user=User.objects.create_user(
+                    email=f"reader{index}@user.com", password="password123"
+                ),
+            )
+            Payment.objects.create(borrowing=borrowing, money_to_pay=1)
+
+        self.assertEqual(count_queries(), queries)
+
+    def test_cached_list_is_partitioned_by_user(self):
+        """Test that a cached borrowing list is not served to another user."""
+        other_user = User.objects.create_user(
+            email="other@user.com", password="password123"
+        )
+        Borrowing.objects.create(
+            expected_return_date=now().date() + timedelta(days=7),
+            book=self.book,
+            user=self.user,
+        )
+        url = reverse("borrowing:borrowings-list")
+        self.client.get(url)
+
+        self.client.force_authenticate(user=other_user)
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [])
+
+    def test_cached_list_hit_runs_no_queries(self):
+        """Test that a repeated borrowing list is served from the cache."""
+        Borrowing.objects.create(
+            expected_return_date=now().date() + timedelta(days=7),
+            book=self.book,
+            user=self.user,
+        )
+        url = reverse("borrowing:borrowings-list")
+        first_response = self.client.get(url)
+
+        with self.assertNumQueries(0):
+            second_response = self.client.get(url)
+
+        self.assertEqual(second_response.data, first_response.data)
+        stats = get_cache_stats("borrowing_view", self.user.id)
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_cache_stats_expire(self):
+        """Test that the hit/miss counters of a user are not kept forever."""
+        self.client.get(reverse("borrowing:borrowings-list"))
+
+        ttl = cache.ttl(f"borrowing_view:stats:{self.user.id}:misses")
+        self.assertGreater(ttl, 0)
+        self.assertLessEqual(ttl, CACHE_STATS_TIMEOUT)
+
+    def test_conditional_get_per_user(self):
+        """Test that an unchanged list is answered with 304 per user."""
+        url = reverse("borrowing:borrowings-list")
+        etag = self.client.get(url)["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.force_authenticate(user=self.staff_user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_conditional_get_after_borrowing(self):
+        """Test that a new borrowing changes the ETag of the list."""
+        url = reverse("borrowing:borrowings-list")
+        etag = self.client.get(url)["ETag"]
+        Borrowing.objects.create(
+            expected_return_date=now().date() + timedelta(days=7),
+            book=self.book,
+            user=self.user,
+        )
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+
+    def test_payment_write_invalidates_cached_list(self):
+        """Test that a new payment shows up in the cached borrowing list."""
+        borrowing = Borrowing.objects.create(
+            expected_return_date=now().date() + timedelta(days=7),
+            book=self.book,
+            user=self.user,
+        )
+        url = reverse("borrowing:borrowings-list")
+        self.client.get(url)
+        Payment.objects.create(borrowing=borrowing, money_to_pay=7)
+
+        response = self.client.get(url)
+
+        self.assertEqual(len(response.data[0]["payments"]), 1)
+
+    def test_create_second_active_borrowing_rejected(self):
+        """Test that a user with an active borrowing cannot borrow again."""
+        Borrowing.objects.create(
+            expected_return_date=now().date() + timedelta(days=7),
+            book=self.book,
+            user=self.user,
+        )
+        data = {
+            "expected_return_date": (now().date() + timedelta(days=7)),
+            "book": self.book.title,
+        }
+        url = reverse("borrowing:borrowings-list")
+        response = self.client.post(url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], ACTIVE_BORROWING_ERROR)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 5)
@@ -0,0 +1,93 @@
+import csv
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.utils.timezone import now
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from book.models import Book
+from borrowing.models import Borrowing
+
+
+User = get_user_model()
+
+
+@patch("core.export.EXPORT_SAFETY_LAG", timedelta(0))
+class BorrowingExportTest(APITestCase):
+    def setUp(self):
+        self.book = Book.objects.create(
+            title="Test Book", author="Test Author", inventory=5, daily_fee=1
+        )
+        for number in range(2):
+            Borrowing.objects.create(
+                expected_return_date=now().date() + timedelta(days=7),
+                book=self.book,
+                user=User.objects.create_user(
+                    email=f"user{number}@user.com", password="password123"
+                ),
+            )
+        self.admin = User.objects.create_superuser(
+            email="admin@example.com", password="admin123"
+        )
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_export_borrowings(self):
+        """Test that staff can stream the whole borrowing history."""
+        self.client.force_authenticate(user=self.admin)
+
+        response = self.client.get("/api/borrowings/export/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = b"".join(response.streaming_content).decode()
+        rows = list(csv.DictReader(StringIO(body)))
+        self.assertEqual(
+            [row["user"] for row in rows],
+            ["user0@user.com", "user1@user.com"],
+        )
+        self.assertEqual(rows[0]["book"], "Test Book")
+        self.assertEqual(rows[0]["actual_return_date"], "")
+
+    def test_incremental_export_includes_returns(self):
+        """Test that a borrowing returned after the watermark is exported."""
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get("/api/borrowings/export/")
+        watermark = response["X-Export-Watermark"]
+
+        borrowing = Borrowing.objects.get(user__email="user1@user.com")
+        borrowing.actual_return_date = now().date()
+        borrowing.save()
+        response = self.client.get(
+            "/api/borrowings/export/", {"since": watermark}
+        )
+
+        body = b"".join(response.streaming_content).decode()
+        rows = list(csv.DictReader(StringIO(body)))
+        self.assertEqual([row["id"] for row in rows], [str(borrowing.pk)])
+        self.assertEqual(
+            rows[0]["actual_return_date"], str(borrowing.actual_return_date)
+        )
+
+    def test_export_borrowings_staff_only(self):
+        """Test that regular users cannot export the history."""
+        self.client.force_authenticate(
+            user=User.objects.get(email="user0@user.com")
+        )
+
+        response = self.client.get("/api/borrowings/export/")
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_export_borrowings_command(self):
+        """Test that the command streams the history as CSV."""
+        stdout = StringIO()
+
+        call_command("export_borrowings", stdout=stdout, stderr=StringIO())
+
+        self.assertEqual(len(stdout.getvalue().splitlines()), 3)
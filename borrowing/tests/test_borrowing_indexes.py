@@ -0,0 +1,129 @@
+import datetime
+from random import Random
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.test import TestCase
+
+from book.models import Book
+from borrowing.models import Borrowing
+from borrowing.tasks import overdue_borrowings_to_remind
+from payment.accrual import open_overdue_borrowings
+
+
+User = get_user_model()
+
+USERS = 500
+RETURNED_PER_USER = 10
+OVERDUE_SHARE = 0.02
+
+
+class BorrowingIndexTest(TestCase):
+    """
+    The borrowing hot queries, checked against the query plan on a
+    seeded table large enough for the planner to prefer an index.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = Random(0)
+        today = datetime.date.today()
+        password = make_password("password123")
+        users = User.objects.bulk_create(
+            User(email=f"user{number}@user.com", password=password)
+            for number in range(USERS)
+        )
+        books = Book.objects.bulk_create(
+            Book(
+                title=f"Book {number}",
+                author="Author",
+                inventory=1,
+                daily_fee=1,
+            )
+            for number in range(50)
+        )
+        borrowings = []
+        for user in users:
+            for _ in range(RETURNED_PER_USER):
+                borrowings.append(
+                    Borrowing(
+                        user=user,
+                        book=rng.choice(books),
+                        expected_return_date=today
+                        - datetime.timedelta(days=rng.randint(1, 900)),
+                        actual_return_date=today
+                        - datetime.timedelta(days=rng.randint(0, 900)),
+                    )
+                )
+            # Every user has one active borrowing, only a few overdue.
+            overdue = rng.random() < OVERDUE_SHARE
+            borrowings.append(
+                Borrowing(
+                    user=user,
+                    book=rng.choice(books),
+                    expected_return_date=today
+                    + datetime.timedelta(
+                        days=-rng.randint(0, 5)
+                        if overdue
+                        else rng.randint(1, 30)
+                    ),
+                )
+            )
+        Borrowing.objects.bulk_create(borrowings, batch_size=1000)
+        cls.user = users[0]
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def assertUsesIndex(self, queryset, *index_names):
+        plan = queryset.explain()
+        self.assertTrue(
+            any(index_name in plan for index_name in index_names),
+            f"None of {index_names} in the plan:\n{plan}",
+        )
+
+    @skipUnless(connection.vendor == "postgresql", "PostgreSQL query plan")
+    def test_overdue_scan_uses_active_due_index(self):
+        """The overdue scan only reads unreturned borrowings that are due."""
+        self.assertUsesIndex(
+            overdue_borrowings_to_remind(datetime.date.today())[:500],
+            "borrowing_active_due_idx",
+        )
+
+    @skipUnless(connection.vendor == "postgresql", "PostgreSQL query plan")
+    def test_fine_snapshot_scan_uses_active_due_index(self):
+        """The fine snapshot only reads unreturned overdue borrowings."""
+        self.assertUsesIndex(
+            open_overdue_borrowings(datetime.date.today()),
+            "borrowing_active_due_idx",
+        )
+
+    def test_staff_list_uses_order_index(self):
+        """The staff list is read in index order."""
+        self.assertUsesIndex(
+            Borrowing.objects.order_by("actual_return_date", "id")[:100],
+            "borrowing_return_order_idx",
+        )
+
+    def test_user_list_uses_user_index(self):
+        """A page of a user's list is read in index order."""
+        self.assertUsesIndex(
+            Borrowing.objects.filter(user=self.user).order_by(
+                "actual_return_date", "id"
+            )[:100],
+            "borrowing_user_return_idx",
+        )
+
+    def test_active_borrowing_lookup_uses_user_index(self):
+        """
+        The active borrowing of a user is a single index probe, of the
+        user index or of the partial unique constraint.
+        """
+        self.assertUsesIndex(
+            Borrowing.objects.filter(
+                user=self.user, actual_return_date__isnull=True
+            ),
+            "unique_active_borrowing_per_user",
+            "borrowing_user_return_idx",
+        )
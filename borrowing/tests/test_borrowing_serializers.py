@@ -1,8 +1,9 @@
 from datetime import timedelta
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 from rest_framework.test import APITestCase
 from rest_framework.exceptions import ValidationError
+from django.db import IntegrityError
 from django.utils.timezone import now
 from django.contrib.auth import get_user_model
 
@@ -45,8 +46,30 @@ class BorrowingSerializerTest(APITestCase):
         )
         self.assertTrue(serializer.is_valid())
 
+    def test_borrowing_serializer_book_title_case_insensitive(self):
+        """Ensure the book is found regardless of case and outer spaces."""
+        data = {
+            "expected_return_date": (now().date() + timedelta(days=7)),
+            "book": "  test BOOK ",
+        }
+
+        serializer = BorrowingSerializer(data=data)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(serializer.validated_data["book"], self.book)
+
+    def test_borrowing_serializer_unknown_book_title(self):
+        """Ensure an unknown title is reported as a validation error."""
+        data = {
+            "expected_return_date": (now().date() + timedelta(days=7)),
+            "book": "Missing Book",
+        }
+
+        serializer = BorrowingSerializer(data=data)
+        self.assertFalse(serializer.is_valid())
+        self.assertIn("book", serializer.errors)
+
     def test_borrowing_serializer_validation_with_active_borrowings(self):
-        """Ensure validation fails if the user has active borrowings."""
+        """Ensure saving fails if the user has active borrowings."""
         Borrowing.objects.create(
             expected_return_date=now().date() + timedelta(days=7),
             book=self.book,
@@ -63,9 +86,27 @@ class BorrowingSerializerTest(APITestCase):
         serializer = BorrowingSerializer(
             data=data, context={"request": mock_request}
         )
+        serializer.is_valid(raise_exception=True)
 
         with self.assertRaises(ValidationError):
-            serializer.is_valid(raise_exception=True)
+            serializer.save(user=self.user)
+        self.assertEqual(Borrowing.objects.filter(user=self.user).count(), 1)
+
+    def test_borrowing_serializer_other_integrity_error_raised(self):
+        """Ensure other integrity errors are not reported as active ones."""
+        data = {
+            "expected_return_date": (now().date() + timedelta(days=14)),
+            "book": self.book.title,
+        }
+        serializer = BorrowingSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+
+        with patch(
+            "rest_framework.serializers.ModelSerializer.create",
+            side_effect=IntegrityError("NOT NULL constraint failed"),
+        ):
+            with self.assertRaises(IntegrityError):
+                serializer.save(user=self.user)
 
     def test_borrowing_return_book_serializer(self):
         """Test BorrowingReturnBookSerializer handles return_book field correctly."""
@@ -87,7 +128,8 @@ class BorrowingSerializerTest(APITestCase):
             "borrow_date": str(borrowing.borrow_date),
             "expected_return_date": str(borrowing.expected_return_date),
             "book": self.book.title,
-            "payments": []
+            "payments": [],
+            "version": 1,
         }
         self.assertEqual(serializer.data, expected_data)
 
@@ -121,6 +163,8 @@ class BorrowingSerializerTest(APITestCase):
                 "inventory": self.book.inventory,
                 "daily_fee": "1.00",
                 "unreturned_borrowings_count": 1,
+                "version": 1,
             },
+            "version": 1,
         }
         self.assertEqual(serializer.data, expected_data)
@@ -0,0 +1,82 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.utils.timezone import now
+
+from book.models import Book
+from borrowing.models import Borrowing
+from borrowing.tasks import send_message, split_message
+from tg_bot.models import OutboxMessage
+
+
+User = get_user_model()
+
+
+class OverdueReminderTaskTest(TestCase):
+    def setUp(self):
+        self.book = Book.objects.create(
+            title="Test Book", author="Test Author", inventory=5, daily_fee=1
+        )
+        self.today = now().date()
+        for index in range(3):
+            Borrowing.objects.create(
+                expected_return_date=self.today - timedelta(days=index + 1),
+                book=self.book,
+                user=User.objects.create_user(
+                    email=f"late{index}@user.com", password="password123"
+                ),
+            )
+        Borrowing.objects.create(
+            expected_return_date=self.today + timedelta(days=3),
+            book=self.book,
+            user=User.objects.create_user(
+                email="ontime@user.com", password="password123"
+            ),
+        )
+
+    def test_overdue_borrowings_sent_in_one_notification(self):
+        """Test that all overdue borrowings are reported in one message."""
+        OutboxMessage.objects.all().delete()
+        reminded = send_message()
+
+        self.assertEqual(reminded, 3)
+        [message] = OutboxMessage.objects.values_list("text", flat=True)
+        self.assertIn("late0@user.com", message)
+        self.assertIn("late2@user.com", message)
+        self.assertNotIn("ontime@user.com", message)
+
+    def test_overdue_scan_query_count(self):
+        """Test that the scan does not load users and books per row."""
+        # Two chunk reads, the outbox insert, the notified stamp and the
+        # savepoint pair around them.
+        with self.assertNumQueries(6):
+            send_message()
+
+    def test_reminders_not_repeated_on_the_same_day(self):
+        """Test that a second run on the same day sends nothing."""
+        send_message()
+        queued = OutboxMessage.objects.count()
+
+        self.assertEqual(send_message(), 0)
+        self.assertEqual(OutboxMessage.objects.count(), queued)
+
+    def test_reminders_repeated_on_the_next_day(self):
+        """Test that borrowings still overdue are reminded about daily."""
+        send_message()
+        Borrowing.objects.update(
+            overdue_notified_at=self.today - timedelta(days=1)
+        )
+
+        self.assertEqual(send_message(), 3)
+
+
+class SplitMessageTest(TestCase):
+    def test_split_message_respects_limit(self):
+        """Test that long batches are split under the message limit."""
+        messages = split_message("header", ["x" * 40] * 10, limit=100)
+
+        self.assertTrue(all(len(message) <= 100 for message in messages))
+        self.assertEqual(
+            sum(message.count("x" * 40) for message in messages), 10
+        )
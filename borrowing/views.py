@@ -1,16 +1,20 @@
 import datetime
 
 from django.utils import timezone
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
 from django.http import HttpResponseRedirect
+from django.urls import reverse
 from rest_framework import viewsets, mixins, status
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db import transaction
 
+from book.inventory import checkout_copy, return_copy
+from borrowing.exports import (
+    BORROWING_EXPORT_FIELDS,
+    borrowing_export_queryset,
+)
 from borrowing.filters import CustomFilter
 from borrowing.models import Borrowing
 from borrowing.serializers import (
@@ -19,11 +23,17 @@ from borrowing.serializers import (
     BorrowingListSerializer,
     BorrowingReturnBookSerializer,
 )
-from payment.models import Payment
+from core.cache import UserCachedResponseMixin
+from core.concurrency import claim_version, get_if_match_version
+from core.export import export_response
+from core.pagination import LimitOffsetOrKeysetPagination
+from core.prefetch import PrefetchPlanMixin
 from payment.service import create_stripe_session
 
 
 class BorrowingViewSet(
+    UserCachedResponseMixin,
+    PrefetchPlanMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
     mixins.CreateModelMixin,
@@ -32,22 +42,26 @@ class BorrowingViewSet(
     """
     Viewset for borrowing related objects.
     Provides actions: list, create, retrieve.
+
+    List and retrieve responses are cached for 5 minutes per user, and
+    the related rows each action renders are loaded up front by
+    ``PrefetchPlanMixin``.
     """
 
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_class = CustomFilter
+    pagination_class = LimitOffsetOrKeysetPagination
+    keyset_ordering = ("actual_return_date", "id")
+    cache_key_prefix = "borrowing_view"
+    cache_scopes = ("catalogue",)
+    cache_user_scopes = ("borrowing",)
 
     def get_queryset(self):
-        queryset = (
-            Borrowing.objects.select_related("book", "user").
-            prefetch_related("payments")
-        )
+        queryset = Borrowing.objects.order_by(*self.keyset_ordering)
         if self.request.user.is_staff:
-            return queryset.order_by("actual_return_date")
-        return queryset.filter(user=self.request.user).order_by(
-            "actual_return_date"
-        )
+            return queryset
+        return queryset.filter(user=self.request.user)
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -72,21 +86,17 @@ class BorrowingViewSet(
             if datetime.date.today() > expected_return_date:
                 raise ValidationError("No valid expected return date")
 
-            if book.inventory <= 0:
+            if not checkout_copy(book):
                 raise ValidationError("No copies available in inventory.")
 
-            book.inventory -= 1
-            book.save()
-
             borrowing = serializer.save(user=self.request.user)
 
-            create_stripe_session(borrowing, request)
-
-            payment = Payment.objects.get(borrowing=borrowing)
+            payment = create_stripe_session(borrowing, request)
 
-            return HttpResponseRedirect(
-                payment.session_url, status=status.HTTP_302_FOUND
-            )
+        return HttpResponseRedirect(
+            reverse("payment:payments-checkout", args=[payment.id]),
+            status=status.HTTP_302_FOUND,
+        )
 
     @action(
         methods=["POST"],
@@ -97,9 +107,17 @@ class BorrowingViewSet(
     def return_book(self, request, pk=None):
         """
         Additional post action to return a book.
+
+        The return is conditional on the ``version`` of the borrowing (from
+        ``If-Match``, or else the one read here), so of two concurrent
+        returns only one puts the copy back and charges a fine; the other
+        gets a 412.
         """
         with transaction.atomic():
             borrowing = self.get_object()
+            claim_version(
+                borrowing, get_if_match_version(request, borrowing.pk)
+            )
 
             if borrowing.actual_return_date:
                 raise ValidationError(
@@ -107,32 +125,39 @@ class BorrowingViewSet(
                 )
 
             borrowing.actual_return_date = timezone.now().date()
-            borrowing.save()
-
-            book = borrowing.book
-            book.inventory += 1
-            book.save()
+            borrowing.save(
+                update_fields=["actual_return_date", "version", "updated_at"]
+            )
 
-            response = create_stripe_session(borrowing, request)
+            return_copy(borrowing.book)
 
-            if response:
-                return HttpResponseRedirect(
-                    "/api/borrowings/", status=status.HTTP_302_FOUND
-                )
-
-            payment = Payment.objects.filter(type="FINE", borrowing=borrowing)[0]
+            payment = create_stripe_session(borrowing, request)
 
+        if payment == "ok":
             return HttpResponseRedirect(
-                payment.session_url, status=status.HTTP_302_FOUND
+                "/api/borrowings/", status=status.HTTP_302_FOUND
             )
 
-    @method_decorator(cache_page(60 * 5, key_prefix="borrowing_view"))
-    def dispatch(self, request, *args, **kwargs):
-        """
-        Method to dispatch the request, with caching applied
-        for the crew view.
+        return HttpResponseRedirect(
+            reverse("payment:payments-checkout", args=[payment.id]),
+            status=status.HTTP_302_FOUND,
+        )
 
-        The response is cached for 5 minutes using the
-        key prefix 'borrowing_view'.
+    @action(
+        methods=["GET"],
+        detail=False,
+        url_path="export",
+        permission_classes=[IsAdminUser],
+    )
+    def export(self, request):
         """
-        return super().dispatch(request, *args, **kwargs)
+        Stream the borrowing history of all users as CSV or NDJSON
+        (``?output=``), optionally only the borrowings made or changed
+        after ``?since=``.
+        """
+        return export_response(
+            request,
+            borrowing_export_queryset(),
+            BORROWING_EXPORT_FIELDS,
+            "borrowings",
+        )
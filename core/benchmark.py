@@ -0,0 +1,632 @@
+import datetime
+import hashlib
+import hmac
+import json
+import secrets
+import statistics
+import time
+import tracemalloc
+from types import SimpleNamespace
+from urllib.parse import urlencode
+from unittest import mock
+
+import stripe
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.backends.base.creation import TEST_DATABASE_PREFIX
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from drf_spectacular.settings import patched_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from book.autocomplete import rebuild_autocomplete_index
+from book.models import Book
+from borrowing.models import Borrowing
+from borrowing.tasks import send_message
+from core.cache import bump_cache_versions
+from core.export import format_watermark
+from core.seed import SEED_BATCH_SIZE, LibrarySeeder
+from payment.accrual import SNAPSHOT_CHUNK_SIZE
+from payment.fees import get_fee_schedule
+from payment.models import Payment
+from payment.tasks import create_checkout_session, snapshot_fines
+from tg_bot.dispatcher import TelegramDispatcher
+from tg_bot.outbox import enqueue_notification, relay_outbox
+
+
+ADMIN_EMAIL = "benchmark-admin@example.com"
+READER_EMAIL = "benchmark-reader@example.com"
+READER_BORROWINGS = 100
+WEBHOOK_SECRET = "whsec_benchmark"
+PAGE = "?limit=100"
+BOOK_PAYLOAD = {
+    "title": "Benchmark new book",
+    "author": "Benchmark author",
+    "cover": "HARD",
+    "inventory": 3,
+    "daily_fee": "1.50",
+}
+
+
+def is_test_database(connection):
+    """
+    Whether ``connection`` points to a throwaway database: one created by
+    the test runner, or an in-memory SQLite database.
+    """
+    name = str(connection.settings_dict["NAME"])
+    return (
+        name.startswith(TEST_DATABASE_PREFIX)
+        or name == ":memory:"
+        or "mode=memory" in name
+    )
+
+
+def seed_borrowings(target, seed=0, batch_size=SEED_BATCH_SIZE, stdout=None):
+    """
+    Seed a synthetic library until there are ``target`` borrowings.
+
+    Returns:
+        int: The number of borrowings added.
+    """
+    missing = target - Borrowing.objects.count()
+    if missing <= 0:
+        return 0
+    seeder = LibrarySeeder(seed=seed, batch_size=batch_size, stdout=stdout)
+    return seeder.seed(missing)["borrowings"]
+
+
+def _export_since(model, rows=1000):
+    """
+    The ``since`` of an incremental export of about the last ``rows``
+    changed rows of ``model`` (rows changed within the export safety lag
+    are not exported yet), or None to export all of them.
+    """
+    return (
+        model.objects.order_by("-updated_at")
+        .values_list("updated_at", flat=True)[rows : rows + 1]
+        .first()
+    )
+
+
+def prepare_fixtures():
+    """
+    Create the admin and the reader the endpoints are called as, give the
+    reader a full page of returned borrowings with payments, and build
+    the autocomplete index over the seeded catalogue.
+
+    Both users have unusable passwords: the cases authenticate them
+    directly, so they cannot be logged into.
+    """
+    user_model = get_user_model()
+    admin = user_model.objects.filter(email=ADMIN_EMAIL).first()
+    if admin is None:
+        admin = user_model.objects.create_superuser(ADMIN_EMAIL, None)
+    reader = user_model.objects.filter(email=READER_EMAIL).first()
+    if reader is None:
+        reader = user_model.objects.create_user(READER_EMAIL, None)
+    for user in (admin, reader):
+        if user.has_usable_password():
+            user.set_unusable_password()
+            user.save(update_fields=["password"])
+    book = Book.objects.filter(inventory__gt=1).order_by("id").first()
+    if book is None:
+        book = Book.objects.create(
+            title="Benchmark book", author="Author", inventory=5, daily_fee=1
+        )
+
+    today = datetime.date.today()
+    missing = READER_BORROWINGS - reader.borrowings.count()
+    if missing > 0:
+        borrowings = Borrowing.objects.bulk_create(
+            Borrowing(
+                user=reader,
+                book=book,
+                expected_return_date=today,
+                actual_return_date=today,
+            )
+            for _ in range(missing)
+        )
+        Payment.objects.bulk_create(
+            Payment(
+                borrowing=borrowing,
+                user=reader,
+                borrow_date=borrowing.borrow_date,
+                money_to_pay=book.daily_fee,
+                session_id=f"cs_benchmark_{borrowing.pk}",
+                session_url="https://checkout.stripe.test/benchmark",
+            )
+            for borrowing in borrowings
+        )
+    rebuild_autocomplete_index()
+
+    payment = reader.payments.order_by("id").first()
+    return SimpleNamespace(
+        admin=admin,
+        reader=reader,
+        book=book,
+        borrowing=payment.borrowing,
+        payment=payment,
+        borrowing_export_since=_export_since(Borrowing),
+        book_export_since=_export_since(Book),
+        overdue=Borrowing.objects.unreturned_due(lte=today).count(),
+    )
+
+
+class Case:
+    """
+    One benchmarked endpoint or task.
+
+    ``run(client, fixtures, prepared)`` makes the request and returns the
+    response (None for tasks). ``setup(fixtures)``, when given, creates
+    the rows the run needs; it is not measured and is rolled back with
+    the run. ``max_queries`` is a number or a function of the fixtures.
+    """
+
+    def __init__(self, name, run, max_queries, user="reader", setup=None):
+        self.name = name
+        self.run = run
+        self.max_queries = max_queries
+        self.user = user
+        self.setup = setup
+
+    def get_max_queries(self, fixtures):
+        if callable(self.max_queries):
+            return self.max_queries(fixtures)
+        return self.max_queries
+
+
+def _get(url):
+    return lambda client, fixtures, prepared: client.get(url(fixtures))
+
+
+def _post(url, data=None, format="json"):
+    def run(client, fixtures, prepared):
+        payload = data(fixtures, prepared) if callable(data) else data
+        return client.post(url(fixtures, prepared), payload, format=format)
+
+    return run
+
+
+def _active_borrowing(fixtures):
+    return Borrowing.objects.create(
+        user=fixtures.reader,
+        book=fixtures.book,
+        expected_return_date=datetime.date.today(),
+    )
+
+
+def _pending_payment(fixtures):
+    return Payment.objects.create(
+        borrowing=fixtures.borrowing, money_to_pay=fixtures.book.daily_fee
+    )
+
+
+def _pending_messages(fixtures):
+    for index in range(100):
+        enqueue_notification(f"Benchmark {index}", f"benchmark:{index}")
+
+
+def _webhook(client, fixtures, prepared):
+    payload = json.dumps(
+        {
+            "id": "evt_benchmark",
+            "object": "event",
+            "type": "checkout.session.completed",
+            "data": {
+                "object": {
+                    "id": fixtures.payment.session_id,
+                    "object": "checkout.session",
+                    "payment_status": "paid",
+                }
+            },
+        }
+    )
+    timestamp = int(time.time())
+    signature = hmac.new(
+        WEBHOOK_SECRET.encode(),
+        f"{timestamp}.{payload}".encode(),
+        hashlib.sha256,
+    ).hexdigest()
+    return client.post(
+        reverse("payment:payment-webhook"),
+        payload,
+        content_type="application/json",
+        HTTP_STRIPE_SIGNATURE=f"t={timestamp},v1={signature}",
+    )
+
+
+def _import(client, fixtures, prepared):
+    lines = ["title,author,cover,inventory,daily_fee"] + [
+        f"Imported book {index},Importer,SOFT,2,1.25" for index in range(100)
+    ]
+    return client.generic(
+        "POST",
+        reverse("book:books-bulk-import"),
+        "\n".join(lines),
+        content_type="text/csv",
+    )
+
+
+def _export(url_name, since):
+    def url(fixtures):
+        query = {"output": "ndjson"}
+        if getattr(fixtures, since) is not None:
+            query["since"] = format_watermark(getattr(fixtures, since))
+        return f"{reverse(url_name)}?{urlencode(query)}"
+
+    def run(client, fixtures, prepared):
+        response = client.get(url(fixtures))
+        b"".join(response.streaming_content)
+        return response
+
+    return run
+
+
+def _reader_password(fixtures):
+    """Give the reader a one-off password, rolled back with the run."""
+    password = secrets.token_urlsafe()
+    reader = get_user_model().objects.get(pk=fixtures.reader.pk)
+    reader.set_password(password)
+    reader.save(update_fields=["password"])
+    return password
+
+
+def _refresh_token(fixtures):
+    return {"refresh": str(RefreshToken.for_user(fixtures.reader))}
+
+
+def _access_token(fixtures):
+    token = RefreshToken.for_user(fixtures.reader).access_token
+    return {"token": str(token)}
+
+
+def _task(task, *args):
+    def run(client, fixtures, prepared):
+        task(
+            *[
+                arg(fixtures, prepared) if callable(arg) else arg
+                for arg in args
+            ]
+        )
+
+    return run
+
+
+CASES = [
+    Case("books:list", _get(lambda f: f"/api/books/{PAGE}"), 2, user=None),
+    Case(
+        "books:search",
+        _get(lambda f: "/api/books/?search=seed%20author&limit=20"),
+        2,
+        user=None,
+    ),
+    Case(
+        "books:detail",
+        _get(lambda f: f"/api/books/{f.book.pk}/"),
+        1,
+        user=None,
+    ),
+    Case(
+        "books:autocomplete",
+        _get(lambda f: "/api/books/autocomplete/?q=seed"),
+        0,
+        user=None,
+    ),
+    Case(
+        "books:create",
+        _post(lambda f, p: "/api/books/", BOOK_PAYLOAD),
+        3,
+        user="admin",
+    ),
+    Case(
+        "books:update",
+        lambda client, f, p: client.put(
+            f"/api/books/{f.book.pk}/", BOOK_PAYLOAD, format="json"
+        ),
+        6,
+        user="admin",
+    ),
+    # One batch: the version bump of existing titles and the upsert.
+    Case("books:import", _import, 4, user="admin"),
+    Case(
+        "books:export",
+        _export("book:books-export", "book_export_since"),
+        1,
+        user="admin",
+    ),
+    Case(
+        "borrowings:list",
+        _get(lambda f: f"/api/borrowings/{PAGE}"),
+        3,
+    ),
+    Case(
+        "borrowings:list-staff",
+        _get(lambda f: f"/api/borrowings/{PAGE}"),
+        3,
+        user="admin",
+    ),
+    Case(
+        "borrowings:detail",
+        _get(lambda f: f"/api/borrowings/{f.borrowing.pk}/"),
+        2,
+    ),
+    Case(
+        "borrowings:create",
+        _post(
+            lambda f, p: "/api/borrowings/",
+            lambda f, p: {
+                "book": f.book.title,
+                "expected_return_date": datetime.date.today()
+                + datetime.timedelta(days=7),
+            },
+        ),
+        9,
+    ),
+    Case(
+        "borrowings:return",
+        _post(lambda f, p: f"/api/borrowings/{p.pk}/return/"),
+        7,
+        setup=_active_borrowing,
+    ),
+    Case(
+        "borrowings:export",
+        _export("borrowing:borrowings-export", "borrowing_export_since"),
+        1,
+        user="admin",
+    ),
+    Case("payments:list", _get(lambda f: f"/api/payments/{PAGE}"), 3),
+    Case(
+        "payments:list-staff",
+        _get(lambda f: f"/api/payments/{PAGE}"),
+        3,
+        user="admin",
+    ),
+    Case(
+        "payments:detail",
+        _get(lambda f: f"/api/payments/{f.payment.pk}/"),
+        2,
+    ),
+    Case(
+        "payments:checkout",
+        _get(lambda f: f"/api/payments/{f.payment.pk}/checkout/"),
+        1,
+    ),
+    Case(
+        "payments:success",
+        _get(lambda f: f"/api/payments/success/?payment_id={f.payment.pk}"),
+        1,
+    ),
+    Case(
+        "payments:cancel",
+        _get(lambda f: f"/api/payments/cancel/?payment_id={f.payment.pk}"),
+        1,
+    ),
+    Case("payments:webhook", _webhook, 8, user=None),
+    Case(
+        "users:register",
+        _post(
+            lambda f, p: "/api/users/register/",
+            {"email": "benchmark-new@example.com", "password": "secret123"},
+        ),
+        3,
+        user=None,
+    ),
+    Case(
+        "users:token",
+        _post(
+            lambda f, p: "/api/users/token/",
+            lambda f, p: {"email": READER_EMAIL, "password": p},
+        ),
+        2,
+        user=None,
+        setup=_reader_password,
+    ),
+    Case(
+        "users:token-refresh",
+        _post(
+            lambda f, p: "/api/users/token/refresh/",
+            lambda f, p: _refresh_token(f),
+        ),
+        1,
+        user=None,
+    ),
+    Case(
+        "users:token-verify",
+        _post(
+            lambda f, p: "/api/users/token/verify/",
+            lambda f, p: _access_token(f),
+        ),
+        0,
+        user=None,
+    ),
+    Case("users:me", _get(lambda f: "/api/users/me/"), 0),
+    Case("schema", _get(lambda f: "/api/schema/"), 0, user=None),
+    Case(
+        "schema:swagger-ui",
+        _get(lambda f: "/api/schema/swagger-ui/"),
+        0,
+        user=None,
+    ),
+    Case("schema:redoc", _get(lambda f: "/api/schema/redoc/"), 0, user=None),
+    Case("admin:index", _get(lambda f: "/admin/"), 3, user="admin"),
+    Case(
+        "tasks:overdue-reminders",
+        _task(send_message),
+        # Reminders are read and stamped in chunks and queued dozens of
+        # lines per message; a query per borrowing exceeds this.
+        lambda f: 6 + f.overdue // 10,
+        user=None,
+    ),
+    Case(
+        "tasks:relay-outbox",
+        _task(relay_outbox),
+        # A claim and a result transaction per batch of 100 messages.
+        11,
+        user=None,
+        setup=_pending_messages,
+    ),
+    Case(
+        "tasks:checkout-session",
+        _task(
+            create_checkout_session,
+            lambda f, p: p.pk,
+            "http://testserver/success/",
+            "http://testserver/cancel/",
+        ),
+        2,
+        user=None,
+        setup=_pending_payment,
+    ),
+    Case(
+        "tasks:snapshot-fines",
+        _task(snapshot_fines),
+        # A read and an upsert per chunk of overdue borrowings.
+        lambda f: 4 + 2 * (f.overdue // SNAPSHOT_CHUNK_SIZE + 1),
+        user=None,
+    ),
+]
+
+
+def _fake_checkout_session(**kwargs):
+    return SimpleNamespace(
+        id=f"cs_benchmark_{kwargs['idempotency_key']}",
+        url="https://checkout.stripe.test/benchmark",
+    )
+
+
+def _fake_telegram_send(self, messages, chat_id=None):
+    return [True] * len(messages)
+
+
+def _client(case, fixtures):
+    client = APIClient()
+    if case.user is not None:
+        user = getattr(fixtures, case.user)
+        client.force_authenticate(user)
+        client.force_login(user)
+    return client
+
+
+def _invalidate_response_caches(fixtures):
+    bump_cache_versions(
+        "catalogue",
+        "book",
+        "borrowing",
+        f"book:{fixtures.book.pk}",
+        f"borrowing:user:{fixtures.admin.pk}",
+        f"borrowing:user:{fixtures.reader.pk}",
+    )
+
+
+def _measure_once(case, fixtures, client, trace_memory):
+    """
+    Run a case once in a rolled back transaction, with cold response
+    caches, and return its query count, wall time and peak memory.
+    """
+    _invalidate_response_caches(fixtures)
+    with transaction.atomic():
+        prepared = case.setup(fixtures) if case.setup else None
+        if trace_memory:
+            tracemalloc.start()
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = case.run(client, fixtures, prepared)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+        peak_kb = 0
+        if trace_memory:
+            peak_kb = tracemalloc.get_traced_memory()[1] / 1024
+            tracemalloc.stop()
+        transaction.set_rollback(True)
+
+    if response is not None and response.status_code >= 500:
+        raise RuntimeError(f"{case.name} answered {response.status_code}")
+    return len(queries), elapsed_ms, peak_kb
+
+
+def run_case(case, fixtures, repeat=5):
+    """
+    Measure a case: its queries and peak memory on a first, traced run,
+    then its median wall time over ``repeat`` untraced runs.
+
+    Returns:
+        dict: ``queries``, ``ms`` and ``memory_kb``.
+    """
+    client = _client(case, fixtures)
+    queries, _, memory_kb = _measure_once(case, fixtures, client, True)
+    timings = []
+    for _ in range(repeat):
+        run_queries, elapsed_ms, _ = _measure_once(
+            case, fixtures, client, False
+        )
+        queries = max(queries, run_queries)
+        timings.append(elapsed_ms)
+    return {
+        "queries": queries,
+        "ms": round(statistics.median(timings), 3),
+        "memory_kb": round(memory_kb, 1),
+    }
+
+
+def check_result(
+    case, fixtures, result, baseline, max_ms, max_memory_kb, tolerance
+):
+    """
+    Compare a result with the thresholds and with its stored baseline.
+
+    Query counts must not exceed the case threshold or the baseline. Wall
+    time and memory may exceed the baseline by ``tolerance`` (a fraction)
+    but never the global limits.
+
+    Returns:
+        list[str]: The exceeded limits, empty when the case passes.
+    """
+    failures = []
+    max_queries = case.get_max_queries(fixtures)
+    if max_queries is not None and result["queries"] > max_queries:
+        failures.append(f"{result['queries']} queries > {max_queries}")
+    if result["ms"] > max_ms:
+        failures.append(f"{result['ms']:.1f} ms > {max_ms} ms")
+    if result["memory_kb"] > max_memory_kb:
+        failures.append(
+            f"{result['memory_kb']:.0f} KiB > {max_memory_kb:.0f} KiB"
+        )
+    if baseline:
+        if result["queries"] > baseline["queries"]:
+            failures.append(
+                f"{result['queries']} queries > baseline {baseline['queries']}"
+            )
+        for metric, unit in (("ms", "ms"), ("memory_kb", "KiB")):
+            limit = baseline[metric] * (1 + tolerance)
+            if result[metric] > limit:
+                failures.append(
+                    f"{result[metric]:.1f} {unit} > baseline "
+                    f"{baseline[metric]:.1f} {unit} + {tolerance:.0%}"
+                )
+    return failures
+
+
+def run_benchmarks(fixtures, cases=None, repeat=5):
+    """
+    Measure every case with the Stripe and Telegram calls stubbed.
+
+    Yields:
+        tuple: Each case and its result.
+    """
+    with (
+        override_settings(
+            DEBUG=False,
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+            STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET,
+        ),
+        mock.patch.object(
+            stripe.checkout.Session, "create", _fake_checkout_session
+        ),
+        mock.patch.object(TelegramDispatcher, "send", _fake_telegram_send),
+        patched_settings({"DISABLE_ERRORS_AND_WARNINGS": True}),
+    ):
+        # Compiled once per process; not part of any request.
+        get_fee_schedule()
+        for case in cases or CASES:
+            yield case, run_case(case, fixtures, repeat)
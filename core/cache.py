@@ -0,0 +1,371 @@
+import hashlib
+import json
+import time
+import zlib
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_etags, quote_etag
+from django.views.decorators.cache import cache_page
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+
+VERSION_KEY_PREFIX = "cache_version"
+MODIFIED_KEY_PREFIX = "cache_modified"
+# How long the hit/miss counters of a user run before they start over,
+# so the counters of users who stopped coming do not pile up.
+CACHE_STATS_TIMEOUT = 60 * 60 * 24 * 7
+
+
+def _version_key(scope):
+    return f"{VERSION_KEY_PREFIX}:{scope}"
+
+
+def _modified_key(scope):
+    return f"{MODIFIED_KEY_PREFIX}:{scope}"
+
+
+def _initial_version():
+    """
+    Seed for a missing generation counter.
+
+    Counters are seeded from the clock so that a counter which has been
+    evicted never restarts at a value an older cached page was stored under.
+    """
+    return time.time_ns() // 1000
+
+
+def _get_or_seed(seeds):
+    """
+    Read the given keys in one cache round trip, first creating the
+    missing ones with the value of their ``seeds`` callable.
+    """
+    values = cache.get_many(list(seeds))
+    missing = [key for key in seeds if key not in values]
+    if missing:
+        for key in missing:
+            cache.add(key, seeds[key](), timeout=None)
+        values.update(cache.get_many(missing))
+    return [values[key] for key in seeds]
+
+
+def get_cache_versions(*scopes):
+    """
+    Return the current generation of each scope, in order, creating the
+    counters that do not exist yet. Costs one cache round trip when all
+    counters exist.
+    """
+    return _get_or_seed(
+        {_version_key(scope): _initial_version for scope in scopes}
+    )
+
+
+def _last_modified(modified):
+    """
+    The ``Last-Modified`` second of a change made at ``modified``, or None
+    while that second is not over.
+
+    HTTP dates have a one-second resolution, so a client holding the
+    date of the current second could miss a later change in the same
+    second. Once the second is over, a client only gets its date after
+    every change made in it.
+    """
+    if modified is None or int(modified) >= int(time.time()):
+        return None
+    return int(modified)
+
+
+def get_cache_validators(*scopes):
+    """
+    Return the current generation of each scope and the last time any of
+    them was bumped (a UNIX timestamp, see ``_last_modified()``), in one
+    cache round trip.
+
+    A scope whose modification time is unknown counts as modified now.
+    """
+    seeds = {_version_key(scope): _initial_version for scope in scopes}
+    seeds.update({_modified_key(scope): time.time for scope in scopes})
+    values = _get_or_seed(seeds)
+    return values[: len(scopes)], _last_modified(
+        max(values[len(scopes) :], default=None)
+    )
+
+
+def bump_cache_versions(*scopes):
+    """
+    Invalidate everything cached under the given scopes in O(1) per scope,
+    by moving their generation counters forward, and record the time of
+    the change for ``Last-Modified``.
+    """
+    for scope in scopes:
+        key = _version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial_version(), timeout=None)
+    modified = time.time()
+    cache.set_many(
+        {_modified_key(scope): modified for scope in scopes}, timeout=None
+    )
+
+
+def conditional_response(request, etag, last_modified):
+    """
+    Return a 304 response if the client's ``If-None-Match`` or
+    ``If-Modified-Since`` show that its copy is still current, otherwise
+    None. Only GET and HEAD requests are answered conditionally.
+    """
+    if request.method not in ("GET", "HEAD"):
+        return None
+    etag = _held_etag(request, etag)
+    response = get_conditional_response(
+        request, etag=quote_etag(etag), last_modified=last_modified
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified):
+    """Add the ``ETag`` and ``Last-Modified`` headers to a response."""
+    response["ETag"] = quote_etag(etag)
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    return response
+
+
+def versioned_etag(etag, data):
+    """
+    The ``ETag`` of a response rendering ``data``: ``etag``, prefixed with
+    ``<pk>-<version>.`` when ``data`` is a resource with a ``version``, so
+    the client can send it back in ``If-Match`` (see
+    ``core.concurrency.get_if_match_version()``).
+    """
+    if isinstance(data, dict) and "id" in data and "version" in data:
+        return f"{data['id']}-{data['version']}.{etag}"
+    return etag
+
+
+def _held_etag(request, etag):
+    """
+    The ETag of the current representation the client may hold: the
+    versioned ETag ending in ``etag`` that it sends in ``If-None-Match``,
+    or else ``etag``. The version need not be read to tell: every write
+    of a resource moves its scopes, and so ``etag``, on.
+    """
+    for held in parse_etags(request.headers.get("If-None-Match", "")):
+        held = held.removeprefix("W/").strip('"')
+        if held.endswith(f".{etag}"):
+            return held
+    return etag
+
+
+def _etag(*parts):
+    return hashlib.md5(
+        ":".join(str(part) for part in parts).encode(),
+        usedforsecurity=False,
+    ).hexdigest()
+
+
+def versioned_cache_page(timeout, key_prefix, scopes):
+    """
+    Like ``cache_page``, but the key prefix embeds the current generation of
+    every scope returned by ``scopes(request, *args, **kwargs)``. Bumping any
+    of those scopes makes the previously cached pages unreachable; they are
+    left to expire instead of being searched for and deleted.
+
+    The same generations make up the ``ETag`` of the page, and the time of
+    the last bump its ``Last-Modified``, so a client holding a current copy
+    gets a 304 without the page being rendered or read from the cache.
+
+    The 304 is answered before the view runs, so on a DRF view decorate
+    the actions (after authentication and permissions have run) rather
+    than ``dispatch``.
+    """
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view_func(request, *args, **kwargs)
+
+            versions, last_modified = get_cache_validators(
+                *scopes(request, *args, **kwargs)
+            )
+            versioned_prefix = ".".join(
+                [key_prefix, *(str(version) for version in versions)]
+            )
+            etag = _etag(
+                versioned_prefix,
+                request.get_full_path(),
+                request.META.get("HTTP_ACCEPT", ""),
+            )
+            not_modified = conditional_response(request, etag, last_modified)
+            if not_modified is not None:
+                return not_modified
+
+            @wraps(view_func)
+            def render(request, *args, **kwargs):
+                # The ETag is cached with the page: a cached page has no
+                # data left to read the version from.
+                response = view_func(request, *args, **kwargs)
+                if response.status_code == status.HTTP_200_OK:
+                    response["ETag"] = quote_etag(
+                        versioned_etag(etag, getattr(response, "data", None))
+                    )
+                return response
+
+            cached_view = cache_page(timeout, key_prefix=versioned_prefix)(
+                render
+            )
+            response = cached_view(request, *args, **kwargs)
+            if (
+                response.status_code == status.HTTP_200_OK
+                and last_modified is not None
+            ):
+                response["Last-Modified"] = http_date(last_modified)
+            return response
+
+        return _wrapped_view
+
+    return decorator
+
+
+def _increment(key):
+    if not cache.add(key, 1, timeout=CACHE_STATS_TIMEOUT):
+        try:
+            cache.incr(key)
+        except ValueError:
+            pass
+
+
+def get_cache_stats(key_prefix, user_id):
+    """
+    Return the hit/miss counters that ``UserCachedResponseMixin`` keeps
+    for one user of the viewset cached under ``key_prefix``, over the
+    last ``CACHE_STATS_TIMEOUT`` seconds at most.
+    """
+    counters = cache.get_many(
+        [
+            f"{key_prefix}:stats:{user_id}:hits",
+            f"{key_prefix}:stats:{user_id}:misses",
+        ]
+    )
+    hits = counters.get(f"{key_prefix}:stats:{user_id}:hits", 0)
+    misses = counters.get(f"{key_prefix}:stats:{user_id}:misses", 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": hits / total if total else 0.0,
+    }
+
+
+class UserCachedResponseMixin:
+    """
+    Caches ``list`` and ``retrieve`` responses of a DRF viewset per
+    authenticated user.
+
+    Unlike ``cache_page``, which runs before authentication and keys on the
+    URL only, the key is built after DRF has authenticated the request and
+    contains the user id, the action, the object pk, the normalized query
+    parameters and the versions of the cache scopes. Bodies are stored as
+    zlib-compressed JSON and rendered again with the negotiated renderer.
+
+    Views list the scopes their responses depend on in ``cache_scopes``.
+    Scopes in ``cache_user_scopes`` are narrowed to the requesting user
+    (``<scope>:user:<id>``), except for admins, who see the whole scope.
+
+    Responses carry an ``ETag`` derived from that key and a
+    ``Last-Modified`` from the scopes, and conditional requests for an
+    unchanged resource are answered with 304 before the cache is read.
+    """
+
+    cache_key_prefix = None
+    cache_timeout = 60 * 5
+    cache_compress_min_length = 1024
+    cache_scopes = ()
+    cache_user_scopes = ()
+
+    def get_cache_scopes(self):
+        user = self.request.user
+        if user.is_staff:
+            return (*self.cache_scopes, *self.cache_user_scopes)
+        return (
+            *self.cache_scopes,
+            *(f"{scope}:user:{user.pk}" for scope in self.cache_user_scopes),
+        )
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def get_cache_user_id(self):
+        user = self.request.user
+        return user.pk if user.is_authenticated else "anonymous"
+
+    def get_response_cache_key(self, request, versions, **kwargs):
+        query = urlencode(sorted(request.query_params.lists()), doseq=True)
+        versions = ".".join(str(version) for version in versions)
+        digest = hashlib.md5(
+            f"{request.get_host()}?{query}".encode(), usedforsecurity=False
+        ).hexdigest()
+        return ":".join(
+            [
+                self.cache_key_prefix,
+                str(self.get_cache_user_id()),
+                self.action,
+                str(
+                    kwargs.get(self.lookup_url_kwarg or self.lookup_field, "")
+                ),
+                digest,
+                versions,
+            ]
+        )
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        stats_key = f"{self.cache_key_prefix}:stats:{self.get_cache_user_id()}"
+        versions, last_modified = get_cache_validators(
+            *self.get_cache_scopes()
+        )
+        key = self.get_response_cache_key(request, versions, **kwargs)
+        etag = _etag(key, request.META.get("HTTP_ACCEPT", ""))
+        not_modified = conditional_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        body = cache.get(key)
+        if body is not None:
+            _increment(f"{stats_key}:hits")
+            response = Response(self.decode_cached_body(body))
+            return set_validators(
+                response, versioned_etag(etag, response.data), last_modified
+            )
+
+        _increment(f"{stats_key}:misses")
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(
+                key, self.encode_cached_body(response.data), self.cache_timeout
+            )
+            set_validators(
+                response, versioned_etag(etag, response.data), last_modified
+            )
+        return response
+
+    def encode_cached_body(self, data):
+        body = JSONRenderer().render(data)
+        if len(body) >= self.cache_compress_min_length:
+            return b"z" + zlib.compress(body)
+        return b"j" + body
+
+    def decode_cached_body(self, body):
+        if body[:1] == b"z":
+            return json.loads(zlib.decompress(body[1:]))
+        return json.loads(body[1:])
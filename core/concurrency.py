@@ -0,0 +1,57 @@
+from django.db.models import F
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = (
+        "The resource has been modified since you read it. "
+        "Fetch it again and retry."
+    )
+    default_code = "precondition_failed"
+
+
+def get_if_match_version(request, pk):
+    """
+    Return the version the client expects from its ``If-Match`` header,
+    read from the ``ETag`` of the detail response of the resource ``pk``
+    it read, ``"<pk>-<version>.<digest>"`` (see
+    ``core.cache.versioned_etag()``). ``"<pk>-<version>"`` is accepted
+    too. An entity tag of another resource or another form is refused.
+
+    Returns None when the header is missing or ``*``.
+    """
+    header = request.headers.get("If-Match", "").strip()
+    if not header or header == "*":
+        return None
+    if not (header.startswith('"') and header.endswith('"')):
+        raise PreconditionFailed()
+    resource, _, version = header[1:-1].split(".", 1)[0].partition("-")
+    if resource != str(pk) or not version.isdigit():
+        raise PreconditionFailed()
+    return int(version)
+
+
+def claim_version(instance, expected_version=None):
+    """
+    Move the ``version`` of ``instance`` forward, provided it is still
+    ``expected_version`` (by default the version the instance was read
+    with), and raise ``PreconditionFailed`` otherwise.
+
+    This is a single conditional
+    ``UPDATE ... SET version = version + 1 WHERE version = expected``. Run
+    inside the transaction of the write: the updated row stays locked until
+    the commit, so of two concurrent writers that read the same version only
+    the first one gets through, without locking the row while reading.
+    """
+    if expected_version is None:
+        expected_version = instance.version
+    updated = (
+        type(instance)
+        ._default_manager.filter(pk=instance.pk, version=expected_version)
+        .update(version=F("version") + 1)
+    )
+    if not updated:
+        raise PreconditionFailed()
+    instance.version = expected_version + 1
@@ -0,0 +1,166 @@
+import json
+
+from django.db import connection
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    CursorPagination,
+    LimitOffsetPagination,
+    _reverse_ordering,
+)
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Opaque-cursor pagination over a unique, indexed sort key.
+
+    Each page is fetched with a ``WHERE key > position`` range scan instead
+    of an OFFSET, and no COUNT(*) is run, so the cost of a page does not
+    depend on how deep into the collection it is. Views choose the key
+    with the ``keyset_ordering`` attribute (defaults to the primary key).
+
+    The key may span several fields, ending with a unique one, such as
+    ``("actual_return_date", "id")``, so that a view pages in the same
+    order with and without a cursor. The cursor then holds the value of
+    every field, which may be null.
+    """
+
+    ordering = "-id"
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, "keyset_ordering", self.ordering)
+        if isinstance(ordering, str):
+            return (ordering,)
+        return tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ordering = self.get_ordering(request, queryset, view)
+        cursor = super().decode_cursor(request)
+        if len(ordering) == 1 or cursor is None or cursor.position is None:
+            return super().paginate_queryset(queryset, request, view)
+
+        try:
+            values = json.loads(cursor.position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+        queryset = queryset.filter(
+            self.after_position(ordering, values, cursor.reverse)
+        )
+        page = super().paginate_queryset(queryset, request, view)
+        # Paged from the start of the filtered rows: the links back to
+        # the position of the cursor are restored.
+        self.cursor = cursor
+        if cursor.reverse:
+            self.has_next, self.next_position = True, cursor.position
+        else:
+            self.has_previous = True
+            self.previous_position = cursor.position
+        self.display_page_controls = self.template is not None
+        return page
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is None or len(self.ordering) == 1:
+            return cursor
+        # CursorPagination would compare the position with the first field
+        # of the key only; paginate_queryset() has filtered on all of them.
+        return cursor._replace(position=None)
+
+    def after_position(self, ordering, values, reverse=False):
+        """
+        The condition on the rows that come after ``values`` in
+        ``ordering``, or before them when ``reverse``, with nulls sorted
+        where the database puts them.
+        """
+        if reverse:
+            ordering = _reverse_ordering(ordering)
+        condition = None
+        for field, value in reversed(list(zip(ordering, values))):
+            name = field.lstrip("-")
+            descending = field.startswith("-")
+            nulls_after = connection.features.nulls_order_largest != descending
+            if value is None:
+                same = Q(**{f"{name}__isnull": True})
+                after = Q() if nulls_after else Q(**{f"{name}__isnull": False})
+            else:
+                same = Q(**{name: value})
+                after = Q(**{f"{name}__{'lt' if descending else 'gt'}": value})
+                if nulls_after:
+                    after |= Q(**{f"{name}__isnull": True})
+            if condition is None:
+                condition = after
+            elif after:
+                condition = after | (same & condition)
+            else:
+                condition = same & condition
+        return condition
+
+    def _get_position_from_instance(self, instance, ordering):
+        if len(ordering) == 1:
+            return super()._get_position_from_instance(instance, ordering)
+        return json.dumps(
+            [self._get_field_value(instance, field) for field in ordering],
+            default=str,
+        )
+
+    @staticmethod
+    def _get_field_value(instance, field):
+        name = field.lstrip("-")
+        if isinstance(instance, dict):
+            return instance[name]
+        for attribute in name.split("__"):
+            instance = getattr(instance, attribute)
+        return instance
+
+
+class LimitOffsetOrKeysetPagination(LimitOffsetPagination):
+    """
+    Limit/offset pagination that switches to keyset pagination when the
+    client asks for it with ``?page_size=`` (first page) or ``?cursor=``
+    (following pages, taken from the ``next``/``previous`` links).
+    """
+
+    keyset_pagination_class = KeysetPagination
+
+    def __init__(self):
+        self.keyset = None
+
+    def uses_keyset(self, request):
+        keyset_params = (
+            self.keyset_pagination_class.cursor_query_param,
+            self.keyset_pagination_class.page_size_query_param,
+        )
+        return any(param in request.query_params for param in keyset_params)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.uses_keyset(request):
+            self.keyset = self.keyset_pagination_class()
+            page = self.keyset.paginate_queryset(queryset, request, view)
+            self.display_page_controls = self.keyset.display_page_controls
+            return page
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def to_html(self):
+        if self.keyset is not None:
+            return self.keyset.to_html()
+        return super().to_html()
+
+    def get_schema_operation_parameters(self, view):
+        keyset_parameters = (
+            self.keyset_pagination_class().get_schema_operation_parameters(
+                view
+            )
+        )
+        return (
+            super().get_schema_operation_parameters(view) + keyset_parameters
+        )
@@ -0,0 +1,151 @@
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.relations import PrimaryKeyRelatedField
+
+
+def _relations(model):
+    """Map the attribute names of the relations of ``model`` to them."""
+    relations = {}
+    for field in model._meta.get_fields():
+        if not field.is_relation:
+            continue
+        if field.auto_created and not field.concrete:
+            relations[field.get_accessor_name()] = field
+        else:
+            relations[field.name] = field
+    return relations
+
+
+def _is_many(relation):
+    return relation.many_to_many or relation.one_to_many
+
+
+def _nested_queryset(serializer, model):
+    return plan_queryset(model._default_manager.all(), serializer)
+
+
+class _Plan:
+    def __init__(self):
+        self.select_related = []
+        self.prefetch_related = []
+
+    def select(self, lookup):
+        if lookup not in self.select_related:
+            self.select_related.append(lookup)
+
+    def prefetch(self, lookup):
+        self.prefetch_related.append(lookup)
+
+
+def _plan_serializer(serializer, model, prefix, plan):
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if field.source == "*":
+            if isinstance(field, serializers.BaseSerializer):
+                _plan_serializer(field, model, prefix, plan)
+            continue
+        _plan_field(field, model, prefix, plan)
+
+
+def _plan_field(field, model, prefix, plan):
+    path = prefix
+    current = model
+    attrs = field.source_attrs
+    for depth, attr in enumerate(attrs):
+        relation = _relations(current).get(attr)
+        if relation is None:
+            break
+        lookup = f"{path}__{attr}" if path else attr
+        is_last = depth == len(attrs) - 1
+
+        if _is_many(relation):
+            if not is_last:
+                break
+            if isinstance(field, serializers.ListSerializer):
+                plan.prefetch(
+                    Prefetch(
+                        lookup,
+                        queryset=_nested_queryset(
+                            field.child, relation.related_model
+                        ),
+                    )
+                )
+            else:
+                plan.prefetch(lookup)
+            return
+
+        if not is_last:
+            path, current = lookup, relation.related_model
+            continue
+
+        if isinstance(field, serializers.BaseSerializer):
+            if hasattr(field, "annotate_queryset"):
+                # Annotations can only be added to a queryset of their own.
+                plan.prefetch(
+                    Prefetch(
+                        lookup,
+                        queryset=_nested_queryset(
+                            field, relation.related_model
+                        ),
+                    )
+                )
+            else:
+                plan.select(lookup)
+                _plan_serializer(field, relation.related_model, lookup, plan)
+        elif isinstance(field, PrimaryKeyRelatedField) and relation.concrete:
+            # Rendered from the foreign key column alone.
+            break
+        else:
+            plan.select(lookup)
+        return
+
+    if path:
+        plan.select(path)
+
+
+def plan_queryset(queryset, serializer):
+    """
+    Add to ``queryset`` the ``select_related()`` and ``Prefetch`` lookups
+    that ``serializer`` needs to render its rows, so the number of queries
+    does not grow with the number of rows.
+
+    The serializer field tree is walked from the sources of the fields:
+
+    * a single related object rendered by a nested serializer or a
+      related field is joined with ``select_related()``, and the fields of
+      a nested serializer are planned in turn;
+    * a list of related objects is prefetched, with the queryset planned
+      for the nested serializer rendering them;
+    * serializers that read annotations define
+      ``annotate_queryset(queryset)``. Their rows are annotated, and a
+      related object they render is prefetched instead of joined.
+    """
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    if not isinstance(serializer, serializers.Serializer):
+        return queryset
+
+    plan = _Plan()
+    _plan_serializer(serializer, queryset.model, "", plan)
+    if hasattr(serializer, "annotate_queryset"):
+        queryset = serializer.annotate_queryset(queryset)
+    if plan.select_related:
+        queryset = queryset.select_related(*plan.select_related)
+    if plan.prefetch_related:
+        queryset = queryset.prefetch_related(*plan.prefetch_related)
+    return queryset
+
+
+class PrefetchPlanMixin:
+    """
+    Plans the queryset of a DRF view for the serializer of the current
+    action with ``plan_queryset()``, so lists, details and the objects
+    looked up by custom actions load their related rows up front.
+
+    ``get_queryset()`` only has to filter and order the rows.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = plan_queryset(queryset, self.get_serializer())
+        return super().filter_queryset(queryset)
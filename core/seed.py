@@ -0,0 +1,422 @@
+import datetime
+import random
+from collections import Counter, defaultdict
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import (
+    Case,
+    Count,
+    DateField,
+    F,
+    OuterRef,
+    Subquery,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from book.autocomplete import rebuild_autocomplete_on_commit
+from book.models import Book
+from borrowing.models import Borrowing
+from core.cache import bump_cache_versions
+from payment.models import Payment
+from payment.fees import OVERDUE_COEFFICIENT
+
+
+SEED_PASSWORD = "library-seed"
+SEED_EMAIL_PREFIX = "seed-reader"
+SEED_BATCH_SIZE = 10_000
+COUNT_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+SYLLABLES = (
+    "an bel cor dra el fen gar hol ir jas kel lor mar nor or pel "
+    "quin ros sar tor ul val wen yor zan"
+).split()
+
+# Share of readers with a book out today, and of returns that are late.
+ACTIVE_RATIO = 0.3
+LATE_RATIO = 0.2
+
+
+def parse_count(value):
+    """Read a row count given as ``1k``, ``100k``, ``1m`` or a number."""
+    value = str(value).lower().replace("_", "")
+    multiplier = COUNT_SUFFIXES.get(value[-1:], 1)
+    if multiplier > 1:
+        value = value[:-1]
+    return int(float(value) * multiplier)
+
+
+def build_vocabulary(rng, size=10_000):
+    """A reproducible vocabulary of made-up two and three syllable words."""
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choices(SYLLABLES, k=rng.randint(2, 3))))
+    return sorted(words)
+
+
+def write_borrow_dates(borrowings, borrow_dates):
+    """
+    Give created borrowings their ``borrow_date`` back, which
+    ``bulk_create`` stamped with today's date, in one ``UPDATE``.
+    """
+    pks_by_date = defaultdict(list)
+    for borrowing, borrow_date in zip(borrowings, borrow_dates):
+        borrowing.borrow_date = borrow_date
+        pks_by_date[borrow_date].append(borrowing.pk)
+    pks = [borrowing.pk for borrowing in borrowings]
+    Borrowing.objects.filter(pk__range=(min(pks), max(pks))).update(
+        borrow_date=Case(
+            *[
+                When(pk__in=date_pks, then=Value(borrow_date))
+                for borrow_date, date_pks in pks_by_date.items()
+            ],
+            default=F("borrow_date"),
+            output_field=DateField(),
+        )
+    )
+
+
+class LibrarySeeder:
+    """
+    Generates a reproducible library: readers, a catalogue and the
+    borrowing history of the readers with its payments.
+
+    Everything is drawn from one ``random.Random(seed)`` and written with
+    ``bulk_create`` in batches of ``batch_size`` rows, one transaction per
+    batch. Readers share a single precomputed password hash.
+    """
+
+    def __init__(
+        self,
+        seed=0,
+        batch_size=SEED_BATCH_SIZE,
+        history_days=730,
+        today=None,
+        stdout=None,
+    ):
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.history_days = history_days
+        self.today = (today or datetime.date.today()).toordinal()
+        self.stdout = stdout
+        self.words = build_vocabulary(self.rng, 2_000)
+        # Copies of every seeded book, and how many of them are out.
+        self.copies = {}
+        self.on_loan = Counter()
+        self.counts = dict.fromkeys(
+            (
+                "users",
+                "books",
+                "borrowings",
+                "active",
+                "overdue",
+                "payments",
+                "fines",
+            ),
+            0,
+        )
+
+    def log(self, message):
+        if self.stdout is not None:
+            self.stdout.write(message)
+
+    def phrase(self, low, high):
+        words = self.rng.sample(self.words, self.rng.randint(low, high))
+        return " ".join(words).title()
+
+    def daily_fee(self):
+        """A fee of about a dollar and a half, rarely over five."""
+        cents = int(self.rng.lognormvariate(5, 0.5))
+        return Decimal(min(max(cents, 1), 1000)).scaleb(-2)
+
+    def create_users(self, count):
+        """
+        Create ``count`` readers sharing one password hash.
+
+        Returns:
+            list[int]: Their ids.
+        """
+        user_model = get_user_model()
+        password = make_password(SEED_PASSWORD)
+        start = user_model.objects.filter(
+            email__startswith=SEED_EMAIL_PREFIX
+        ).count()
+        ids = []
+        for offset in range(0, count, self.batch_size):
+            size = min(self.batch_size, count - offset)
+            with transaction.atomic():
+                users = user_model.objects.bulk_create(
+                    user_model(
+                        email=(
+                            f"{SEED_EMAIL_PREFIX}{start + offset + index}"
+                            "@example.com"
+                        ),
+                        password=password,
+                        first_name=self.phrase(1, 1),
+                        last_name=self.phrase(1, 1),
+                    )
+                    for index in range(size)
+                )
+            ids.extend(user.pk for user in users)
+            self.log(f"{len(ids)} users")
+        self.counts["users"] += count
+        return ids
+
+    def create_books(self, count):
+        """
+        Create ``count`` books by a pool of authors, most of them soft
+        covers with a fee of a few dollars a day.
+
+        Returns:
+            list[tuple]: The id and the daily fee of every book.
+        """
+        authors = [self.phrase(2, 2) for _ in range(max(1, count // 4))]
+        start = Book.objects.count()
+        books = []
+        for offset in range(0, count, self.batch_size):
+            size = min(self.batch_size, count - offset)
+            with transaction.atomic():
+                created = Book.objects.bulk_create(
+                    Book(
+                        title=f"{self.phrase(1, 4)} {start + offset + index}",
+                        author=self.rng.choice(authors),
+                        cover=(
+                            Book.Cover.SOFT
+                            if self.rng.random() < 0.6
+                            else Book.Cover.HARD
+                        ),
+                        inventory=max(1, int(self.rng.expovariate(1 / 4))),
+                        daily_fee=self.daily_fee(),
+                    )
+                    for index in range(size)
+                )
+            books.extend((book.pk, book.daily_fee) for book in created)
+            self.copies.update((book.pk, book.inventory) for book in created)
+            self.log(f"{len(books)} books")
+        self.counts["books"] += count
+        return books
+
+    def loans_per_user(self, user_ids, borrowings):
+        """
+        Spread ``borrowings`` over the readers: a few borrow a lot, many
+        borrow once or twice and some never.
+        """
+        weights = [min(8.0, self.rng.lognormvariate(0, 1)) for _ in user_ids]
+        loans = dict.fromkeys(user_ids, 0)
+        for user_id in self.rng.choices(
+            user_ids, cum_weights=list(accumulate(weights)), k=borrowings
+        ):
+            loans[user_id] += 1
+        return loans
+
+    def lend(self, book, books, cum_weights):
+        """
+        Take a copy of ``book`` out for an active borrowing, or of another
+        book drawn the same way while every copy of it is out.
+
+        Returns:
+            tuple | None: The book lent, None if no copy of any book is
+            left.
+        """
+        for _ in range(10):
+            if self.on_loan[book[0]] < self.copies[book[0]]:
+                break
+            book = self.rng.choices(books, cum_weights=cum_weights)[0]
+        else:
+            book = next(
+                (
+                    book
+                    for book in books
+                    if self.on_loan[book[0]] < self.copies[book[0]]
+                ),
+                None,
+            )
+            if book is None:
+                return None
+        self.on_loan[book[0]] += 1
+        return book
+
+    def take_out_copies(self, books):
+        """
+        Take the copies of the active borrowings out of the inventory of
+        ``books``, in one ``UPDATE``.
+        """
+        active = (
+            Borrowing.objects.filter(
+                book=OuterRef("pk"), actual_return_date__isnull=True
+            )
+            .values("book")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        pks = [book_id for book_id, _ in books]
+        Book.objects.filter(pk__range=(min(pks), max(pks))).update(
+            inventory=F("inventory") - Coalesce(Subquery(active), 0),
+            updated_at=timezone.now(),
+        )
+
+    def history(self, count):
+        """
+        Yield ``(borrow, expected, actual)`` date ordinals of ``count``
+        consecutive borrowings of one reader, oldest first. The last one
+        may still be out (``actual`` is None), and overdue.
+        """
+        slot = self.history_days / count
+        start = self.today - self.history_days
+        previous_return = start
+        for index in range(count):
+            planned = self.rng.randint(7, 28)
+            is_last = index == count - 1
+            if is_last and self.rng.random() < ACTIVE_RATIO:
+                borrow = max(
+                    previous_return, self.today - self.rng.randint(0, 45)
+                )
+                yield borrow, borrow + planned, None
+                return
+
+            borrow = max(
+                previous_return,
+                int(start + index * slot + self.rng.random() * slot / 3),
+            )
+            if self.rng.random() < LATE_RATIO:
+                kept = planned + 1 + int(self.rng.expovariate(1 / 7))
+            else:
+                kept = self.rng.randint(1, planned)
+            actual = borrow + kept
+            next_borrow = start + (index + 1) * slot
+            if not is_last:
+                actual = min(actual, max(borrow, int(next_borrow)))
+            actual = min(actual, self.today)
+            previous_return = actual
+            yield borrow, borrow + planned, actual
+
+    def payments(self, borrowing, daily_fee):
+        """The payment of a borrowing, and its fine if it came back late."""
+        borrow = borrowing.borrow_date
+        expected = borrowing.expected_return_date
+        actual = borrowing.actual_return_date
+        common = {
+            "borrowing_id": borrowing.pk,
+            "user_id": borrowing.user_id,
+            "borrow_date": borrow,
+        }
+        is_recent = (self.today - borrow.toordinal()) < 2
+        yield Payment(
+            type=Payment.Type.PAYMENT,
+            money_to_pay=max(1, (expected - borrow).days) * daily_fee,
+            status=(
+                Payment.Status.PENDING
+                if is_recent
+                else self.rng.choices(
+                    (Payment.Status.PAID, Payment.Status.EXPIRED),
+                    (95, 5),
+                )[0]
+            ),
+            **common,
+        )
+        if actual is not None and actual > expected:
+            self.counts["fines"] += 1
+            yield Payment(
+                type=Payment.Type.FINE,
+                money_to_pay=(
+                    (actual - expected).days * daily_fee * OVERDUE_COEFFICIENT
+                ),
+                status=self.rng.choices(
+                    (Payment.Status.PAID, Payment.Status.PENDING), (80, 20)
+                )[0],
+                **common,
+            )
+
+    def write_borrowings(self, borrowings, fees):
+        borrow_dates = [borrowing.borrow_date for borrowing in borrowings]
+        with transaction.atomic():
+            Borrowing.objects.bulk_create(borrowings)
+            write_borrow_dates(borrowings, borrow_dates)
+            payments = [
+                payment
+                for borrowing, daily_fee in zip(borrowings, fees)
+                for payment in self.payments(borrowing, daily_fee)
+            ]
+            Payment.objects.bulk_create(payments)
+        self.counts["borrowings"] += len(borrowings)
+        self.counts["payments"] += len(payments)
+        self.log(f"{self.counts['borrowings']} borrowings")
+
+    def create_borrowings(self, count, user_ids, books):
+        """
+        Create ``count`` borrowings of ``books`` by the readers, popular
+        books being borrowed far more often than the rest. No book is
+        lent out more times than it has copies: an active borrowing of a
+        book with none left goes to another one, or is returned today if
+        every copy is out.
+        """
+        popularity = [1 / rank**0.8 for rank in range(1, len(books) + 1)]
+        self.rng.shuffle(popularity)
+        cum_weights = list(accumulate(popularity))
+        date = datetime.date.fromordinal
+
+        borrowings, fees = [], []
+        for user_id, loans in self.loans_per_user(user_ids, count).items():
+            if not loans:
+                continue
+            picked = self.rng.choices(books, cum_weights=cum_weights, k=loans)
+            history = self.history(loans)
+            for book, (borrow, expected, actual) in zip(picked, history):
+                if actual is None:
+                    lent = self.lend(book, books, cum_weights)
+                    if lent is None:
+                        actual = self.today
+                    else:
+                        book = lent
+                book_id, daily_fee = book
+                if actual is None:
+                    self.counts["active"] += 1
+                    self.counts["overdue"] += expected < self.today
+                borrowings.append(
+                    Borrowing(
+                        user_id=user_id,
+                        book_id=book_id,
+                        borrow_date=date(borrow),
+                        expected_return_date=date(expected),
+                        actual_return_date=(
+                            date(actual) if actual is not None else None
+                        ),
+                    )
+                )
+                fees.append(daily_fee)
+            if len(borrowings) >= self.batch_size:
+                self.write_borrowings(borrowings, fees)
+                borrowings, fees = [], []
+        if borrowings:
+            self.write_borrowings(borrowings, fees)
+        self.take_out_copies(books)
+
+    def seed(self, borrowings, users=None, books=None):
+        """
+        Create ``borrowings`` borrowings with their payments, by ``users``
+        new readers (a tenth of the borrowings by default) of ``books``
+        new books (a twentieth by default). The books lent out by the
+        active borrowings are taken out of the inventory.
+
+        Bulk writes bypass the model signals, so the response caches are
+        invalidated once at the end, and the autocomplete index is rebuilt
+        in the background after the commit.
+
+        Returns:
+            dict: The number of rows created, by kind.
+        """
+        users = users or max(1, borrowings // 10)
+        books = books or max(1, borrowings // 20)
+        user_ids = self.create_users(users)
+        book_rows = self.create_books(books)
+        if borrowings:
+            self.create_borrowings(borrowings, user_ids, book_rows)
+
+        bump_cache_versions("catalogue", "book", "borrowing")
+        rebuild_autocomplete_on_commit()
+        return self.counts
@@ -180,6 +180,9 @@ INTERNAL_IPS = [
 # Stripe
 STRIPE_SECRET_KEY = os.environ["STRIPE_SECRET_KEY"]
 STRIPE_PUBLIC_KEY = os.environ["STRIPE_PUBLIC_KEY"]
+# Point the Stripe client at a local stub (e.g. stripe-mock) when set
+STRIPE_API_BASE = os.environ.get("STRIPE_API_BASE")
+STRIPE_WEBHOOK_SECRET = os.environ.get("STRIPE_WEBHOOK_SECRET", "")
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
@@ -223,4 +226,16 @@ CELERY_BEAT_SCHEDULE = {
         "task": "borrowing.tasks.send_message",
         "schedule": crontab(minute="*"),
     },
+    "relay_outbox_messages": {
+        "task": "tg_bot.tasks.relay_outbox_messages",
+        "schedule": 10.0,
+    },
+    "sync_inventory_shards": {
+        "task": "book.tasks.sync_inventory_shards",
+        "schedule": crontab(minute="*"),
+    },
+    "snapshot_fines_nightly": {
+        "task": "payment.tasks.snapshot_fines",
+        "schedule": crontab(hour=1, minute=0),
+    },
 }
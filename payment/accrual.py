@@ -0,0 +1,82 @@
+import datetime
+
+from django.db import transaction
+from django.db.models import DateField, F, Value
+from django.db.models.functions import Coalesce
+
+from borrowing.models import Borrowing
+from payment.fees import get_fee_schedule
+from payment.models import FineSnapshot
+
+
+SNAPSHOT_CHUNK_SIZE = 2000
+
+
+def annotate_money_to_pay(queryset, return_date=None):
+    """
+    Price a whole queryset of borrowings in SQL, exactly like
+    ``calculate_money_to_pay`` prices one of them, with the current fee
+    rules.
+
+    Annotates ``money_to_pay``, ``payment_type`` (``PAYMENT``, ``FINE``
+    or ``"ok"``) and ``overdue_days``. With ``return_date``, unreturned
+    borrowings are priced as if returned on that day, which projects the
+    fine of the overdue ones.
+    """
+    returned_on = F("actual_return_date")
+    if return_date is not None:
+        returned_on = Coalesce(
+            "actual_return_date", Value(return_date, DateField())
+        )
+    return get_fee_schedule().annotate(queryset, returned_on)
+
+
+def open_overdue_borrowings(as_of):
+    """
+    Unreturned borrowings due before ``as_of``, in primary-key order.
+    Served by the borrowing_active_due_idx index on PostgreSQL.
+    """
+    return Borrowing.objects.unreturned_due(lt=as_of).order_by("pk")
+
+
+def snapshot_projected_fines(as_of=None, chunk_size=SNAPSHOT_CHUNK_SIZE):
+    """
+    Project the fine of every open overdue borrowing as of ``as_of``
+    (today by default) into ``FineSnapshot``.
+
+    The borrowings are priced by ``annotate_money_to_pay`` in the query
+    that reads them, walked in primary-key chunks and upserted one chunk
+    per statement. Snapshots of borrowings that are no longer overdue are
+    deleted, so the table holds the current projection only.
+
+    Returns:
+        int: The number of snapshots written.
+    """
+    as_of = as_of or datetime.date.today()
+    rows = annotate_money_to_pay(
+        open_overdue_borrowings(as_of), return_date=as_of
+    ).values_list("pk", "user_id", "overdue_days", "money_to_pay")
+
+    written = 0
+    last_id = 0
+    with transaction.atomic():
+        while chunk := list(rows.filter(pk__gt=last_id)[:chunk_size]):
+            FineSnapshot.objects.bulk_create(
+                [
+                    FineSnapshot(
+                        borrowing_id=borrowing_id,
+                        user_id=user_id,
+                        as_of=as_of,
+                        overdue_days=overdue_days,
+                        fine=fine,
+                    )
+                    for borrowing_id, user_id, overdue_days, fine in chunk
+                ],
+                update_conflicts=True,
+                unique_fields=["borrowing"],
+                update_fields=["as_of", "overdue_days", "fine", "updated_at"],
+            )
+            written += len(chunk)
+            last_id = chunk[-1][0]
+        FineSnapshot.objects.exclude(as_of=as_of).delete()
+    return written
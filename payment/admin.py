@@ -1,6 +1,17 @@
 from django.contrib import admin
 
-from payment.models import Payment
+from payment.models import FeeRule, FineSnapshot, OverdueTier, Payment
+
+
+class OverdueTierInline(admin.TabularInline):
+    model = OverdueTier
+    extra = 1
+
+
+@admin.register(FeeRule)
+class FeeRuleAdmin(admin.ModelAdmin):
+    inlines = [OverdueTierInline]
 
 
 admin.site.register(Payment)
+admin.site.register(FineSnapshot)
@@ -16,3 +16,6 @@ class PaymentConfig(AppConfig):
 
     default_auto_field = "django.db.models.BigAutoField"
     name = "payment"
+
+    def ready(self):
+        import payment.signals # noqa
@@ -0,0 +1,325 @@
+from decimal import Decimal
+
+from django.db.models import (
+    BigIntegerField,
+    Case,
+    CharField,
+    DecimalField,
+    ExpressionWrapper,
+    F,
+    Func,
+    IntegerField,
+    Q,
+    Value,
+    When,
+)
+from django.db.models.functions import Cast, Greatest, Least, Round
+from django.db.models.lookups import GreaterThan
+
+from core.cache import get_cache_versions
+from payment.models import FeeRule, Payment
+
+
+OVERDUE_COEFFICIENT = 2
+NO_CHARGE = "ok"
+FEE_RULES_SCOPE = "fee_rules"
+CENT = Decimal("0.01")
+MONEY_FIELD = DecimalField(max_digits=10, decimal_places=2)
+
+# The compiled schedule of this process and the rule version it was
+# compiled from.
+_compiled = None
+
+
+def _hundredths(value):
+    """An amount with at most two decimal places, in hundredths."""
+    return round(Decimal(str(value)) * 100)
+
+
+class DaysBetween(Func):
+    """The number of days from the ``start`` date to the ``end`` date."""
+
+    arg_joiner = " - "
+    template = "(%(expressions)s)"
+    output_field = IntegerField()
+
+    def __init__(self, end, start, **extra):
+        super().__init__(end, start, **extra)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler,
+            connection,
+            template="CAST(julianday(%(expressions)s) AS INTEGER)",
+            arg_joiner=") - julianday(",
+            **extra_context,
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler,
+            connection,
+            function="DATEDIFF",
+            template="%(function)s(%(expressions)s)",
+            arg_joiner=", ",
+            **extra_context,
+        )
+
+
+class IntDiv(Func):
+    """Integer division of two non-negative integers, rounding down."""
+
+    arg_joiner = " / "
+    template = "(%(expressions)s)"
+    output_field = BigIntegerField()
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection, arg_joiner=" DIV ", **extra_context
+        )
+
+
+def _round_down(value, unit):
+    """``value // unit``, for integers and integer expressions alike."""
+    if isinstance(value, int):
+        return value // unit
+    return IntDiv(value, Value(unit))
+
+
+def _smallest(first, second):
+    if isinstance(first, int) and isinstance(second, int):
+        return min(first, second)
+    return Least(first, second)
+
+
+def _largest(first, second):
+    if isinstance(first, int) and isinstance(second, int):
+        return max(first, second)
+    return Greatest(first, second)
+
+
+def _tier_ranges(levels):
+    """
+    Turn ``(from_day, coefficient)`` pairs into the ``(start, end,
+    coefficient)`` ranges of charged overdue days they cover, ``end``
+    being None for the last one.
+    """
+    levels = sorted(levels)
+    if not levels or levels[0][0] > 1:
+        levels.insert(0, (1, OVERDUE_COEFFICIENT * 100))
+    ends = [day - 1 for day, _ in levels[1:]] + [None]
+    return tuple(
+        (day - 1, end, coefficient)
+        for (day, coefficient), end in zip(levels, ends)
+    )
+
+
+class CompiledRule:
+    """
+    A ``FeeRule`` reduced to whole numbers: the multiplier and the tier
+    coefficients in hundredths, the cap in cents.
+
+    Amounts are computed in integer cents and rounded half up once, with
+    the same arithmetic in Python and in SQL, so both give the same cents
+    on every database.
+    """
+
+    def __init__(
+        self,
+        multiplier=100,
+        grace_days=0,
+        tiers=_tier_ranges([]),
+        cap=None,
+    ):
+        self.multiplier = multiplier
+        self.grace_days = grace_days
+        self.tiers = tiers
+        self.cap = cap
+
+    @classmethod
+    def from_rule(cls, rule):
+        return cls(
+            multiplier=_hundredths(rule.daily_fee_multiplier),
+            grace_days=rule.grace_days,
+            tiers=_tier_ranges(
+                [
+                    (tier.from_day, _hundredths(tier.coefficient))
+                    for tier in rule.overdue_tiers.all()
+                ]
+            ),
+            cap=None if rule.fine_cap is None else _hundredths(rule.fine_cap),
+        )
+
+    def rental_cents(self, fee_cents, days):
+        """The payment for ``days`` borrowed days."""
+        return _round_down(days * fee_cents * self.multiplier + 50, 100)
+
+    def fine_cents(self, fee_cents, overdue_days):
+        """The fine for ``overdue_days`` days past the expected return."""
+        charged = overdue_days
+        if self.grace_days:
+            charged = charged - self.grace_days
+        rates = []
+        for start, end, coefficient in self.tiers:
+            days = charged if end is None else _smallest(end, charged)
+            if start:
+                days = days - start
+            rates.append(coefficient * _largest(0, days))
+        rate = rates[0]
+        for tier_rate in rates[1:]:
+            rate = rate + tier_rate
+        fine = _round_down(fee_cents * self.multiplier * rate + 5000, 10000)
+        if self.cap is None:
+            return fine
+        return _smallest(fine, self.cap)
+
+    def price(self, fee_cents, borrow_date, expected_date, return_date):
+        """
+        The amount in cents and the type of the payment of one borrowing,
+        like ``FeeSchedule.price()``.
+        """
+        if return_date is None:
+            days = (expected_date - borrow_date).days or 1
+            return self.rental_cents(fee_cents, days), Payment.Type.PAYMENT
+        fine = self.fine_cents(fee_cents, (return_date - expected_date).days)
+        if fine > 0:
+            return fine, Payment.Type.FINE
+        return 0, NO_CHARGE
+
+    def money_cents_expression(self):
+        """SQL for ``price()``'s amount, see ``FeeSchedule.annotate()``."""
+        is_open = Q(returned_on__isnull=True)
+        return Case(
+            When(
+                is_open & Q(expected_return_date=F("borrow_date")),
+                then=self.rental_cents(F("fee_cents"), Value(1)),
+            ),
+            When(
+                is_open,
+                then=self.rental_cents(
+                    F("fee_cents"),
+                    DaysBetween("expected_return_date", "borrow_date"),
+                ),
+            ),
+            default=self.fine_cents(F("fee_cents"), F("overdue_days")),
+            output_field=BigIntegerField(),
+        )
+
+    def payment_type_expression(self):
+        """SQL for ``price()``'s type, see ``FeeSchedule.annotate()``."""
+        fine = self.fine_cents(F("fee_cents"), F("overdue_days"))
+        return Case(
+            When(returned_on__isnull=True, then=Value(Payment.Type.PAYMENT)),
+            When(GreaterThan(fine, 0), then=Value(Payment.Type.FINE)),
+            default=Value(NO_CHARGE),
+            output_field=CharField(),
+        )
+
+
+class FeeSchedule:
+    """
+    The fee rules compiled for evaluation: one ``CompiledRule`` per book
+    cover with a rule of its own, and the default rule for the others.
+
+    ``price()`` prices a borrowing in Python without touching the
+    database, ``annotate()`` prices a whole queryset in SQL. Both give the
+    same amounts.
+    """
+
+    def __init__(self, rules=None, default=None):
+        self.rules = rules or {}
+        self.default = default or CompiledRule()
+
+    @classmethod
+    def compile(cls):
+        """Read the ``FeeRule`` table, in at most two queries."""
+        rules = {
+            rule.cover: CompiledRule.from_rule(rule)
+            for rule in FeeRule.objects.prefetch_related("overdue_tiers")
+        }
+        default = rules.pop("", None)
+        return cls(rules, default)
+
+    def rule_for(self, cover):
+        return self.rules.get(cover, self.default)
+
+    def price(self, borrowing):
+        """
+        Price a borrowing that has its book loaded.
+
+        A borrowing that has not been returned is charged its daily fee
+        for every borrowed day, at least one. A returned one is fined for
+        the overdue days past its grace days, at the rates of the overdue
+        tiers and up to the fine cap.
+
+        Returns:
+            tuple: The amount (Decimal) and the type of the payment
+            (``PAYMENT``, ``FINE``, or ``"ok"`` when nothing is due).
+        """
+        book = borrowing.book
+        cents, payment_type = self.rule_for(book.cover).price(
+            _hundredths(book.daily_fee),
+            borrowing.borrow_date,
+            borrowing.expected_return_date,
+            borrowing.actual_return_date,
+        )
+        return cents * CENT, payment_type
+
+    def by_cover(self, build, output_field):
+        """Build the expression of each rule and pick it by book cover."""
+        if not self.rules:
+            return build(self.default)
+        return Case(
+            *[
+                When(book__cover=cover, then=build(rule))
+                for cover, rule in self.rules.items()
+            ],
+            default=build(self.default),
+            output_field=output_field,
+        )
+
+    def annotate(self, queryset, returned_on):
+        """
+        Price a queryset of borrowings in the query that reads them, as
+        ``price()`` would if they had been returned on ``returned_on`` (an
+        expression).
+
+        Annotates ``money_to_pay``, ``payment_type`` and ``overdue_days``.
+        """
+        queryset = queryset.alias(
+            returned_on=returned_on,
+            fee_cents=Cast(
+                Round(F("book__daily_fee") * Value(100)), BigIntegerField()
+            ),
+        ).annotate(
+            overdue_days=DaysBetween("returned_on", "expected_return_date")
+        )
+        return queryset.annotate(
+            money_to_pay=ExpressionWrapper(
+                self.by_cover(
+                    CompiledRule.money_cents_expression, BigIntegerField()
+                )
+                * Value(CENT),
+                output_field=MONEY_FIELD,
+            ),
+            payment_type=self.by_cover(
+                CompiledRule.payment_type_expression, CharField()
+            ),
+        )
+
+
+def get_fee_schedule():
+    """
+    The ``FeeSchedule`` of the current fee rules.
+
+    It is compiled once per process and kept until the version of the
+    ``fee_rules`` cache scope moves, which the ``FeeRule`` and
+    ``OverdueTier`` signals do when a change is committed. Checking the
+    version costs one cache round trip and no query, so loops pricing many
+    borrowings in Python should get the schedule once.
+    """
+    global _compiled
+    (version,) = get_cache_versions(FEE_RULES_SCOPE)
+    if _compiled is None or _compiled[0] != version:
+        _compiled = (version, FeeSchedule.compile())
+    return _compiled[1]
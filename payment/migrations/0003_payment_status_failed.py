@@ -0,0 +1,25 @@
+# Generated by Django 5.1.4 on 2026-10-17 12:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("payment", "0002_alter_payment_borrowing"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="payment",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("PENDING", "Pending"),
+                    ("PAID", "Paid"),
+                    ("FAILED", "Failed"),
+                ],
+                default="PENDING",
+                max_length=7,
+            ),
+        ),
+    ]
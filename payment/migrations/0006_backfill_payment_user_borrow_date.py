@@ -0,0 +1,45 @@
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+BATCH_SIZE = 1000
+
+
+def backfill(apps, schema_editor):
+    """
+    Copy the user and borrow date of every payment's borrowing onto the
+    payment, one batch of primary keys per UPDATE statement, so no single
+    statement holds locks on the whole table.
+    """
+    Payment = apps.get_model("payment", "Payment")
+    Borrowing = apps.get_model("borrowing", "Borrowing")
+    borrowing = Borrowing.objects.filter(pk=OuterRef("borrowing_id"))
+
+    last_id = 0
+    while True:
+        ids = list(
+            Payment.objects.filter(pk__gt=last_id, user__isnull=True)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:BATCH_SIZE]
+        )
+        if not ids:
+            break
+        Payment.objects.filter(pk__in=ids).update(
+            user_id=Subquery(borrowing.values("user_id")[:1]),
+            borrow_date=Subquery(borrowing.values("borrow_date")[:1]),
+        )
+        last_id = ids[-1]
+
+
+class Migration(migrations.Migration):
+    # Every batch commits on its own.
+    atomic = False
+
+    dependencies = [
+        ("borrowing", "0007_borrowing_hot_query_indexes"),
+        ("payment", "0005_payment_user_borrow_date"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
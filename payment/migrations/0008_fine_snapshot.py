@@ -0,0 +1,57 @@
+# Generated by Django 5.1.4 on 2026-10-17 12:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("borrowing", "0007_borrowing_hot_query_indexes"),
+        ("payment", "0007_payment_user_borrow_date_required"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FineSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("as_of", models.DateField()),
+                ("overdue_days", models.PositiveIntegerField()),
+                ("fine", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "borrowing",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="fine_snapshot",
+                        to="borrowing.borrowing",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="fine_snapshots",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["as_of"], name="fine_snapshot_as_of_idx"
+                    )
+                ],
+            },
+        ),
+    ]
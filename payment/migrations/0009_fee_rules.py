@@ -0,0 +1,99 @@
+# Generated by Django 5.1.4 on 2026-10-17 12:35
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("payment", "0008_fine_snapshot"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FeeRule",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "cover",
+                    models.CharField(
+                        blank=True,
+                        choices=[("HARD", "Hard"), ("SOFT", "Soft")],
+                        max_length=4,
+                        unique=True,
+                    ),
+                ),
+                (
+                    "daily_fee_multiplier",
+                    models.DecimalField(
+                        decimal_places=2, default=1, max_digits=5
+                    ),
+                ),
+                ("grace_days", models.PositiveSmallIntegerField(default=0)),
+                (
+                    "fine_cap",
+                    models.DecimalField(
+                        blank=True, decimal_places=2, max_digits=10, null=True
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="OverdueTier",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "from_day",
+                    models.PositiveSmallIntegerField(
+                        default=1,
+                        validators=[
+                            django.core.validators.MinValueValidator(1)
+                        ],
+                    ),
+                ),
+                (
+                    "coefficient",
+                    models.DecimalField(decimal_places=2, max_digits=5),
+                ),
+                (
+                    "rule",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="overdue_tiers",
+                        to="payment.feerule",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["from_day"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("rule", "from_day"),
+                        name="overdue_tier_day_unique",
+                    ),
+                    models.CheckConstraint(
+                        condition=models.Q(("from_day__gte", 1)),
+                        name="overdue_tier_from_day_gte_1",
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -1,5 +1,8 @@
+from django.conf import settings
+from django.core.validators import MinValueValidator
 from django.db import models
 
+from book.models import Book
 from borrowing.models import Borrowing
 
 
@@ -12,16 +15,25 @@ class Payment(models.Model):
     a standard payment or a fine.
 
     Attributes:
-        status (str): The current status of the payment (PENDING or PAID).
+        status (str): The current status of the payment (PENDING, PAID
+                      or EXPIRED), updated from Stripe webhook events,
+                      or FAILED when its checkout session could not be
+                      created.
         type (str): The type of payment (PAYMENT or FINE).
         borrowing (Borrowing): The borrowing record this payment is associated with.
+        user (User): The borrowing's user, copied from the borrowing so
+                     payments can be filtered without a join.
+        borrow_date (date): The borrowing's borrow date, copied for the
+                            same reason.
         session_url (str, optional): URL for the payment session (e.g., Stripe session).
         session_id (str, optional): Identifier for the payment session.
         money_to_pay (Decimal): The amount to be paid or fined, with up to 10 digits
                                 and 2 decimal places.
 
     Meta:
-        ordering (list): Orders the payments by the borrowing date in descending order.
+        ordering (list): Orders the payments by the borrowing date in
+                         descending order, newest payment first within a
+                         day.
 
     Methods:
         __str__(): Returns a human-readable string representation of the payment,
@@ -35,10 +47,14 @@ class Payment(models.Model):
         Attributes:
             PENDING (str): Payment is pending.
             PAID (str): Payment is completed.
+            EXPIRED (str): The checkout session expired without payment.
+            FAILED (str): The checkout session could not be created.
         """
 
         PENDING = ("PENDING",)
         PAID = ("PAID",)
+        EXPIRED = ("EXPIRED",)
+        FAILED = ("FAILED",)
 
     class Type(models.TextChoices):
         """
@@ -60,11 +76,164 @@ class Payment(models.Model):
         Borrowing, on_delete=models.CASCADE, related_name="payments"
     )
     session_url = models.URLField(max_length=500, blank=True, null=True)
-    session_id = models.CharField(max_length=255, blank=True, null=True)
+    session_id = models.CharField(
+        max_length=255, blank=True, null=True, db_index=True
+    )
     money_to_pay = models.DecimalField(max_digits=10, decimal_places=2)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="payments",
+        # Covered by payment_user_order_idx, which starts with the user.
+        db_index=False,
+    )
+    borrow_date = models.DateField()
+
+    class Meta:
+        ordering = ["-borrow_date", "-id"]
+        indexes = [
+            models.Index(
+                fields=["-borrow_date", "-id"], name="payment_order_idx"
+            ),
+            models.Index(
+                fields=["user", "-borrow_date", "-id"],
+                name="payment_user_order_idx",
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.user_id is None:
+            self.user_id = self.borrowing.user_id
+        if self.borrow_date is None:
+            self.borrow_date = self.borrowing.borrow_date
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.user.email} - {self.money_to_pay} USD - {self.status}"
+
+
+class StripeEvent(models.Model):
+    """
+    A Stripe webhook event that has already been processed.
+
+    Stripe delivers events at least once; recording their ids makes
+    processing idempotent when an event is delivered again.
+
+    Attributes:
+        event_id (str): The Stripe event id (evt_...).
+        type (str): The event type, e.g. checkout.session.completed.
+        received_at (datetime): When the event was first processed.
+    """
+
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=255)
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.type} - {self.event_id}"
+
+
+class FineSnapshot(models.Model):
+    """
+    The fine an unreturned, overdue borrowing would be charged if it
+    were returned on ``as_of``. Refreshed nightly for every open overdue
+    borrowing, for dashboards and dunning.
+
+    Attributes:
+        borrowing (Borrowing): The overdue borrowing, one row each.
+        user (User): The borrower, copied from the borrowing.
+        as_of (date): The day the fine is projected for.
+        overdue_days (int): Days past the expected return date.
+        fine (Decimal): The projected fine.
+        updated_at (datetime): When the row was last written.
+    """
+
+    borrowing = models.OneToOneField(
+        Borrowing, on_delete=models.CASCADE, related_name="fine_snapshot"
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="fine_snapshots",
+    )
+    as_of = models.DateField()
+    overdue_days = models.PositiveIntegerField()
+    fine = models.DecimalField(max_digits=10, decimal_places=2)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["as_of"], name="fine_snapshot_as_of_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.borrowing_id} - {self.fine} USD as of {self.as_of}"
+
+
+class FeeRule(models.Model):
+    """
+    How the borrowings of one book cover are priced, or of every cover
+    without a rule of its own when ``cover`` is blank. Borrowings not
+    covered by any rule keep the default pricing: the daily fee for each
+    borrowed day and ``OVERDUE_COEFFICIENT`` times it per overdue day.
+
+    Attributes:
+        cover (str): The ``Book.Cover`` the rule applies to, blank for
+                     the default rule.
+        daily_fee_multiplier (Decimal): Multiplies the book's daily fee,
+                                        for payments and fines alike.
+        grace_days (int): Overdue days that are not charged.
+        fine_cap (Decimal, optional): The most a single fine can be.
+        updated_at (datetime): When the rule was last changed.
+    """
+
+    cover = models.CharField(
+        max_length=4, choices=Book.Cover, blank=True, unique=True
+    )
+    daily_fee_multiplier = models.DecimalField(
+        max_digits=5, decimal_places=2, default=1
+    )
+    grace_days = models.PositiveSmallIntegerField(default=0)
+    fine_cap = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Fee rule for {self.cover or 'all'} covers"
+
+
+class OverdueTier(models.Model):
+    """
+    The fine rate of a rule from the ``from_day``-th charged overdue day
+    (counted after the grace days) up to the next tier. Days before the
+    first tier are charged at ``OVERDUE_COEFFICIENT``.
+
+    Attributes:
+        rule (FeeRule): The rule the tier belongs to.
+        from_day (int): The first charged overdue day of the tier, from 1.
+        coefficient (Decimal): The fine per day, in daily fees.
+    """
+
+    rule = models.ForeignKey(
+        FeeRule, on_delete=models.CASCADE, related_name="overdue_tiers"
+    )
+    from_day = models.PositiveSmallIntegerField(
+        default=1, validators=[MinValueValidator(1)]
+    )
+    coefficient = models.DecimalField(max_digits=5, decimal_places=2)
 
     class Meta:
-        ordering = ["-borrowing__borrow_date"]
+        ordering = ["from_day"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["rule", "from_day"], name="overdue_tier_day_unique"
+            ),
+            models.CheckConstraint(
+                condition=models.Q(from_day__gte=1),
+                name="overdue_tier_from_day_gte_1",
+            ),
+        ]
 
     def __str__(self):
-        return f"{self.borrowing.user.email} - {self.money_to_pay} USD - {self.status}"
+        return f"{self.coefficient}x from overdue day {self.from_day}"
@@ -1,19 +1,35 @@
+import logging
+from functools import partial
+
 import stripe
 from django.conf import settings
+from django.db import transaction
 from django.urls import reverse
+from kombu.exceptions import OperationalError
 
 from borrowing.models import Borrowing
-from payment.models import Payment
+from payment.fees import OVERDUE_COEFFICIENT  # noqa: F401
+from payment.fees import get_fee_schedule
+from payment.models import Payment, StripeEvent
 
 
-OVERDUE_COEFFICIENT = 2
+CURRENCY = "usd"
+PAID_EVENTS = (
+    "checkout.session.completed",
+    "checkout.session.async_payment_succeeded",
+)
+EXPIRED_EVENTS = ("checkout.session.expired",)
 stripe.api_key = settings.STRIPE_SECRET_KEY
+if settings.STRIPE_API_BASE:
+    stripe.api_base = settings.STRIPE_API_BASE
+
+logger = logging.getLogger(__name__)
 
 
 def calculate_money_to_pay(borrowing: Borrowing):
     """
     Calculate the amount of money to be paid based
-    on the borrowing details.
+    on the borrowing details and the fee rules.
 
     This function calculates the payment or fine
     amount depending on the following conditions:
@@ -21,53 +37,39 @@ def calculate_money_to_pay(borrowing: Borrowing):
       (i.e., `actual_return_date` is None), it calculates the fee
       based on the number of days the book is expected to be borrowed.
     - If the book is returned late, a fine is applied based on
-      the number of overdue days and the book's
-      daily fee.
+      the number of overdue days past the grace days, the overdue
+      tiers and the book's daily fee, up to the fine cap.
     - If the book is returned on time, no charge is applied.
 
+    The daily fee is multiplied by the multiplier of the rule of the
+    book's cover. The rules are compiled once per process (see
+    `payment.fees.get_fee_schedule`), so no query is made.
+
     Args:
         borrowing (Borrowing): The borrowing object containing
         details of the book, borrowing dates, and fees.
 
     Returns:
         tuple: A tuple containing:
-            - The calculated amount of money to be paid (float or int).
+            - The calculated amount of money to be paid (Decimal).
             - A string indicating the type of payment
             ("PAYMENT" for normal payments, "FINE" for fines, "ok" for no charge).
     """
-    if not borrowing.actual_return_date:
-        if borrowing.expected_return_date == borrowing.borrow_date:
-            result = (borrowing.book.daily_fee, "PAYMENT")
-            return result
-
-        clean_days = (
-            borrowing.expected_return_date - borrowing.borrow_date
-        ).days
-        count_of_money = clean_days * borrowing.book.daily_fee
-        result = (count_of_money, "PAYMENT")
-        return result
-
-    if borrowing.actual_return_date > borrowing.expected_return_date:
-        overdue_days = (
-            borrowing.actual_return_date - borrowing.expected_return_date
-        ).days
-
-        count_of_money = overdue_days * borrowing.book.daily_fee * OVERDUE_COEFFICIENT
-        result = (count_of_money, "FINE")
-        return result
-
-    result = (0, "ok")
-    return result
+    return get_fee_schedule().price(borrowing)
 
 
 def create_stripe_session(borrowing: Borrowing, request):
     """
-    Creates a Stripe checkout session for the given borrowing.
+    Creates a pending payment for the given borrowing and schedules
+    its Stripe checkout session.
 
     This function calculates the money to pay for the borrowing using the
     `calculate_money_to_pay` function. If a payment or fine is applicable, it
-    creates a new `Payment` object, initializes a Stripe checkout session,
-    and returns the URL for the user to complete the payment.
+    creates a new `Payment` object in the current transaction. The Stripe
+    checkout session is created by a Celery task once that transaction has
+    committed, so no database lock or connection is held during the
+    Stripe round-trip. If the task cannot be queued, the payment is
+    marked as FAILED.
 
     Args:
         borrowing (Borrowing): The borrowing object containing
@@ -76,7 +78,8 @@ def create_stripe_session(borrowing: Borrowing, request):
         to build absolute URLs for success and cancel URLs.
 
     Returns:
-        str: A URL where the user can complete the payment via Stripe,
+        Payment | str: The pending payment, whose checkout status can be
+        polled at the `payment:payments-checkout` endpoint,
         or "ok" if no payment is required.
     """
     money_to_pay, _type = calculate_money_to_pay(borrowing)
@@ -86,16 +89,71 @@ def create_stripe_session(borrowing: Borrowing, request):
         status="PENDING",
         type=_type,
         borrowing=borrowing,
+        user_id=borrowing.user_id,
+        borrow_date=borrowing.borrow_date,
         money_to_pay=money_to_pay,
     )
+    success_url = request.build_absolute_uri(
+        reverse("payment:payment-success") + f"?payment_id={payment.id}"
+    )
+    cancel_url = request.build_absolute_uri(
+        reverse("payment:payment-cancel") + f"?payment_id={payment.id}"
+    )
+    transaction.on_commit(
+        partial(queue_checkout_session, payment, success_url, cancel_url)
+    )
+    return payment
+
+
+def queue_checkout_session(payment: Payment, success_url, cancel_url):
+    """
+    Queues the Celery task creating the checkout session of a pending
+    payment. When the broker cannot be reached the task would never run,
+    so the payment is marked as FAILED rather than left pending.
+
+    Args:
+        payment (Payment): The pending payment.
+        success_url (str): Absolute URL Stripe redirects to after payment.
+        cancel_url (str): Absolute URL Stripe redirects to on cancel.
+    """
+    from payment.tasks import create_checkout_session
+
+    try:
+        create_checkout_session.delay(payment.id, success_url, cancel_url)
+    except OperationalError:
+        logger.exception(
+            "Checkout session of payment %s not queued.", payment.id
+        )
+        fail_checkout_session(payment)
+
+
+def start_checkout_session(payment: Payment, success_url, cancel_url):
+    """
+    Creates the Stripe checkout session of a pending payment.
+
+    The call is idempotent: a payment that already has a session is
+    returned unchanged.
+
+    Args:
+        payment (Payment): The pending payment, with its borrowing and
+        book loaded.
+        success_url (str): Absolute URL Stripe redirects to after payment.
+        cancel_url (str): Absolute URL Stripe redirects to on cancel.
+
+    Returns:
+        Payment: The payment with `session_url` and `session_id` set.
+    """
+    if payment.session_id:
+        return payment
+
     session = stripe.checkout.Session.create(
         payment_method_types=["card"],
         line_items=[
             {
                 "price_data": {
-                    "currency": "usd",
+                    "currency": CURRENCY,
                     "product_data": {
-                        "name": borrowing.book.title,
+                        "name": payment.borrowing.book.title,
                     },
                     "unit_amount": int(payment.money_to_pay * 100),
                 },
@@ -103,14 +161,84 @@ def create_stripe_session(borrowing: Borrowing, request):
             }
         ],
         mode="payment",
-        success_url=request.build_absolute_uri(
-            reverse("payment:payment-success") + f"?payment_id={payment.id}"
-        ),
-        cancel_url=request.build_absolute_uri(
-            reverse("payment:payment-cancel") + f"?payment_id={payment.id}"
-        ),
+        success_url=success_url,
+        cancel_url=cancel_url,
+        idempotency_key=f"payment-{payment.id}",
     )
 
     payment.session_url = session.url
     payment.session_id = session.id
-    payment.save()
+    payment.save(update_fields=["session_url", "session_id"])
+    return payment
+
+
+def fail_checkout_session(payment: Payment):
+    """
+    Marks a pending payment whose Stripe checkout session could not be
+    created as FAILED, so its checkout endpoint stops asking the client
+    to wait for it.
+
+    Args:
+        payment (Payment): The payment given up on.
+    """
+    if payment.session_id or payment.status != Payment.Status.PENDING:
+        return
+    payment.status = Payment.Status.FAILED
+    payment.save(update_fields=["status"])
+
+
+def handle_stripe_event(event):
+    """
+    Applies a verified Stripe webhook event to the matching payment.
+
+    `checkout.session.completed` (with a paid session) and
+    `checkout.session.async_payment_succeeded` mark the payment as PAID,
+    `checkout.session.expired` marks a payment that is not paid as EXPIRED.
+    Every event is recorded by id, so a redelivered event is ignored.
+
+    Args:
+        event (stripe.Event): The event returned by
+        `stripe.Webhook.construct_event`.
+
+    Returns:
+        bool: False if the event had already been processed, True otherwise.
+
+    Raises:
+        Payment.DoesNotExist: If no payment has the session of the event
+        (yet: the webhook can arrive before the session id is saved). The
+        event is not recorded, so it is applied when Stripe redelivers it.
+    """
+    with transaction.atomic():
+        _, created = StripeEvent.objects.get_or_create(
+            event_id=event["id"], defaults={"type": event["type"]}
+        )
+        if not created:
+            return False
+
+        session = event["data"]["object"]
+        if event["type"] in PAID_EVENTS:
+            if session["payment_status"] == "unpaid":
+                return True
+            new_status = Payment.Status.PAID
+        elif event["type"] in EXPIRED_EVENTS:
+            new_status = Payment.Status.EXPIRED
+        else:
+            return True
+
+        payment = (
+            Payment.objects.select_for_update()
+            .select_related("borrowing")
+            .filter(session_id=session["id"])
+            .first()
+        )
+        if payment is None:
+            raise Payment.DoesNotExist(
+                f"No payment has the checkout session {session['id']}."
+            )
+        if (
+            payment.status != new_status
+            and payment.status != Payment.Status.PAID
+        ):
+            payment.status = new_status
+            payment.save(update_fields=["status"])
+    return True
@@ -0,0 +1,22 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from core.cache import bump_cache_versions
+from payment.fees import FEE_RULES_SCOPE
+from payment.models import FeeRule, OverdueTier, Payment
+
+
+@receiver([post_save, post_delete], sender=Payment)
+def invalidate_cache(sender, instance, **kwargs):
+    bump_cache_versions("borrowing", f"borrowing:user:{instance.user_id}")
+
+
+@receiver([post_save, post_delete], sender=FeeRule)
+@receiver([post_save, post_delete], sender=OverdueTier)
+def invalidate_fee_schedule(sender, instance, **kwargs):
+    # Once committed, or another process could compile the old rules
+    # under the new version.
+    transaction.on_commit(partial(bump_cache_versions, FEE_RULES_SCOPE))
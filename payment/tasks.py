@@ -0,0 +1,53 @@
+from celery import shared_task
+from stripe import APIConnectionError, RateLimitError, StripeError
+
+from payment.accrual import snapshot_projected_fines
+from payment.models import Payment
+from payment.service import fail_checkout_session, start_checkout_session
+
+
+@shared_task(bind=True, max_retries=5, default_retry_delay=2)
+def create_checkout_session(self, payment_id, success_url, cancel_url):
+    """
+    Celery task to create the Stripe checkout session of a pending payment.
+
+    Runs after the transaction that created the payment has committed.
+    Transient Stripe errors (rate limits, network failures) are retried;
+    retries are safe because the session is created with an idempotency
+    key and skipped once the payment has one. When the session cannot be
+    created (another Stripe error, or the retries ran out), the payment is
+    marked as FAILED.
+
+    Args:
+        payment_id (int): ID of the pending payment.
+        success_url (str): Absolute URL Stripe redirects to after payment.
+        cancel_url (str): Absolute URL Stripe redirects to on cancel.
+
+    Returns:
+        None
+    """
+    payment = Payment.objects.select_related("borrowing__book").get(
+        pk=payment_id
+    )
+    try:
+        start_checkout_session(payment, success_url, cancel_url)
+    except (APIConnectionError, RateLimitError) as exc:
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=exc)
+        fail_checkout_session(payment)
+        raise
+    except StripeError:
+        fail_checkout_session(payment)
+        raise
+
+
+@shared_task
+def snapshot_fines():
+    """
+    Nightly Celery task projecting the fine of every open overdue
+    borrowing as of today into the fine snapshot table.
+
+    Returns:
+        int: The number of snapshots written.
+    """
+    return snapshot_projected_fines()
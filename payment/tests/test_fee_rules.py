@@ -0,0 +1,236 @@
+import datetime
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.test import TestCase
+
+from book.models import Book
+from borrowing.models import Borrowing
+from core.seed import LibrarySeeder
+from payment.accrual import annotate_money_to_pay
+from payment.fees import get_fee_schedule
+from payment.models import FeeRule, OverdueTier
+from payment.service import calculate_money_to_pay
+
+
+TODAY = datetime.date(2026, 6, 1)
+
+
+def loan(book, borrowed, expected, returned=None):
+    """An unsaved borrowing of ``book``, with dates in days from today."""
+    return Borrowing(
+        book=book,
+        borrow_date=TODAY + datetime.timedelta(days=borrowed),
+        expected_return_date=TODAY + datetime.timedelta(days=expected),
+        actual_return_date=(
+            None
+            if returned is None
+            else TODAY + datetime.timedelta(days=returned)
+        ),
+    )
+
+
+class FeeRuleTest(TestCase):
+    """
+    Test suite for the fee rules and their compiled schedule.
+    """
+
+    def setUp(self):
+        self.soft = Book(
+            title="soft", cover=Book.Cover.SOFT, daily_fee=Decimal("1.35")
+        )
+        self.hard = Book(
+            title="hard", cover=Book.Cover.HARD, daily_fee=Decimal("1.00")
+        )
+
+    def tearDown(self):
+        cache.clear()
+
+    def create_rule(self, tiers=(), **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            rule = FeeRule.objects.create(**fields)
+            for from_day, coefficient in tiers:
+                OverdueTier.objects.create(
+                    rule=rule, from_day=from_day, coefficient=coefficient
+                )
+        return rule
+
+    def test_default_pricing_without_rules(self):
+        """
+        Test that without rules borrowed days cost the daily fee and
+        overdue days twice the daily fee.
+        """
+        cases = [
+            (loan(self.soft, 0, 7), (Decimal("9.45"), "PAYMENT")),
+            (loan(self.soft, 0, 0), (Decimal("1.35"), "PAYMENT")),
+            (loan(self.soft, -10, -4, 0), (Decimal("10.80"), "FINE")),
+            (loan(self.soft, -10, -4, -4), (0, "ok")),
+        ]
+        for borrowing, expected in cases:
+            with self.subTest(borrowing=borrowing):
+                self.assertEqual(calculate_money_to_pay(borrowing), expected)
+
+    def test_overdue_coefficient_importable_from_service(self):
+        """
+        Test that the default overdue coefficient is still importable
+        from payment.service.
+        """
+        from payment.service import OVERDUE_COEFFICIENT
+
+        self.assertEqual(OVERDUE_COEFFICIENT, 2)
+
+    def test_cover_multiplier(self):
+        """
+        Test that the rule of a cover multiplies the daily fee of its
+        books only, rounding half up to the cent.
+        """
+        self.create_rule(cover=Book.Cover.HARD, daily_fee_multiplier="1.25")
+        self.hard.daily_fee = Decimal("1.35")
+
+        self.assertEqual(
+            calculate_money_to_pay(loan(self.hard, 0, 7)),
+            (Decimal("11.81"), "PAYMENT"),
+        )
+        self.assertEqual(
+            calculate_money_to_pay(loan(self.hard, -10, -4, -1)),
+            (Decimal("10.13"), "FINE"),
+        )
+        self.assertEqual(
+            calculate_money_to_pay(loan(self.soft, 0, 7)),
+            (Decimal("9.45"), "PAYMENT"),
+        )
+
+    def test_grace_days_tiers_and_cap(self):
+        """
+        Test that grace days are free, that each tier charges its own
+        rate and that a fine never exceeds the cap.
+        """
+        self.create_rule(
+            grace_days=2,
+            fine_cap="20.00",
+            tiers=[(1, "1.00"), (4, "3.00")],
+        )
+        cases = [
+            (2, (0, "ok")),
+            (5, (Decimal("3.00"), "FINE")),
+            (8, (Decimal("12.00"), "FINE")),
+            (20, (Decimal("20.00"), "FINE")),
+        ]
+        for overdue_days, expected in cases:
+            with self.subTest(overdue_days=overdue_days):
+                self.assertEqual(
+                    calculate_money_to_pay(
+                        loan(self.hard, -30, -overdue_days, 0)
+                    ),
+                    expected,
+                )
+
+    def test_days_before_the_first_tier(self):
+        """
+        Test that overdue days before the first tier are charged at the
+        default overdue rate.
+        """
+        self.create_rule(tiers=[(3, "5.00")])
+
+        self.assertEqual(
+            calculate_money_to_pay(loan(self.hard, -30, -4, 0)),
+            (Decimal("14.00"), "FINE"),
+        )
+
+    def test_tiers_start_on_the_first_overdue_day(self):
+        """
+        Test that the database refuses a tier starting before the first
+        charged overdue day.
+        """
+        rule = FeeRule.objects.create()
+
+        with self.assertRaises(IntegrityError):
+            OverdueTier.objects.create(
+                rule=rule, from_day=0, coefficient="1.00"
+            )
+
+    def test_pricing_costs_no_queries(self):
+        """
+        Test that the compiled schedule prices borrowings without queries.
+        """
+        self.create_rule(cover=Book.Cover.HARD, tiers=[(1, "3.00")])
+        get_fee_schedule()
+
+        with self.assertNumQueries(0):
+            for days in range(1, 50):
+                calculate_money_to_pay(loan(self.hard, -60, -days, 0))
+
+    def test_rule_changes_recompile_the_schedule(self):
+        """
+        Test that a committed rule change is picked up by the next pricing.
+        """
+        rule = self.create_rule(cover=Book.Cover.HARD)
+        borrowing = loan(self.hard, 0, 7)
+        self.assertEqual(calculate_money_to_pay(borrowing)[0], 7)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            rule.daily_fee_multiplier = Decimal("0.50")
+            rule.save()
+
+        self.assertEqual(calculate_money_to_pay(borrowing)[0], Decimal("3.50"))
+
+
+class FeeRuleBatchTest(TestCase):
+    """
+    Test suite for the SQL pricing of borrowings under fee rules.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        LibrarySeeder(seed=5, batch_size=500, today=TODAY).seed(600)
+        hard = FeeRule.objects.create(
+            cover=Book.Cover.HARD,
+            daily_fee_multiplier="1.35",
+            grace_days=1,
+            fine_cap="25.00",
+        )
+        OverdueTier.objects.create(rule=hard, from_day=5, coefficient="3.50")
+        default = FeeRule.objects.create(
+            daily_fee_multiplier="0.85", grace_days=3
+        )
+        OverdueTier.objects.create(
+            rule=default, from_day=1, coefficient="1.25"
+        )
+        OverdueTier.objects.create(
+            rule=default, from_day=8, coefficient="4.00"
+        )
+
+    def tearDown(self):
+        cache.clear()
+
+    def assert_matches_scalar(self, queryset, return_date=None):
+        charged = set()
+        for borrowing in queryset.select_related("book"):
+            if return_date and borrowing.actual_return_date is None:
+                borrowing.actual_return_date = return_date
+            money_to_pay, payment_type = calculate_money_to_pay(borrowing)
+            charged.add(payment_type)
+            with self.subTest(borrowing=borrowing.pk):
+                self.assertEqual(borrowing.money_to_pay, money_to_pay)
+                self.assertEqual(borrowing.payment_type, payment_type)
+        self.assertIn("FINE", charged)
+
+    def test_sql_matches_python(self):
+        """
+        Test that the SQL pricing of every borrowing matches the compiled
+        schedule.
+        """
+        self.assert_matches_scalar(
+            annotate_money_to_pay(Borrowing.objects.all())
+        )
+
+    def test_projected_fines_match_python(self):
+        """
+        Test that the projected fines of open borrowings match the fines
+        they would be charged if returned on the day.
+        """
+        self.assert_matches_scalar(
+            annotate_money_to_pay(Borrowing.objects.all(), return_date=TODAY),
+            return_date=TODAY,
+        )
@@ -0,0 +1,136 @@
+import copy
+import datetime
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+
+from book.models import Book
+from borrowing.models import Borrowing
+from core.seed import LibrarySeeder
+from payment.accrual import (
+    annotate_money_to_pay,
+    open_overdue_borrowings,
+    snapshot_projected_fines,
+)
+from payment.fees import get_fee_schedule
+from payment.models import FineSnapshot
+from payment.service import calculate_money_to_pay
+
+
+TODAY = datetime.date(2026, 6, 1)
+
+
+def days(count):
+    return TODAY + datetime.timedelta(days=count)
+
+
+class FineAccrualTest(TestCase):
+    """
+    Test suite for the batch pricing of borrowings and the fine snapshots.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        LibrarySeeder(seed=3, batch_size=500, today=TODAY).seed(400)
+        cls.book = Book.objects.create(
+            title="accrual_book",
+            author="author",
+            inventory=5,
+            daily_fee="1.35",
+        )
+        cls.cases = [
+            # (borrow_date, expected_return_date, actual_return_date)
+            (days(-3), days(-3), None),
+            (days(-3), days(4), None),
+            (days(-10), days(-4), None),
+            (days(-10), days(-4), days(-4)),
+            (days(-10), days(-4), days(-6)),
+            (days(-10), days(-4), days(-1)),
+        ]
+        for index, (borrow_date, expected, actual) in enumerate(cls.cases):
+            borrowing = Borrowing.objects.create(
+                book=cls.book,
+                user=get_user_model().objects.create_user(
+                    email=f"accrual{index}@test.com"
+                ),
+                expected_return_date=expected,
+                actual_return_date=actual,
+            )
+            Borrowing.objects.filter(pk=borrowing.pk).update(
+                borrow_date=borrow_date
+            )
+
+    def tearDown(self):
+        cache.clear()
+
+    def assert_matches_scalar(self, queryset, return_date=None):
+        for borrowing in queryset.select_related("book"):
+            scalar = borrowing
+            if return_date and borrowing.actual_return_date is None:
+                scalar = copy.copy(borrowing)
+                scalar.actual_return_date = return_date
+            money_to_pay, payment_type = calculate_money_to_pay(scalar)
+            with self.subTest(borrowing=borrowing.pk):
+                self.assertEqual(borrowing.money_to_pay, money_to_pay)
+                self.assertEqual(borrowing.payment_type, payment_type)
+
+    def test_matches_calculate_money_to_pay(self):
+        """
+        Test that every borrowing is priced exactly like the scalar function.
+        """
+        queryset = annotate_money_to_pay(Borrowing.objects.all())
+
+        self.assertEqual(
+            set(queryset.values_list("payment_type", flat=True)),
+            {"PAYMENT", "FINE", "ok"},
+        )
+        self.assert_matches_scalar(queryset)
+
+    def test_projection_matches_return_on_that_day(self):
+        """
+        Test that open borrowings are priced as if returned on the day.
+        """
+        queryset = annotate_money_to_pay(
+            Borrowing.objects.all(), return_date=TODAY
+        )
+
+        self.assert_matches_scalar(queryset, return_date=TODAY)
+
+    def test_snapshot_projected_fines(self):
+        """
+        Test that every open overdue borrowing gets its projected fine.
+        """
+        overdue = open_overdue_borrowings(TODAY)
+        get_fee_schedule()
+
+        with self.assertNumQueries(6):
+            written = snapshot_projected_fines(TODAY, chunk_size=1000)
+
+        self.assertEqual(written, overdue.count())
+        self.assertGreater(written, 1)
+        snapshot = FineSnapshot.objects.get(
+            borrowing__book=self.book, borrowing__borrow_date=days(-10)
+        )
+        self.assertEqual(snapshot.overdue_days, 4)
+        self.assertEqual(snapshot.fine, Decimal("10.80"))
+        self.assertEqual(snapshot.user_id, snapshot.borrowing.user_id)
+
+    def test_snapshot_drops_returned_borrowings(self):
+        """
+        Test that a new snapshot replaces the previous one and drops the
+        borrowings returned since.
+        """
+        snapshot_projected_fines(days(-1), chunk_size=7)
+        returned = open_overdue_borrowings(days(-1)).first()
+        returned.actual_return_date = TODAY
+        returned.save()
+
+        written = snapshot_projected_fines(TODAY, chunk_size=7)
+
+        self.assertEqual(FineSnapshot.objects.count(), written)
+        self.assertFalse(
+            FineSnapshot.objects.filter(borrowing=returned).exists()
+        )
+        self.assertFalse(FineSnapshot.objects.exclude(as_of=TODAY).exists())
@@ -1,5 +1,8 @@
 from datetime import timedelta
 
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.utils.timezone import now
@@ -99,6 +102,24 @@ class AuthenticatedPaymentApiTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data, serializer.data)
 
+    def test_payment_copies_borrowing_user_and_date(self):
+        """
+        Test that a payment stores the user and borrow date of its borrowing.
+        """
+        self.assertEqual(self.first_payment.user, self.user)
+        self.assertEqual(
+            self.first_payment.borrow_date, self.borrowing.borrow_date
+        )
+
+    def test_list_payment_filters_without_join(self):
+        """
+        Test that a user's payments are read from the payment index alone.
+        """
+        queryset = Payment.objects.filter(user=self.user)
+
+        self.assertNotIn("borrowing_borrowing", str(queryset.query))
+        self.assertIn("payment_user_order_idx", queryset.explain())
+
     def test_retrieve_payment(self):
         """
         Test that authenticated users can retrieve the details of their specific payments.
@@ -175,3 +196,87 @@ class AdminPaymentApiTest(APITestCase):
         serializer = PaymentListSerializer(payments, many=True)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data, serializer.data)
+
+    def test_keyset_pages_newest_borrowing_first(self):
+        """
+        Test that payments read with a cursor come newest borrowing first,
+        the latest payment first among borrowings of the same day.
+        """
+        first_page = self.client.get(PAYMENT_URL, {"page_size": 1})
+        second_page = self.client.get(first_page.data["next"])
+
+        self.assertEqual(
+            [
+                first_page.data["results"][0]["id"],
+                second_page.data["results"][0]["id"],
+            ],
+            [self.second_payment.id, self.first_payment.id],
+        )
+        self.assertIsNone(second_page.data["next"])
+
+    def add_borrowings_with_payments(self, count):
+        """
+        Create ``count`` borrowings of new books, each with two payments.
+        """
+        for index in range(count):
+            book = Book.objects.create(
+                title=f"extra_book_{index}",
+                author="extra_author",
+                inventory=3,
+                daily_fee=2,
+            )
+            borrowing = Borrowing.objects.create(
+                expected_return_date=now().date() + timedelta(days=5),
+                book=book,
+                user=get_user_model().objects.create_user(
+                    email=f"extra{index}@test.com", password="test1234"
+                ),
+            )
+            Payment.objects.create(borrowing=borrowing, money_to_pay=4)
+            Payment.objects.create(
+                borrowing=borrowing, money_to_pay=6, type=Payment.Type.FINE
+            )
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    def test_list_query_count_does_not_grow_with_page(self):
+        """
+        Test that the payment list loads the nested borrowings, books and
+        payments in a constant number of queries.
+        """
+        url = f"{PAYMENT_URL}?limit=100"
+        queries = self.count_queries(url)
+        self.add_borrowings_with_payments(10)
+
+        self.assertEqual(self.count_queries(url), queries)
+
+        response = self.client.get(url)
+        payments = Payment.objects.all()
+        serializer = PaymentListSerializer(payments, many=True)
+        self.assertEqual(response.data["results"], serializer.data)
+
+    def test_retrieve_query_count_does_not_grow_with_borrowings(self):
+        """
+        Test that the payment detail counts the active borrowings of its
+        book in a constant number of queries.
+        """
+        url = get_retrieve_payment_url(self.first_payment.id)
+        queries = self.count_queries(url)
+        for index in range(5):
+            Borrowing.objects.create(
+                expected_return_date=now().date() + timedelta(days=5),
+                book=self.first_book,
+                user=get_user_model().objects.create_user(
+                    email=f"reader{index}@test.com", password="test1234"
+                ),
+            )
+
+        self.assertEqual(self.count_queries(url), queries)
+        response = self.client.get(url)
+        book = response.data["borrowing"]["book"]
+        self.assertEqual(book["unreturned_borrowings_count"], 6)
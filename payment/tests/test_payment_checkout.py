@@ -0,0 +1,203 @@
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+import stripe
+from kombu.exceptions import OperationalError
+
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.utils.timezone import now
+from rest_framework.test import APITestCase
+from rest_framework import status
+
+from book.models import Book
+from borrowing.models import Borrowing
+from payment.models import Payment
+from payment.tasks import create_checkout_session
+
+
+def get_checkout_url(payment_id: int):
+    """
+    Generate URL for the checkout status of a specific payment.
+
+    Args:
+        payment_id (int): ID of the payment.
+
+    Returns:
+        str: URL of the payment checkout endpoint.
+    """
+    return reverse("payment:payments-checkout", args=(payment_id,))
+
+
+class CheckoutSessionTest(APITestCase):
+    """
+    Test suite for the two-phase creation of Stripe checkout sessions.
+    """
+
+    def setUp(self):
+        """
+        Set up a user and a book to borrow.
+        """
+        self.user = get_user_model().objects.create_user(
+            email="test@test.com", password="test1234"
+        )
+        self.book = Book.objects.create(
+            title="checkout_book",
+            author="checkout_author",
+            inventory=3,
+            daily_fee=2,
+        )
+        self.client.force_authenticate(self.user)
+
+    @patch("payment.tasks.create_checkout_session.delay")
+    @patch("stripe.checkout.Session.create")
+    def test_session_created_after_commit(self, stripe_create, delay):
+        """
+        Test that borrowing commits a pending payment without calling Stripe
+        and schedules the checkout session once the transaction commits.
+        """
+        data = {
+            "expected_return_date": now().date() + timedelta(days=3),
+            "book": self.book.title,
+        }
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = self.client.post(
+                reverse("borrowing:borrowings-list"), data, format="json"
+            )
+
+        payment = Payment.objects.get(borrowing__user=self.user)
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        self.assertEqual(response.url, get_checkout_url(payment.id))
+        self.assertEqual(payment.status, Payment.Status.PENDING)
+        self.assertEqual(payment.money_to_pay, 6)
+        stripe_create.assert_not_called()
+        delay.assert_not_called()
+
+        for callback in callbacks:
+            callback()
+        delay.assert_called_once()
+        self.assertEqual(delay.call_args.args[0], payment.id)
+
+    @patch("stripe.checkout.Session.create")
+    def test_task_stores_session_once(self, stripe_create):
+        """
+        Test that the task stores the Stripe session and is idempotent.
+        """
+        stripe_create.return_value = MagicMock(
+            id="cs_test_1", url="https://checkout.stripe.test/cs_test_1"
+        )
+        borrowing = Borrowing.objects.create(
+            expected_return_date=now().date() + timedelta(days=3),
+            book=self.book,
+            user=self.user,
+        )
+        payment = Payment.objects.create(borrowing=borrowing, money_to_pay=6)
+
+        create_checkout_session(payment.id, "http://s/", "http://c/")
+        create_checkout_session(payment.id, "http://s/", "http://c/")
+
+        payment.refresh_from_db()
+        self.assertEqual(payment.session_id, "cs_test_1")
+        stripe_create.assert_called_once()
+
+    def test_checkout_status(self):
+        """
+        Test that the checkout endpoint asks the client to poll until the
+        session exists and then redirects to it.
+        """
+        borrowing = Borrowing.objects.create(
+            expected_return_date=now().date() + timedelta(days=3),
+            book=self.book,
+            user=self.user,
+        )
+        payment = Payment.objects.create(borrowing=borrowing, money_to_pay=6)
+
+        response = self.client.get(get_checkout_url(payment.id))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response["Retry-After"], "1")
+
+        payment.session_url = "https://checkout.stripe.test/cs_test_2"
+        payment.session_id = "cs_test_2"
+        payment.save()
+        response = self.client.get(get_checkout_url(payment.id))
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        self.assertEqual(response.url, payment.session_url)
+
+    def create_payment(self):
+        borrowing = Borrowing.objects.create(
+            expected_return_date=now().date() + timedelta(days=3),
+            book=self.book,
+            user=self.user,
+        )
+        return Payment.objects.create(borrowing=borrowing, money_to_pay=6)
+
+    @patch("stripe.checkout.Session.create")
+    def test_checkout_failed_on_stripe_error(self, stripe_create):
+        """
+        Test that a session Stripe refuses to create fails the payment and
+        its checkout endpoint instead of asking the client to wait.
+        """
+        stripe_create.side_effect = stripe.InvalidRequestError(
+            "Invalid amount", "unit_amount"
+        )
+        payment = self.create_payment()
+
+        result = create_checkout_session.apply(
+            args=(payment.id, "http://s/", "http://c/")
+        )
+
+        self.assertTrue(result.failed())
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, Payment.Status.FAILED)
+        response = self.client.get(get_checkout_url(payment.id))
+        self.assertEqual(response.status_code, status.HTTP_502_BAD_GATEWAY)
+        self.assertEqual(response.data["status"], Payment.Status.FAILED)
+
+    @patch("stripe.checkout.Session.create")
+    def test_checkout_failed_after_last_retry(self, stripe_create):
+        """
+        Test that a transient error is retried, and fails the payment once
+        the retries ran out.
+        """
+        stripe_create.side_effect = stripe.APIConnectionError("down")
+        payment = self.create_payment()
+        args = (payment.id, "http://s/", "http://c/")
+
+        with patch.object(
+            create_checkout_session, "retry", side_effect=RuntimeError
+        ) as retry:
+            with self.assertRaises(RuntimeError):
+                create_checkout_session.apply(args=args, throw=True)
+        retry.assert_called_once()
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, Payment.Status.PENDING)
+
+        result = create_checkout_session.apply(
+            args=args, retries=create_checkout_session.max_retries
+        )
+
+        self.assertTrue(result.failed())
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, Payment.Status.FAILED)
+
+    @patch("payment.tasks.create_checkout_session.delay")
+    def test_checkout_failed_when_not_queued(self, delay):
+        """
+        Test that a payment whose task cannot be queued fails instead of
+        staying pending.
+        """
+        delay.side_effect = OperationalError("broker down")
+        data = {
+            "expected_return_date": now().date() + timedelta(days=3),
+            "book": self.book.title,
+        }
+        with self.assertLogs("payment.service", level="ERROR"):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(
+                    reverse("borrowing:borrowings-list"), data, format="json"
+                )
+
+        payment = Payment.objects.get(borrowing__user=self.user)
+        self.assertEqual(payment.status, Payment.Status.FAILED)
+        response = self.client.get(get_checkout_url(payment.id))
+        self.assertEqual(response.status_code, status.HTTP_502_BAD_GATEWAY)
@@ -0,0 +1,227 @@
+import hashlib
+import hmac
+import json
+import time
+from datetime import timedelta
+
+from django.test import override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.utils.timezone import now
+from rest_framework.test import APITestCase
+from rest_framework import status
+
+from book.models import Book
+from borrowing.models import Borrowing
+from payment.models import Payment, StripeEvent
+
+
+WEBHOOK_URL = reverse("payment:payment-webhook")
+WEBHOOK_SECRET = "whsec_test"
+
+
+def sign_payload(payload: str, secret: str = WEBHOOK_SECRET):
+    """
+    Build a Stripe-Signature header for the payload.
+
+    Args:
+        payload (str): The raw JSON body of the event.
+        secret (str): The webhook signing secret.
+
+    Returns:
+        str: The header value Stripe would send with the payload.
+    """
+    timestamp = int(time.time())
+    signature = hmac.new(
+        secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256
+    ).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+def build_event(event_id: str, event_type: str, session_id: str):
+    """
+    Build the JSON body of a Stripe checkout session event.
+    """
+    return json.dumps(
+        {
+            "id": event_id,
+            "object": "event",
+            "type": event_type,
+            "data": {
+                "object": {
+                    "id": session_id,
+                    "object": "checkout.session",
+                    "payment_status": "paid",
+                }
+            },
+        }
+    )
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET)
+class PaymentWebhookTest(APITestCase):
+    """
+    Test suite for the Stripe webhook endpoint.
+    """
+
+    def setUp(self):
+        """
+        Set up a pending payment with a Stripe checkout session.
+        """
+        self.user = get_user_model().objects.create_user(
+            email="test@test.com", password="test1234"
+        )
+        book = Book.objects.create(
+            title="webhook_book",
+            author="webhook_author",
+            inventory=3,
+            daily_fee=2,
+        )
+        borrowing = Borrowing.objects.create(
+            expected_return_date=now().date() + timedelta(days=3),
+            book=book,
+            user=self.user,
+        )
+        self.payment = Payment.objects.create(
+            borrowing=borrowing,
+            money_to_pay=6,
+            session_id="cs_test_webhook",
+            session_url="https://checkout.stripe.test/cs_test_webhook",
+        )
+
+    def post_event(self, payload: str, signature: str = None):
+        return self.client.post(
+            WEBHOOK_URL,
+            payload,
+            content_type="application/json",
+            HTTP_STRIPE_SIGNATURE=signature or sign_payload(payload),
+        )
+
+    def test_completed_event_marks_payment_paid(self):
+        """
+        Test that a completed checkout session marks the payment as paid.
+        """
+        payload = build_event(
+            "evt_1", "checkout.session.completed", "cs_test_webhook"
+        )
+        response = self.post_event(payload)
+
+        self.payment.refresh_from_db()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.payment.status, Payment.Status.PAID)
+
+    @override_settings(STRIPE_WEBHOOK_SECRET="")
+    def test_event_refused_without_secret(self):
+        """
+        Test that no event is accepted while the signing secret is unset,
+        even one signed with the empty key.
+        """
+        payload = build_event(
+            "evt_unset", "checkout.session.completed", "cs_test_webhook"
+        )
+        with self.assertLogs("payment.views", level="ERROR"):
+            response = self.post_event(payload, sign_payload(payload, ""))
+
+        self.payment.refresh_from_db()
+        self.assertEqual(
+            response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+        self.assertEqual(self.payment.status, Payment.Status.PENDING)
+        self.assertFalse(StripeEvent.objects.exists())
+
+    def test_redelivered_event_is_ignored(self):
+        """
+        Test that an event is applied only once.
+        """
+        payload = build_event(
+            "evt_2", "checkout.session.completed", "cs_test_webhook"
+        )
+        self.post_event(payload)
+        self.payment.status = Payment.Status.PENDING
+        self.payment.save()
+
+        response = self.post_event(payload)
+
+        self.payment.refresh_from_db()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.payment.status, Payment.Status.PENDING)
+        self.assertEqual(StripeEvent.objects.count(), 1)
+
+    def test_expired_event_does_not_override_paid(self):
+        """
+        Test that an expired session never un-pays a paid payment.
+        """
+        self.post_event(
+            build_event(
+                "evt_3", "checkout.session.completed", "cs_test_webhook"
+            )
+        )
+        self.post_event(
+            build_event("evt_4", "checkout.session.expired", "cs_test_webhook")
+        )
+
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.Status.PAID)
+
+    def test_event_before_session_saved_is_redelivered(self):
+        """
+        Test that an event arriving before its payment has the session id
+        is refused without being recorded, and applied when redelivered.
+        """
+        self.payment.session_id = None
+        self.payment.save()
+        payload = build_event(
+            "evt_early", "checkout.session.completed", "cs_test_webhook"
+        )
+
+        with self.assertLogs("payment.views", level="WARNING"):
+            response = self.post_event(payload)
+
+        self.assertEqual(
+            response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+        self.assertFalse(StripeEvent.objects.exists())
+
+        self.payment.session_id = "cs_test_webhook"
+        self.payment.save()
+        response = self.post_event(payload)
+
+        self.payment.refresh_from_db()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.payment.status, Payment.Status.PAID)
+
+    def test_invalid_signature_rejected(self):
+        """
+        Test that events with a wrong signature are rejected.
+        """
+        payload = build_event(
+            "evt_5", "checkout.session.completed", "cs_test_webhook"
+        )
+        response = self.post_event(
+            payload, signature=sign_payload(payload, secret="whsec_other")
+        )
+
+        self.payment.refresh_from_db()
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.payment.status, Payment.Status.PENDING)
+
+    def test_success_view_reads_stored_status(self):
+        """
+        Test that the success view answers from the stored payment status.
+        """
+        self.client.force_authenticate(self.user)
+        url = reverse("payment:payment-success")
+
+        response = self.client.get(url, {"payment_id": self.payment.id})
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        self.post_event(
+            build_event(
+                "evt_6", "checkout.session.completed", "cs_test_webhook"
+            )
+        )
+        response = self.client.get(url, {"payment_id": self.payment.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["amount_paid"], 6)
+        self.assertIsInstance(response.data["amount_paid"], float)
+        self.assertEqual(response.data["currency"], "usd")
@@ -5,6 +5,7 @@ from payment.views import (
     PaymentListCreateView,
     PaymentSuccessView,
     PaymentCancelView,
+    PaymentWebhookView,
 )
 
 
@@ -14,6 +15,7 @@ router.register("", PaymentListCreateView, basename="payments")
 urlpatterns = [
     path("success/", PaymentSuccessView.as_view(), name="payment-success"),
     path("cancel/", PaymentCancelView.as_view(), name="payment-cancel"),
+    path("webhook/", PaymentWebhookView.as_view(), name="payment-webhook"),
     path("", include(router.urls)),
 ]
 
@@ -1,32 +1,37 @@
+import logging
+
 import stripe
 from django.conf import settings
+from django.http import HttpResponseRedirect
 from django.shortcuts import get_object_or_404
 from rest_framework import viewsets, mixins
+from rest_framework.decorators import action
 from rest_framework.views import APIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from stripe import (
-    CardError,
-    RateLimitError,
-    InvalidRequestError,
-    AuthenticationError,
-    APIConnectionError,
-    StripeError
-)
+from stripe import SignatureVerificationError
 
+from core.cache import UserCachedResponseMixin
+from core.pagination import LimitOffsetOrKeysetPagination
+from core.prefetch import PrefetchPlanMixin
 from payment.models import Payment
 from payment.serializers import (
     PaymentSerializer,
     PaymentListSerializer,
     PaymentDetailSerializer,
 )
+from payment.service import CURRENCY, handle_stripe_event
 
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
+logger = logging.getLogger(__name__)
+
 
 class PaymentListCreateView(
+    UserCachedResponseMixin,
+    PrefetchPlanMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
     viewsets.GenericViewSet,
@@ -37,7 +42,9 @@ class PaymentListCreateView(
     This view provides endpoints for listing all payments and retrieving
     individual payment records. It supports nested borrowing data in the
     response, with different serializers based on the type of action performed
-    (list or retrieve).
+    (list or retrieve). Responses are cached for 5 minutes per user. The
+    nested borrowings, books and payments are loaded up front by
+    ``PrefetchPlanMixin``, planned from the serializer of the action.
 
     Permissions:
         - Requires authentication for all actions.
@@ -46,6 +53,14 @@ class PaymentListCreateView(
 
     Attributes:
         permission_classes (list): Restricts access to authenticated users only.
+        pagination_class: Limit/offset pagination, or keyset pagination on
+                          the same ordering (newest borrow date first) when
+                          ``?page_size=`` or ``?cursor=`` is passed.
+        cache_key_prefix (str): Prefix of the per-user response cache keys.
+        cache_scopes (tuple): Cache scopes whose writes invalidate the cached
+                              responses.
+        cache_user_scopes (tuple): Cache scopes narrowed to the user's own
+                                   borrowings, unless the user is an admin.
 
     Methods:
         get_queryset():
@@ -59,9 +74,18 @@ class PaymentListCreateView(
             - list: Uses PaymentListSerializer to provide summarized borrowing data.
             - retrieve: Uses PaymentDetailSerializer for detailed borrowing data.
             - default: Falls back to PaymentSerializer for basic CRUD operations.
+
+        checkout():
+            Redirects to the Stripe checkout session of a payment, or answers
+            202 while the session is still being created.
     """
 
     permission_classes = [IsAuthenticated]
+    pagination_class = LimitOffsetOrKeysetPagination
+    keyset_ordering = ("-borrow_date", "-id")
+    cache_key_prefix = "payment_view"
+    cache_scopes = ("catalogue",)
+    cache_user_scopes = ("borrowing",)
 
     def get_queryset(self):
         """
@@ -72,10 +96,10 @@ class PaymentListCreateView(
                       payments, while regular users only receive payments
                       linked to their own borrowing records.
         """
-        queryset = Payment.objects.select_related("borrowing")
+        queryset = Payment.objects.all()
         if self.request.user.is_staff:
             return queryset
-        return queryset.filter(borrowing__user__id=self.request.user.id)
+        return queryset.filter(user=self.request.user)
 
     def get_serializer_class(self):
         """
@@ -93,204 +117,177 @@ class PaymentListCreateView(
             return PaymentDetailSerializer
         return PaymentSerializer
 
+    @action(methods=["GET"], detail=True, url_path="checkout")
+    def checkout(self, request, pk=None):
+        """
+        Redirect to the Stripe checkout session of the payment.
 
-class PaymentSuccessView(APIView):
-    """
-    View for handling successful payment responses from Stripe.
-
-    This view processes the successful payment callback from Stripe, updates the
-    payment status to 'PAID', and returns the payment details including the
-    amount paid and the currency.
-
-    Methods:
-        get: Handles the GET request for successful payment. Updates the payment status
-             and returns the payment details.
-    """
-    permission_classes = [IsAuthenticated]
+        The session is created in the background after the borrowing is
+        committed. Until it exists, respond with 202 and a Retry-After
+        header so the client can poll this endpoint. If it could not be
+        created, respond with 502.
+        """
+        payment = self.get_object()
 
-    def get(self, request, *args, **kwargs):
-        try:
-            payment_id = request.query_params.get("payment_id")
-            if not payment_id:
-                return Response(
-                    {"error": "Payment ID is required."},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-            payment = get_object_or_404(
-                Payment.objects.filter(borrowing__user=request.user), id=int(payment_id)
+        if payment.status == Payment.Status.PAID:
+            return Response(
+                {"status": payment.status}, status=status.HTTP_200_OK
             )
-            session = stripe.checkout.Session.retrieve(payment.session_id)
-
-            if payment.status != "PAID":
-                payment.status = "PAID"
-                payment.save()
 
+        if payment.status == Payment.Status.FAILED:
             return Response(
                 {
-                    "message": "Payment successful",
-                    "amount_paid": session.amount_total / 100,
-                    "currency": session.currency,
+                    "status": payment.status,
+                    "detail": "The checkout session could not be created.",
                 },
-                status=status.HTTP_200_OK,
+                status=status.HTTP_502_BAD_GATEWAY,
             )
-        except CardError:
+
+        if not payment.session_url:
             return Response(
                 {
-                    "error": "Your card has been declined. "
-                             "Please check your card details or use a different card."
+                    "status": payment.status,
+                    "detail": "The checkout session is being created.",
                 },
-                status=status.HTTP_400_BAD_REQUEST,
+                status=status.HTTP_202_ACCEPTED,
+                headers={"Retry-After": "1"},
             )
-        except RateLimitError:
-            return Response(
 
-                {
-                    "error": "Payment failed due to high request traffic. "
-                             "Please try again later."
-                },
-                status=status.HTTP_429_TOO_MANY_REQUESTS,
-            )
-        except InvalidRequestError:
-            return Response(
+        return HttpResponseRedirect(
+            payment.session_url, status=status.HTTP_302_FOUND
+        )
 
-                {
-                    "error": "There was an issue with the payment details. "
-                             "Please verify the information and try again."
-                },
 
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-        except AuthenticationError:
-            return Response(
-                {
-                    "error": "Authentication with the payment gateway failed. "
-                             "Please contact support."
-                },
-                status=status.HTTP_401_UNAUTHORIZED,
-            )
-        except APIConnectionError:
-            return Response(
-                {
-                    "error": "A network error occurred. "
-                             "Please check your internet connection and try again."
-                },
-                status=status.HTTP_503_SERVICE_UNAVAILABLE,
-            )
-        except StripeError:
+class PaymentSuccessView(APIView):
+    """
+    View for handling successful payment responses from Stripe.
+
+    Stripe redirects the user here after checkout. The payment status is
+    set by the Stripe webhook, so this view only reads the stored payment
+    and never calls Stripe.
+
+    Methods:
+        get: Handles the GET request for successful payment. Returns the
+             payment details once the payment is confirmed, or 202 while
+             the webhook has not arrived yet.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        payment_id = request.query_params.get("payment_id")
+        if not payment_id or not payment_id.isdigit():
             return Response(
-                {
-                    "error": "An error occurred with the payment process. "
-                             "Please try again or contact support."
-                },
+                {"error": "Payment ID is required."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        except Exception:
+        payment = get_object_or_404(
+            Payment.objects.filter(user=request.user),
+            id=int(payment_id),
+        )
+
+        if payment.status != Payment.Status.PAID:
             return Response(
                 {
-                    "error": "An unexpected error occurred. "
-                             "Please try again or contact support."
+                    "message": "Your payment is being confirmed. "
+                               "Please check again in a moment.",
+                    "status": payment.status,
                 },
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                status=status.HTTP_202_ACCEPTED,
             )
 
+        return Response(
+            {
+                "message": "Payment successful",
+                "amount_paid": float(payment.money_to_pay),
+                "currency": CURRENCY,
+            },
+            status=status.HTTP_200_OK,
+        )
+
 
 class PaymentCancelView(APIView):
     """
     View for handling cancelled payment responses from Stripe.
 
-    This view processes the cancelled payment callback from Stripe, updates the
-    payment status to 'PENDING', and provides a link to the Stripe session
-    for the user to retry the payment.
+    This view reads the stored payment and provides a link to the Stripe
+    session for the user to retry the payment, without calling Stripe.
 
     Methods:
-        get: Handles the GET request for a cancelled payment. Updates the payment
-             status and returns a message indicating cancellation and a link for
-             retrying the payment.
+        get: Handles the GET request for a cancelled payment. Returns a
+             message indicating cancellation and a link for retrying
+             the payment.
     """
     permission_classes = [IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
-        try:
-            payment_id = request.query_params.get("payment_id")
-            if not payment_id:
-                return Response(
-                    {"error": "Payment ID is required."},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-            payment = get_object_or_404(
-                Payment.objects.filter(borrowing__user=request.user), id=int(payment_id)
-            )
-            session = stripe.checkout.Session.retrieve(payment.session_id)
-
-            if payment.status != "PENDING":
-                payment.status = "PENDING"
-                payment.save()
-
+        payment_id = request.query_params.get("payment_id")
+        if not payment_id or not payment_id.isdigit():
             return Response(
-                {
-                    "message": "Payment was cancelled.You can pay the rent within 24 hours",
-                    "pay": session.url,
-                    "amount_paid": session.amount_total / 100,
-                    "currency": session.currency,
-                },
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-        except CardError:
-            return Response(
-                {
-                    "error": "Your card has been declined. "
-                             "Please check your card details or use a different card."
-                },
+                {"error": "Payment ID is required."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        except RateLimitError:
-            return Response(
+        payment = get_object_or_404(
+            Payment.objects.filter(user=request.user),
+            id=int(payment_id),
+        )
+
+        return Response(
+            {
+                "message": "Payment was cancelled.You can pay the rent within 24 hours",
+                "pay": payment.session_url,
+                "amount_paid": float(payment.money_to_pay),
+                "currency": CURRENCY,
+            },
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+
+class PaymentWebhookView(APIView):
+    """
+    Endpoint for Stripe webhook events.
 
-                {
-                    "error": "Payment failed due to high request traffic. "
-                             "Please try again later."
-                },
-                status=status.HTTP_429_TOO_MANY_REQUESTS,
-            )
-        except InvalidRequestError:
-            return Response(
+    The event signature is verified locally against STRIPE_WEBHOOK_SECRET,
+    then `checkout.session.completed` / `expired` events update the status
+    of the matching payment. Redelivered events are acknowledged without
+    being applied twice, and an event without a matching payment is
+    refused so that Stripe delivers it again. Without a secret every event
+    is refused, since an empty key would accept payloads signed by anyone.
 
-                {
-                    "error": "There was an issue with the payment details. "
-                             "Please verify the information and try again."
-                },
+    Methods:
+        post: Verifies and records a Stripe event.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
 
-                status=status.HTTP_400_BAD_REQUEST,
+    def post(self, request, *args, **kwargs):
+        if not settings.STRIPE_WEBHOOK_SECRET:
+            logger.error(
+                "Stripe webhook refused: STRIPE_WEBHOOK_SECRET is not set."
             )
-        except AuthenticationError:
             return Response(
-                {
-                    "error": "Authentication with the payment gateway failed. "
-                             "Please contact support."
-                },
-                status=status.HTTP_401_UNAUTHORIZED,
-            )
-        except APIConnectionError:
-            return Response(
-                {
-                    "error": "A network error occurred. "
-                             "Please check your internet connection and try again."
-                },
+                {"error": "Stripe webhooks are not configured."},
                 status=status.HTTP_503_SERVICE_UNAVAILABLE,
             )
-        except StripeError:
+
+        try:
+            event = stripe.Webhook.construct_event(
+                request.body,
+                request.META.get("HTTP_STRIPE_SIGNATURE", ""),
+                settings.STRIPE_WEBHOOK_SECRET,
+            )
+        except (ValueError, SignatureVerificationError):
             return Response(
-                {
-                    "error": "An error occurred with the payment process. "
-                             "Please try again or contact support."
-                },
+                {"error": "Invalid Stripe webhook event."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        except Exception:
+
+        try:
+            handle_stripe_event(event)
+        except Payment.DoesNotExist as error:
+            # Any other status than 2xx makes Stripe redeliver the event.
+            logger.warning("Stripe webhook not applied: %s", error)
             return Response(
-                {
-                    "error": "An unexpected error occurred. "
-                             "Please try again or contact support."
-                },
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                {"error": "No payment matches the event yet."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
             )
+        return Response({"received": True}, status=status.HTTP_200_OK)
@@ -0,0 +1,159 @@
+import asyncio
+import datetime
+import logging
+import os
+import random
+import time
+
+from telegram import Bot
+from telegram.error import NetworkError, RetryAfter
+from telegram.request import HTTPXRequest
+
+
+BOT_TOKEN = os.getenv("BOT_TOKEN")
+CHAT_ID = os.getenv("CHAT_ID")
+BOT_API_BASE_URL = os.getenv(
+    "BOT_API_BASE_URL", "https://api.telegram.org/bot"
+)
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Asyncio token bucket: allows bursts of ``capacity`` calls and
+    ``rate`` calls per second on average.
+    """
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.updated_at = clock()
+
+    async def acquire(self):
+        while True:
+            now = self.clock()
+            self.tokens = min(
+                self.capacity,
+                self.tokens + (now - self.updated_at) * self.rate,
+            )
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class TelegramDispatcher:
+    """
+    Sends Telegram messages through one long-lived bot per process.
+
+    The bot, its HTTP connection pool and the event loop they are bound to
+    are created on first use and reused by every later batch, instead of
+    building a new bot and event loop per message. A batch is sent
+    concurrently with ``asyncio.gather``, throttled by a token bucket per
+    chat and one for the whole bot (Telegram allows about one message per
+    second per chat and 30 per second overall). Flood-control errors are
+    retried after the delay Telegram asks for, network errors with
+    exponential backoff.
+    """
+
+    def __init__(
+        self,
+        bot=None,
+        chat_id=CHAT_ID,
+        chat_rate=1.0,
+        chat_burst=3,
+        global_rate=30.0,
+        max_retries=5,
+        backoff=0.5,
+    ):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_buckets = {}
+        self.loop = None
+        self.bot_initialized = False
+
+    def send(self, messages, chat_id=None):
+        """
+        Send a batch of messages and wait for all of them.
+
+        Returns:
+            list[bool]: Whether each message was delivered, in order.
+        """
+        if self.loop is None or self.loop.is_closed():
+            self.loop = asyncio.new_event_loop()
+        return self.loop.run_until_complete(
+            self.send_batch(messages, chat_id or self.chat_id)
+        )
+
+    async def send_batch(self, messages, chat_id):
+        await self.ensure_bot()
+        results = await asyncio.gather(
+            *(self.send_one(chat_id, message) for message in messages),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error("Telegram message not delivered: %s", result)
+        return [result is True for result in results]
+
+    async def ensure_bot(self):
+        if self.bot is None:
+            self.bot = Bot(
+                token=BOT_TOKEN,
+                base_url=BOT_API_BASE_URL,
+                request=HTTPXRequest(connection_pool_size=8),
+            )
+        if not self.bot_initialized:
+            await self.bot.initialize()
+            self.bot_initialized = True
+
+    def get_chat_bucket(self, chat_id):
+        if chat_id not in self.chat_buckets:
+            self.chat_buckets[chat_id] = TokenBucket(
+                self.chat_rate, self.chat_burst
+            )
+        return self.chat_buckets[chat_id]
+
+    async def send_one(self, chat_id, text):
+        for attempt in range(self.max_retries + 1):
+            await self.get_chat_bucket(chat_id).acquire()
+            await self.global_bucket.acquire()
+            try:
+                await self.bot.send_message(chat_id=chat_id, text=text)
+                return True
+            except RetryAfter as exc:
+                if attempt == self.max_retries:
+                    raise
+                delay = exc.retry_after
+                if isinstance(delay, datetime.timedelta):
+                    delay = delay.total_seconds()
+            except NetworkError:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff * 2**attempt * random.uniform(1, 1.5)
+            await asyncio.sleep(delay)
+
+
+_dispatcher = None
+_dispatcher_pid = None
+
+
+def get_dispatcher():
+    """
+    Return the dispatcher of the current process, creating it after a fork
+    so that worker processes never share a connection pool.
+    """
+    global _dispatcher, _dispatcher_pid
+    if _dispatcher is None or _dispatcher_pid != os.getpid():
+        _dispatcher = TelegramDispatcher()
+        _dispatcher_pid = os.getpid()
+    return _dispatcher
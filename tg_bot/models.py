@@ -0,0 +1,44 @@
+from django.db import models
+from django.utils import timezone
+
+
+class OutboxMessage(models.Model):
+    """
+    A Telegram notification waiting to be relayed.
+
+    Rows are written in the same database transaction as the change they
+    announce, so a rolled-back borrowing never notifies and the request
+    never talks to the Celery broker. A periodic relay task delivers
+    pending rows in batches.
+
+    A pending row is only relayed from ``next_attempt_at`` on: while a
+    relay is sending it, and after a failed attempt, with an exponential
+    backoff.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = ("PENDING",)
+        SENT = ("SENT",)
+        FAILED = ("FAILED",)
+
+    dedup_key = models.CharField(max_length=255, unique=True)
+    text = models.TextField()
+    status = models.CharField(
+        max_length=7, choices=Status, default=Status.PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["id"],
+                condition=models.Q(status="PENDING"),
+                name="outbox_pending_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.dedup_key} - {self.status}"
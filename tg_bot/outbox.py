@@ -0,0 +1,149 @@
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from tg_bot.dispatcher import get_dispatcher
+from tg_bot.models import OutboxMessage
+
+
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_MAX_ATTEMPTS = 5
+# Claimed rows are skipped by other relays for this long; longer than a
+# rate-limited batch takes to send.
+OUTBOX_LEASE = timedelta(minutes=10)
+# Delay before the second attempt, doubled for every later one.
+OUTBOX_RETRY_DELAY = timedelta(seconds=30)
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_notification(text, dedup_key):
+    """
+    Queue a Telegram notification in the current transaction.
+
+    A message whose ``dedup_key`` is already queued is ignored, so
+    retried writers do not notify twice.
+    """
+    OutboxMessage.objects.bulk_create(
+        [OutboxMessage(text=text, dedup_key=dedup_key)],
+        ignore_conflicts=True,
+    )
+
+
+def retry_delay(attempts):
+    """The backoff after the ``attempts``-th failed delivery."""
+    return OUTBOX_RETRY_DELAY * 2 ** (attempts - 1)
+
+
+def claim_batch(batch_size=OUTBOX_BATCH_SIZE):
+    """
+    Lease the oldest pending messages that are due, in a short
+    transaction: their ``next_attempt_at`` moves ``OUTBOX_LEASE`` ahead,
+    so other relays skip them while they are being sent.
+
+    Returns:
+        list[OutboxMessage]: The claimed messages, attempts counted.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(
+                status=OutboxMessage.Status.PENDING, next_attempt_at__lte=now
+            )
+            .order_by("id")[:batch_size]
+        )
+        if batch:
+            OutboxMessage.objects.filter(
+                pk__in=[message.pk for message in batch]
+            ).update(
+                attempts=F("attempts") + 1,
+                next_attempt_at=now + OUTBOX_LEASE,
+            )
+    for message in batch:
+        message.attempts += 1
+    return batch
+
+
+def relay_batch(batch_size=OUTBOX_BATCH_SIZE):
+    """
+    Deliver one batch of pending messages, oldest first.
+
+    The batch is claimed in one short transaction and sent outside of
+    any, so no row lock or transaction is held during the rate-limited
+    Telegram calls. The results are then recorded in a second short
+    transaction: failed messages are retried after ``retry_delay()``,
+    and given up after ``OUTBOX_MAX_ATTEMPTS``. A relay dying mid-send
+    leaves its messages to be retried once the lease runs out.
+
+    Returns:
+        int: The number of messages in the batch.
+    """
+    batch = claim_batch(batch_size)
+    if not batch:
+        return 0
+
+    delivered = get_dispatcher().send([message.text for message in batch])
+
+    now = timezone.now()
+    for message, is_delivered in zip(batch, delivered):
+        if is_delivered:
+            message.status = OutboxMessage.Status.SENT
+            message.sent_at = now
+        elif message.attempts >= OUTBOX_MAX_ATTEMPTS:
+            message.status = OutboxMessage.Status.FAILED
+        else:
+            message.next_attempt_at = now + retry_delay(message.attempts)
+    with transaction.atomic():
+        OutboxMessage.objects.bulk_update(
+            batch, ["status", "sent_at", "next_attempt_at"]
+        )
+    return len(batch)
+
+
+def outbox_stats():
+    """
+    Return the number of pending and failed messages and the lag, in
+    seconds, of the oldest pending message.
+    """
+    stats = OutboxMessage.objects.aggregate(
+        pending=Count("id", filter=Q(status=OutboxMessage.Status.PENDING)),
+        failed=Count("id", filter=Q(status=OutboxMessage.Status.FAILED)),
+        oldest_pending=Min(
+            "created_at", filter=Q(status=OutboxMessage.Status.PENDING)
+        ),
+    )
+    oldest_pending = stats.pop("oldest_pending")
+    stats["lag_seconds"] = (
+        (timezone.now() - oldest_pending).total_seconds()
+        if oldest_pending
+        else 0.0
+    )
+    return stats
+
+
+def relay_outbox(batch_size=OUTBOX_BATCH_SIZE, max_batches=50):
+    """
+    Drain the outbox in batches and log its lag afterwards.
+
+    Returns:
+        dict: ``outbox_stats()`` plus the number of messages relayed.
+    """
+    relayed = 0
+    for _ in range(max_batches):
+        count = relay_batch(batch_size)
+        relayed += count
+        if count < batch_size:
+            break
+
+    stats = outbox_stats()
+    stats["relayed"] = relayed
+    logger.info(
+        "Outbox relayed %(relayed)s messages; %(pending)s pending, "
+        "%(failed)s failed, lag %(lag_seconds).1fs",
+        stats,
+    )
+    return stats
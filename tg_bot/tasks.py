@@ -0,0 +1,22 @@
+from celery import shared_task
+
+from tg_bot.outbox import enqueue_notification, relay_outbox
+
+
+@shared_task
+def relay_outbox_messages():
+    """
+    Celery task to deliver the pending Telegram notifications of the outbox.
+    """
+    return relay_outbox()
+
+
+@shared_task(bind=True, name="tg_bot.utils.send_telegram_notification")
+def send_telegram_notification(self, message):
+    """
+    Queue ``message`` in the outbox. Registered under the name of the
+    former direct send task, so that tasks queued under it before the
+    outbox was deployed are still delivered. To be removed in the next
+    release.
+    """
+    enqueue_notification(message, dedup_key=f"task:{self.request.id}")
@@ -0,0 +1,127 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+from telegram import Bot
+from telegram.error import RetryAfter, TimedOut
+
+from tg_bot.dispatcher import TelegramDispatcher, TokenBucket
+
+
+class FakeBotApiHandler(BaseHTTPRequestHandler):
+    """Answers getMe and sendMessage like the Telegram Bot API."""
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length).decode()
+        method = self.path.rsplit("/", 1)[-1]
+        if method == "getMe":
+            result = {
+                "id": 1,
+                "is_bot": True,
+                "first_name": "Library",
+                "username": "library_bot",
+            }
+        else:
+            self.server.requests.append(body)
+            result = {
+                "message_id": len(self.server.requests),
+                "date": 0,
+                "chat": {"id": 42, "type": "private"},
+                "text": "",
+            }
+        payload = json.dumps({"ok": True, "result": result}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class FlakyBot:
+    """Fails every message a number of times before delivering it."""
+
+    def __init__(self, error, failures=1):
+        self.error = error
+        self.failures = failures
+        self.attempts = {}
+        self.delivered = []
+
+    async def initialize(self):
+        pass
+
+    async def send_message(self, chat_id, text):
+        self.attempts[text] = self.attempts.get(text, 0) + 1
+        if self.attempts[text] <= self.failures:
+            raise self.error
+        self.delivered.append(text)
+
+
+class TelegramDispatcherTest(SimpleTestCase):
+    def test_batch_sent_to_local_bot_api_server(self):
+        """Test that a batch is delivered through one bot and connection."""
+        server = ThreadingHTTPServer(("127.0.0.1", 0), FakeBotApiHandler)
+        server.requests = []
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        bot = Bot(
+            token="123:TEST",
+            base_url=f"http://127.0.0.1:{server.server_port}/bot",
+        )
+        dispatcher = TelegramDispatcher(bot=bot, chat_id=42, chat_burst=10)
+
+        first = dispatcher.send(["one", "two", "three"])
+        second = dispatcher.send(["four"])
+
+        self.assertEqual(first, [True, True, True])
+        self.assertEqual(second, [True])
+        self.assertEqual(len(server.requests), 4)
+        self.assertTrue(all("42" in body for body in server.requests))
+
+    def test_flood_control_retried(self):
+        """Test that RetryAfter errors are retried after the given delay."""
+        bot = FlakyBot(RetryAfter(0))
+        dispatcher = TelegramDispatcher(bot=bot, chat_id=42, chat_burst=10)
+
+        self.assertEqual(dispatcher.send(["one", "two"]), [True, True])
+        self.assertEqual(sorted(bot.delivered), ["one", "two"])
+
+    def test_network_errors_give_up_after_max_retries(self):
+        """Test that a message is reported as failed after the retries."""
+        bot = FlakyBot(TimedOut(), failures=3)
+        dispatcher = TelegramDispatcher(
+            bot=bot, chat_id=42, chat_burst=10, max_retries=2, backoff=0
+        )
+
+        self.assertEqual(dispatcher.send(["one"]), [False])
+        self.assertEqual(bot.attempts["one"], 3)
+
+
+class TokenBucketTest(SimpleTestCase):
+    def test_bucket_throttles_after_burst(self):
+        """Test that the bucket waits for a refill once the burst is used."""
+        now = [0.0]
+        sleeps = []
+
+        async def fake_sleep(delay):
+            sleeps.append(delay)
+            now[0] += delay
+
+        bucket = TokenBucket(rate=2, capacity=2, clock=lambda: now[0])
+
+        async def acquire_three():
+            for _ in range(3):
+                await bucket.acquire()
+
+        with patch("tg_bot.dispatcher.asyncio.sleep", fake_sleep):
+            asyncio.run(acquire_three())
+
+        self.assertEqual(sleeps, [0.5])
@@ -0,0 +1,164 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from celery import current_app
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils.timezone import now
+
+from book.models import Book
+from borrowing.models import Borrowing
+from tg_bot.models import OutboxMessage
+from tg_bot.outbox import (
+    OUTBOX_MAX_ATTEMPTS,
+    enqueue_notification,
+    outbox_stats,
+    relay_outbox,
+    retry_delay,
+)
+import tg_bot.tasks  # noqa: F401
+
+
+class FakeDispatcher:
+    """Delivers every message except the ones listed as failing."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.sent = []
+
+    def send(self, messages, chat_id=None):
+        self.sent.extend(messages)
+        return [message not in self.failing for message in messages]
+
+
+class OutboxTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="test@user.com", password="password123"
+        )
+        self.book = Book.objects.create(
+            title="Test Book", author="Test Author", inventory=5, daily_fee=1
+        )
+
+    def create_borrowing(self):
+        return Borrowing.objects.create(
+            expected_return_date=now().date() + timedelta(days=7),
+            book=self.book,
+            user=self.user,
+        )
+
+    def test_borrowing_queues_notification(self):
+        """Test that a new borrowing is announced through the outbox."""
+        borrowing = self.create_borrowing()
+
+        message = OutboxMessage.objects.get()
+        self.assertEqual(
+            message.dedup_key, f"borrowing-created:{borrowing.pk}"
+        )
+        self.assertIn("Test Book", message.text)
+
+    def test_rolled_back_borrowing_does_not_notify(self):
+        """Test that the outbox row is rolled back with the borrowing."""
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.create_borrowing()
+                raise RuntimeError
+
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_duplicate_messages_ignored(self):
+        """Test that a dedup key is only queued once."""
+        enqueue_notification("first", "same-key")
+        enqueue_notification("second", "same-key")
+
+        self.assertEqual(
+            list(OutboxMessage.objects.values_list("text", flat=True)),
+            ["first"],
+        )
+
+    def test_former_send_task_queues_in_outbox(self):
+        """
+        Test that a task queued under the former direct send task's name
+        goes through the outbox, once even when it is delivered twice.
+        """
+        task = current_app.tasks["tg_bot.utils.send_telegram_notification"]
+
+        for _ in range(2):
+            task.apply(args=("Hello",), task_id="queued-before-deploy")
+
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.text, "Hello")
+        self.assertEqual(message.dedup_key, "task:queued-before-deploy")
+
+    def test_relay_marks_delivery_state(self):
+        """Test that the relay sends pending rows in one batch."""
+        enqueue_notification("delivered", "key-1")
+        enqueue_notification("failing", "key-2")
+        dispatcher = FakeDispatcher(failing={"failing"})
+
+        with patch("tg_bot.outbox.get_dispatcher", return_value=dispatcher):
+            stats = relay_outbox()
+
+        self.assertEqual(dispatcher.sent, ["delivered", "failing"])
+        self.assertEqual(stats["relayed"], 2)
+        self.assertEqual(stats["pending"], 1)
+        delivered = OutboxMessage.objects.get(dedup_key="key-1")
+        self.assertEqual(delivered.status, OutboxMessage.Status.SENT)
+        self.assertIsNotNone(delivered.sent_at)
+
+    def test_relay_gives_up_after_max_attempts(self):
+        """Test that a message failing too often is marked as failed."""
+        enqueue_notification("failing", "key-1")
+        dispatcher = FakeDispatcher(failing={"failing"})
+
+        with patch("tg_bot.outbox.get_dispatcher", return_value=dispatcher):
+            for _ in range(OUTBOX_MAX_ATTEMPTS):
+                OutboxMessage.objects.update(next_attempt_at=now())
+                relay_outbox()
+
+        self.assertEqual(
+            OutboxMessage.objects.get().status, OutboxMessage.Status.FAILED
+        )
+        self.assertEqual(outbox_stats()["failed"], 1)
+
+    def test_failed_message_backs_off(self):
+        """Test that a failed message waits before it is sent again."""
+        enqueue_notification("failing", "key-1")
+        dispatcher = FakeDispatcher(failing={"failing"})
+
+        with patch("tg_bot.outbox.get_dispatcher", return_value=dispatcher):
+            relay_outbox(batch_size=1)
+            failed_at = now()
+            relay_outbox(batch_size=1)
+
+        self.assertEqual(dispatcher.sent, ["failing"])
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.status, OutboxMessage.Status.PENDING)
+        self.assertEqual(message.attempts, 1)
+        self.assertAlmostEqual(
+            message.next_attempt_at,
+            failed_at + retry_delay(1),
+            delta=timedelta(seconds=5),
+        )
+        self.assertEqual(retry_delay(3), retry_delay(1) * 4)
+
+
+class OutboxTransactionTest(TransactionTestCase):
+    def test_messages_are_sent_outside_a_transaction(self):
+        """Test that no transaction or row lock is held while sending."""
+        enqueue_notification("first", "key-1")
+        in_transaction = []
+
+        class Dispatcher(FakeDispatcher):
+            def send(self, messages, chat_id=None):
+                in_transaction.append(connection.in_atomic_block)
+                return super().send(messages, chat_id)
+
+        with patch("tg_bot.outbox.get_dispatcher", return_value=Dispatcher()):
+            relay_outbox()
+
+        self.assertEqual(in_transaction, [False])
+        self.assertEqual(
+            OutboxMessage.objects.get().status, OutboxMessage.Status.SENT
+        )